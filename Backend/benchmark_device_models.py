@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Device model profiles: mAP on the device classes against CPU inference latency
+"""
+import argparse
+import time
+
+import numpy as np
+
+from device_detector import DeviceDetector
+from device_models import DEVICE_MODEL_PROFILES, load_device_model
+
+
+def device_class_map(model, config, data: str, class_ids):
+    """mAP50 and mAP50-95 over the device classes present in the validation set"""
+    metrics = model.val(data=data, imgsz=config.imgsz, half=config.precision == 'fp16',
+                        device='cpu', verbose=False, plots=False)
+    box = metrics.box
+    rows = [row for row, class_id in enumerate(box.ap_class_index) if int(class_id) in class_ids]
+    if not rows:
+        return None, None
+    all_ap = box.all_ap[rows]
+    return float(all_ap[:, 0].mean()), float(all_ap.mean())
+
+
+def cpu_latency_ms(model, config, class_ids, frames: int):
+    frame = np.random.default_rng(0).integers(0, 256, (480, 640, 3), dtype=np.uint8)
+    for _ in range(3):
+        model(frame, classes=class_ids, verbose=False, device='cpu', imgsz=config.imgsz)
+    started = time.perf_counter()
+    for _ in range(frames):
+        model(frame, classes=class_ids, verbose=False, device='cpu', imgsz=config.imgsz)
+    return (time.perf_counter() - started) * 1000 / frames
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Device model accuracy/latency benchmark")
+    parser.add_argument("--profiles", nargs="*", default=list(DEVICE_MODEL_PROFILES),
+                        help="profiles from device_models.DEVICE_MODEL_PROFILES")
+    parser.add_argument("--data", default="coco128.yaml", help="ultralytics dataset yaml for validation")
+    parser.add_argument("--frames", type=int, default=30)
+    args = parser.parse_args()
+
+    device_classes = set(DeviceDetector.DEVICE_CLASSES_MAPPING)
+
+    print("=" * 72)
+    print(f"{'profile':28} {'mAP50':>8} {'mAP50-95':>9} {'CPU ms/frame':>13}")
+    print("=" * 72)
+    for profile in args.profiles:
+        config = DEVICE_MODEL_PROFILES[profile]
+        if config.precision == 'fp16':
+            print(f"{profile:28} skipped (fp16 needs a GPU)")
+            continue
+        try:
+            model, path, names = load_device_model(config)
+        except Exception as e:
+            print(f"{profile:28} failed to load: {e}")
+            continue
+
+        class_ids = [class_id for class_id, name in names.items() if name in device_classes]
+        map50, map50_95 = device_class_map(model, config, args.data, set(class_ids))
+        latency = cpu_latency_ms(model, config, class_ids, args.frames)
+        accuracy = f"{map50:8.3f} {map50_95:9.3f}" if map50 is not None else f"{'n/a':>8} {'n/a':>9}"
+        print(f"{profile:28} {accuracy} {latency:13.1f}")
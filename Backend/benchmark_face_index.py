@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark the FaceIndex (IVF) against brute-force search over synthetic face encodings
+"""
+import argparse
+import time
+
+import numpy as np
+
+from face_index import FaceIndex
+
+
+def make_gallery(size: int, dimension: int, rng: np.random.Generator) -> np.ndarray:
+    """Synthetic 128-d encodings: identities spread around a few hundred 'population' modes"""
+    modes = rng.normal(0, 0.12, (max(1, size // 200), dimension))
+    gallery = modes[rng.integers(0, len(modes), size)] + rng.normal(0, 0.06, (size, dimension))
+    return gallery.astype(np.float32)
+
+
+def brute_force(gallery: np.ndarray, queries: np.ndarray) -> np.ndarray:
+    norms = np.einsum('ij,ij->i', gallery, gallery)
+    return np.array([np.argmin(norms - 2.0 * gallery @ q) for q in queries])
+
+
+def benchmark(size: int, num_queries: int, nprobe_values, dimension: int = 128, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    gallery = make_gallery(size, dimension, rng)
+    ids = [str(i) for i in range(size)]
+
+    # Queries are re-detections of known faces: gallery vectors plus same-person noise (~0.4 distance)
+    picks = rng.integers(0, size, num_queries)
+    queries = gallery[picks] + rng.normal(0, 0.035, (num_queries, dimension)).astype(np.float32)
+
+    start = time.perf_counter()
+    truth = brute_force(gallery, queries)
+    brute_ms = (time.perf_counter() - start) * 1000 / num_queries
+
+    start = time.perf_counter()
+    index = FaceIndex(dimension=dimension)
+    index.add_many(ids, gallery)
+    # Training runs in the background, include it in the build time
+    index.wait_for_training()
+    build_ms = (time.perf_counter() - start) * 1000
+
+    print(f"\n{size} faces ({'IVF' if index.is_trained else 'exact'}, build {build_ms:.0f} ms)")
+    print(f"  brute force      : {brute_ms:8.3f} ms/query  recall@1 1.000")
+
+    for nprobe in nprobe_values:
+        index.set_nprobe(nprobe)
+        start = time.perf_counter()
+        results = [index.search(q, k=1) for q in queries]
+        index_ms = (time.perf_counter() - start) * 1000 / num_queries
+        recall = np.mean([r[0][0] == str(t) for r, t in zip(results, truth)])
+        print(f"  index nprobe={nprobe:<4}: {index_ms:8.3f} ms/query  recall@1 {recall:.3f}  "
+              f"speedup {brute_ms / index_ms:5.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FaceIndex recall/latency benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32])
+    args = parser.parse_args()
+
+    print("=" * 50)
+    print("FaceIndex vs brute force")
+    print("=" * 50)
+    for size in args.sizes:
+        benchmark(size, args.queries, args.nprobe)
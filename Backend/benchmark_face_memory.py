@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Memory footprint of the compact FaceVector against the previous dict/list representation
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from face_vector import EMOTION_LABELS, FaceVector
+
+
+class LegacyFaceVector:
+    """The previous representation: float64 encoding, list of emotion dicts, list of floats"""
+
+    def __init__(self, face_id, encoding, first_seen, last_seen, emotions, concentration_scores):
+        self.face_id = face_id
+        self.encoding = encoding
+        self.first_seen = first_seen
+        self.last_seen = last_seen
+        self.emotions = emotions
+        self.concentration_scores = concentration_scores
+        self.total_detections = len(emotions)
+
+    def to_dict(self):
+        return {
+            'face_id': self.face_id,
+            'first_seen': self.first_seen.isoformat(),
+            'last_seen': self.last_seen.isoformat(),
+            'emotions': self.emotions,
+            'concentration_scores': self.concentration_scores,
+            'total_detections': self.total_detections,
+            'avg_concentration': np.mean(self.concentration_scores) if self.concentration_scores else 0,
+            'dominant_emotion': max(set([e['emotion'] for e in self.emotions]),
+                                    key=[e['emotion'] for e in self.emotions].count) if self.emotions else 'unknown'
+        }
+
+
+def build_legacy(face_id, encoding, detections, start, rng):
+    face = LegacyFaceVector(face_id, encoding.astype(np.float64), start, start, [], [])
+    for i in range(detections):
+        seen_at = start + timedelta(milliseconds=200 * i)
+        face.emotions.append({
+            'emotion': EMOTION_LABELS[rng.integers(0, 7)],
+            'confidence': float(rng.random() * 100),
+            'timestamp': seen_at.isoformat()
+        })
+        face.concentration_scores.append(float(rng.random() * 100))
+        face.total_detections += 1
+        face.last_seen = seen_at
+    return face
+
+
+def build_compact(face_id, encoding, detections, start, rng):
+    face = FaceVector(face_id, encoding, start, start)
+    for i in range(detections):
+        face.add_detection(EMOTION_LABELS[rng.integers(0, 7)], float(rng.random() * 100),
+                           float(rng.random() * 100), start + timedelta(milliseconds=200 * i))
+    return face
+
+
+def measure(builder, sample: int, detections: int, seed: int):
+    rng = np.random.default_rng(seed)
+    encodings = rng.normal(0, 0.1, (sample, 128))
+    start = datetime.now()
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    faces = [builder(f"face-{i}", encodings[i], detections, start, rng) for i in range(sample)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    for face in faces:
+        json.dumps(face.to_dict(), default=str)
+    to_dict_ms = (time.perf_counter() - started) * 1000 / sample
+    return (after - before) / sample, to_dict_ms
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="FaceVector memory benchmark")
+    parser.add_argument("--faces", type=int, default=10000)
+    parser.add_argument("--detections", type=int, default=10000)
+    parser.add_argument("--sample", type=int, default=10,
+                        help="faces actually built; totals are extrapolated to --faces")
+    args = parser.parse_args()
+
+    print("=" * 50)
+    print(f"FaceVector footprint: {args.faces} faces x {args.detections} detections")
+    print("=" * 50)
+
+    results = {}
+    for name, builder in (("legacy", build_legacy), ("compact", build_compact)):
+        per_face, to_dict_ms = measure(builder, args.sample, args.detections, seed=0)
+        results[name] = per_face
+        print(f"{name:8}: {per_face / 1024:10.1f} KiB/face  "
+              f"{per_face * args.faces / 1024 ** 3:8.2f} GiB total  "
+              f"to_dict+json {to_dict_ms:8.2f} ms/face")
+
+    print(f"\nCompact representation uses {results['legacy'] / results['compact']:.1f}x less memory")
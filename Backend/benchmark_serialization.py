@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Per-message serialization time of the detection stream: previous json.dumps per tier against the serialization layer
+"""
+import argparse
+import base64
+import json
+import time
+
+import numpy as np
+
+from frame_compositor import overlay_layers
+from serialization import ORJSON_AVAILABLE, DetectionUpdate, FragmentCache, dumps
+
+EMOTIONS = ['angry', 'disgust', 'fear', 'happy', 'neutral', 'sad', 'surprise']
+
+
+def synthetic_tick(faces: int, devices: int, rng):
+    """Detection results, device result and statistics shaped like one frame-loop tick"""
+    detection_results = []
+    for index in range(faces):
+        left, top = int(rng.integers(0, 1100)), int(rng.integers(60, 560))
+        detection_results.append({
+            'face_id': f"face_{index:04d}_{rng.integers(1 << 30):x}",
+            'emotion': EMOTIONS[index % len(EMOTIONS)],
+            'confidence': float(rng.uniform(40, 99)),
+            'concentration': float(rng.uniform(0, 100)),
+            'face_location': {'top': top, 'right': left + 110, 'bottom': top + 120, 'left': left},
+            'thumbnail_version': int(rng.integers(1, 500)),
+            'timestamp': '2026-10-19T10:00:00.000000',
+            'distraction': {'score': 2.0, 'level': 'medium', 'devices': [{'type': 'smartphone', 'track_id': 3}],
+                            'updated_at': '2026-10-19T10:00:00.000000'}
+        })
+    detected_devices = []
+    for index in range(devices):
+        x1, y1 = int(rng.integers(0, 1000)), int(rng.integers(40, 500))
+        detected_devices.append({
+            'type': ['smartphone', 'laptop', 'book'][index % 3], 'confidence': float(rng.uniform(0.3, 0.9)),
+            'bbox': [x1, y1, x1 + 150, y1 + 120], 'area': 18000.0, 'aspect_ratio': 1.25,
+            'class_id': 67, 'original_class': 'cell phone', 'track_id': index + 1
+        })
+    device_result = {
+        'detected_devices': detected_devices, 'device_counts': {'smartphone': 1, 'laptop': 1},
+        'total_devices': devices, 'distraction_score': 3.0, 'distraction_level': 'medium',
+        'timestamp': '2026-10-19T10:00:00.000000', 'detection_method': 'yolo',
+        'active_device_counts': {'smartphone': 1}, 'persons': [], 'age_ms': 420.0
+    }
+    statistics = {
+        'total_faces': 120, 'total_detections': 53000, 'avg_concentration': 61.3,
+        'emotion_distribution': {emotion: int(rng.integers(0, 9000)) for emotion in EMOTIONS},
+        'faces': [{'face_id': f"face_{index:04d}", 'avg_concentration': 55.0, 'dominant_emotion': 'neutral',
+                   'total_detections': 400} for index in range(120)]
+    }
+    return detection_results, device_result, statistics
+
+
+def legacy_messages(data, frames, timestamp):
+    """The previous path: one full json.dumps of the message per tier"""
+    messages = {}
+    for tier, frame in frames.items():
+        message = {"type": "detection_update", "data": dict(data, frame=frame, tier=tier), "timestamp": timestamp}
+        messages[tier] = json.dumps(message)
+    return messages
+
+
+def current_messages(data, frames, timestamp, fragments, statistics_version):
+    update = DetectionUpdate(
+        overlay_mode=data['overlay_mode'], overlays=data['overlays'], detections=data['detections'],
+        devices=data['devices'], stages=data['stages'], ages_ms=data['ages_ms'], timestamp=timestamp
+    )
+    statistics = fragments.get('statistics', statistics_version, lambda: data['statistics'])
+    return update.encode_for_tiers(frames, statistics)
+
+
+def milliseconds_per_call(function, repeats: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeats):
+        function()
+    return (time.perf_counter() - started) * 1000 / repeats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Detection stream serialization time")
+    parser.add_argument("--repeats", type=int, default=500)
+    parser.add_argument("--faces", type=int, default=8)
+    parser.add_argument("--devices", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    detection_results, device_result, statistics = synthetic_tick(args.faces, args.devices, rng)
+    # Base64 JPEG payloads of the size the full-size (720p) and thumbnail tiers produce
+    frames = {'full': base64.b64encode(rng.bytes(90_000)).decode('ascii'),
+              'thumbnail': base64.b64encode(rng.bytes(15_000)).decode('ascii')}
+    timestamp = '2026-10-19T10:00:00.000000'
+
+    print("=" * 70)
+    print(f"detection_update serialization ({args.faces} faces, {args.devices} devices, "
+          f"encoder: {'orjson' if ORJSON_AVAILABLE else 'json'})")
+    print("=" * 70)
+    for overlay_mode in ("server", "client"):
+        overlays = overlay_layers((720, 1280, 3), detection_results, device_result) if overlay_mode == "client" else None
+        data = {'overlay_mode': overlay_mode, 'overlays': overlays, 'detections': detection_results,
+                'devices': device_result, 'statistics': statistics, 'stages': ['faces'],
+                'ages_ms': {'faces': 0.0, 'devices': 420.0}}
+
+        # Same content either way
+        fragments = FragmentCache()
+        legacy = legacy_messages(data, frames, timestamp)
+        current = current_messages(data, frames, timestamp, fragments, 1)
+        assert all(json.loads(legacy[tier]) == json.loads(current[tier]) for tier in frames)
+
+        for tiers in (['full'], ['full', 'thumbnail']):
+            tier_frames = {tier: frames[tier] for tier in tiers}
+            legacy_ms = milliseconds_per_call(lambda: legacy_messages(data, tier_frames, timestamp), args.repeats)
+            current_ms = milliseconds_per_call(
+                lambda: current_messages(data, tier_frames, timestamp, fragments, 1), args.repeats)
+            print(f"{overlay_mode} overlays, {len(tiers)} tier(s): previous {legacy_ms:6.3f} ms  "
+                  f"current {current_ms:6.3f} ms  ({legacy_ms / current_ms:.1f}x)")
+
+    # REST payloads with numpy scalars (np.mean results) need no conversion pass
+    rest_payload = {'history': [{'timestamp': timestamp, 'total_devices': np.int64(2), 'distraction_score': np.float64(1.5)}
+                                for _ in range(3600)]}
+    rest_ms = milliseconds_per_call(lambda: dumps(rest_payload), max(args.repeats // 10, 1))
+    print(f"REST: 3600-entry history with numpy scalars: {rest_ms:.2f} ms")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Throughput of the contour fallback (detect_devices_simple) against the previous full-resolution version
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from device_detector import DeviceDetector
+
+
+def legacy_detect_devices_simple(detector, frame):
+    """The previous implementation: full resolution, unused HSV frame, per-contour area filter"""
+    devices = []
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)  # noqa: F841 (kept to match the previous cost)
+    edges = cv2.Canny(gray, 50, 150)
+    kernel = np.ones((3, 3), np.uint8)
+    edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, kernel)
+    contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    for contour in contours:
+        area = cv2.contourArea(contour)
+        if area < 2000 or area > 100000:
+            continue
+        x, y, w, h = cv2.boundingRect(contour)
+        aspect_ratio = w / h
+        perimeter = cv2.arcLength(contour, True)
+        approx = cv2.approxPolyDP(contour, 0.02 * perimeter, True)
+        device_type = detector._classify_device(aspect_ratio, area, len(approx))
+        if device_type:
+            confidence = detector._calculate_confidence(aspect_ratio, area, len(approx))
+            devices.append({
+                'type': device_type,
+                'confidence': float(confidence),
+                'bbox': [int(x), int(y), int(x + w), int(y + h)],
+                'area': float(area),
+                'aspect_ratio': float(aspect_ratio)
+            })
+    return devices
+
+
+def synthetic_frame(width: int, height: int, rng) -> np.ndarray:
+    """Noisy desk-like frame with a few phone/laptop/book shaped rectangles"""
+    frame = rng.integers(60, 120, (height, width, 3), dtype=np.uint8)
+    frame = cv2.GaussianBlur(frame, (5, 5), 0)
+    scale = width / 1280
+    for (x, y, w, h), color in (((100, 400, 60, 120), (20, 20, 20)), ((400, 350, 300, 180), (200, 200, 200)),
+                                ((800, 380, 140, 190), (40, 90, 160)), ((1000, 100, 220, 130), (230, 230, 230))):
+        x, y, w, h = (int(v * scale) for v in (x, y, w, h))
+        cv2.rectangle(frame, (x, y), (x + w, y + h), color, -1)
+    return frame
+
+
+def frames_per_second(function, frames, repeats: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for frame in frames:
+            function(frame)
+    return repeats * len(frames) / (time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Contour device detection throughput")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--width", type=int, default=640, help="processing width of the new path")
+    args = parser.parse_args()
+
+    detector = DeviceDetector.__new__(DeviceDetector)
+    detector.simple_detection_width = args.width
+    detector._simple_buffers = {}
+    detector._simple_kernel = np.ones((3, 3), np.uint8)
+    rng = np.random.default_rng(0)
+
+    print("=" * 60)
+    print(f"detect_devices_simple throughput (processing width {args.width})")
+    print("=" * 60)
+    for width, height in ((640, 480), (1280, 720), (1920, 1080)):
+        frames = [synthetic_frame(width, height, rng) for _ in range(5)]
+        legacy = frames_per_second(lambda frame: legacy_detect_devices_simple(detector, frame), frames, args.repeats)
+        current = frames_per_second(detector.detect_devices_simple, frames, args.repeats)
+        found_legacy = len(legacy_detect_devices_simple(detector, frames[0]))
+        found_current = len(detector.detect_devices_simple(frames[0]))
+        print(f"{width}x{height}: previous {legacy:7.1f} fps  current {current:7.1f} fps  "
+              f"({current / legacy:.1f}x)  devices {found_legacy} -> {found_current}")
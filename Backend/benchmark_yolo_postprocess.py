@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+YOLO box post-processing: previous per-box loop + recursive JSON conversion against the vectorized path
+"""
+import argparse
+import time
+
+import numpy as np
+
+from device_detector import DeviceDetector
+
+# COCO class names used by the YOLO models (index = class id)
+COCO_NAMES = [
+    'person', 'bicycle', 'car', 'motorcycle', 'airplane', 'bus', 'train', 'truck', 'boat', 'traffic light',
+    'fire hydrant', 'stop sign', 'parking meter', 'bench', 'bird', 'cat', 'dog', 'horse', 'sheep', 'cow',
+    'elephant', 'bear', 'zebra', 'giraffe', 'backpack', 'umbrella', 'handbag', 'tie', 'suitcase', 'frisbee',
+    'skis', 'snowboard', 'sports ball', 'kite', 'baseball bat', 'baseball glove', 'skateboard', 'surfboard',
+    'tennis racket', 'bottle', 'wine glass', 'cup', 'fork', 'knife', 'spoon', 'bowl', 'banana', 'apple',
+    'sandwich', 'orange', 'broccoli', 'carrot', 'hot dog', 'pizza', 'donut', 'cake', 'chair', 'couch',
+    'potted plant', 'bed', 'dining table', 'toilet', 'tv', 'laptop', 'mouse', 'remote', 'keyboard',
+    'cell phone', 'microwave', 'oven', 'toaster', 'sink', 'refrigerator', 'book', 'clock', 'vase',
+    'scissors', 'teddy bear', 'hair drier', 'toothbrush'
+]
+
+
+class FakeTensor:
+    """Enough of the torch.Tensor API for the previous per-box code path"""
+
+    def __init__(self, value):
+        self.value = np.asarray(value)
+
+    def item(self):
+        return self.value.item()
+
+    def __int__(self):
+        return int(self.value.item())
+
+    def __getitem__(self, index):
+        return FakeTensor(self.value[index])
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.value
+
+
+class FakeBox:
+    def __init__(self, row):
+        self.xyxy = FakeTensor(row[None, :4])
+        self.conf = FakeTensor(row[4:5])
+        self.cls = FakeTensor(row[5:6])
+
+
+def legacy_devices(boxes, names, mapping):
+    """The previous loop over result.boxes"""
+    devices = []
+    for box in boxes:
+        class_id = int(box.cls)
+        class_name = names[class_id]
+        if class_name in mapping:
+            device_type = mapping[class_name]
+            confidence = float(box.conf.item())
+            x1, y1, x2, y2 = box.xyxy[0].cpu().numpy().astype(float)
+            area = float((x2 - x1) * (y2 - y1))
+            aspect_ratio = float((x2 - x1) / (y2 - y1)) if (y2 - y1) > 0 else 1.0
+            devices.append({
+                'type': device_type,
+                'confidence': confidence,
+                'bbox': [int(x1), int(y1), int(x2), int(y2)],
+                'area': area,
+                'aspect_ratio': aspect_ratio,
+                'original_class': class_name
+            })
+    return devices
+
+
+def ensure_json_serializable(obj):
+    """The previous DeviceDetector._ensure_json_serializable (numpy branches only)"""
+    if isinstance(obj, dict):
+        return {key: ensure_json_serializable(value) for key, value in obj.items()}
+    elif isinstance(obj, list):
+        return [ensure_json_serializable(item) for item in obj]
+    elif isinstance(obj, (np.integer, np.int8, np.int16, np.int32, np.int64)):
+        return int(obj)
+    elif isinstance(obj, (np.floating, np.float16, np.float32, np.float64)):
+        return float(obj)
+    elif isinstance(obj, np.ndarray):
+        return obj.tolist()
+    elif isinstance(obj, (np.bool_, bool)):
+        return bool(obj)
+    elif hasattr(obj, 'item'):
+        return obj.item()
+    return obj
+
+
+def fake_boxes(count: int, rng) -> np.ndarray:
+    """(count, 6) float32 rows of x1, y1, x2, y2, conf, cls over device classes"""
+    device_ids = [i for i, name in enumerate(COCO_NAMES) if name in ('cell phone', 'laptop', 'book', 'tv')]
+    top_left = rng.uniform(0, 500, (count, 2))
+    size = rng.uniform(20, 200, (count, 2))
+    return np.column_stack([
+        top_left, top_left + size, rng.uniform(0.3, 1.0, count), rng.choice(device_ids, count)
+    ]).astype(np.float32)
+
+
+def time_ms(function, repeats: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeats):
+        function()
+    return (time.perf_counter() - started) * 1000 / repeats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="YOLO post-processing benchmark")
+    parser.add_argument("--repeats", type=int, default=2000)
+    args = parser.parse_args()
+
+    mapping = DeviceDetector.DEVICE_CLASSES_MAPPING
+    class_names = COCO_NAMES
+    device_types = np.array([mapping.get(name) for name in class_names], dtype=object)
+    rng = np.random.default_rng(0)
+
+    print("=" * 50)
+    print("YOLO box post-processing (CPU arrays, excludes inference)")
+    print("=" * 50)
+    for count in (0, 10, 50):
+        data = fake_boxes(count, rng)
+        boxes = [FakeBox(row) for row in data]
+
+        legacy = time_ms(lambda: ensure_json_serializable(
+            {'detected_devices': legacy_devices(boxes, class_names, mapping)}), args.repeats)
+        vectorized = time_ms(lambda: DeviceDetector.devices_from_boxes(data, class_names, device_types), args.repeats)
+
+        assert legacy_devices(boxes, class_names, mapping) == DeviceDetector.devices_from_boxes(
+            data, class_names, device_types)
+        print(f"{count:3} detections: per-box {legacy * 1000:8.1f} us  vectorized {vectorized * 1000:8.1f} us  "
+              f"({legacy / max(vectorized, 1e-9):.1f}x)")
+
+    print("\nOn GPU the per-box path also pays three device-to-host copies per box, the vectorized one a single copy")
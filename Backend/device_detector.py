@@ -1,9 +1,17 @@
 import cv2
 import numpy as np
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import json
 import os
+import time
+
+from device_history import DeviceHistoryRing
+from device_models import DEVICE_MODEL_PROFILES, DeviceModelConfig, describe_device_model, load_device_model
+from device_tracker import DeviceTracker
+from frame_compositor import draw_device_status, draw_devices
+from spatial_grid import UniformGrid
+from time_columns import iso_timestamps
 try:
     from ultralytics import YOLO
     YOLO_AVAILABLE = True
@@ -12,28 +20,39 @@ except ImportError:
     print("Warning: ultralytics not installed. Install with: pip install ultralytics")
 
 class DeviceDetector:
-    def __init__(self):
-        # YOLO model for state-of-the-art object detection
+    # COCO class names to our device categories
+    DEVICE_CLASSES_MAPPING = {
+        'cell phone': 'smartphone',
+        'laptop': 'laptop',
+        'tablet': 'tablet', 
+        'tv': 'monitor',
+        'monitor': 'monitor',
+        'book': 'book',
+        'mouse': 'mouse',
+        'keyboard': 'keyboard',
+        'remote': 'remote',
+        'scissors': 'scissors',
+        'teddy bear': 'toy',
+        'hair drier': 'hair_drier',
+        'toothbrush': 'toothbrush'
+    }
+    
+    def __init__(self, event_log=None, model_config: Optional[DeviceModelConfig] = None):
+        # YOLO model for state-of-the-art object detection (see device_models.DEVICE_MODEL_PROFILES)
+        if model_config is None:
+            try:
+                model_config = DeviceModelConfig.from_env()
+            except ValueError as e:
+                # A bad DEVICE_MODEL* setting must not take the API down
+                print(f"Invalid device model configuration ({e}), using the default model")
+                model_config = DEVICE_MODEL_PROFILES['default']
+        self.model_config = model_config
         self.yolo_model = None
+        self.yolo_model_path = None
         self.yolo_available = YOLO_AVAILABLE
         
         # Device classes mapping from COCO dataset to our categories
-        self.device_classes_mapping = {
-            # COCO class names to our device categories
-            'cell phone': 'smartphone',
-            'laptop': 'laptop',
-            'tablet': 'tablet', 
-            'tv': 'monitor',
-            'monitor': 'monitor',
-            'book': 'book',
-            'mouse': 'mouse',
-            'keyboard': 'keyboard',
-            'remote': 'remote',
-            'scissors': 'scissors',
-            'teddy bear': 'toy',
-            'hair drier': 'hair_drier',
-            'toothbrush': 'toothbrush'
-        }
+        self.device_classes_mapping = dict(self.DEVICE_CLASSES_MAPPING)
         
         # Device classes we're interested in detecting
         self.target_device_classes = {
@@ -47,12 +66,41 @@ class DeviceDetector:
             'remote': 'remote'
         }
         
-        # Device tracking history
-        self.device_history = []
+        # Device tracking history (columnar ring, last 500 entries)
+        self.device_history = DeviceHistoryRing(
+            capacity=500,
+            device_types=sorted(set(self.device_classes_mapping.values()))
+        )
         self.current_devices = {}
         
+        # Person boxes found by the same YOLO pass, reused as face search regions
+        self.person_detection_enabled = True
+        self.person_detections: List[Dict] = []
+        self.person_detections_at: Optional[float] = None
+        
+        # Persistent device identities across detections (unique devices, dwell time)
+        self.device_tracker = DeviceTracker()
+        
+        # Durable event log (EventLog) for windows longer than the in-memory ring
+        self.event_log = event_log
+        # Whether the log holds detections from before this ring (an earlier run)
+        self._log_predates_ring = event_log is not None and event_log.has_device_data()
+        
+        # Bumped whenever history or current devices change
+        self.version = 0
+        
+        # Last device summary pushed to clients (see pop_summary_change)
+        self._published_summary = None
+        self._published_version = -1
+        self._published_at = 0.0
+        
         # Detection parameters
         self.detection_confidence = 0.3
+        
+        # Simple (contour) detector: processing width and buffers reused across frames
+        self.simple_detection_width = 640
+        self._simple_buffers: Dict = {}
+        self._simple_kernel = np.ones((3, 3), np.uint8)
         self.device_tracking_enabled = True  # Enable/disable device tracking
         
         # Initialize YOLO model
@@ -65,121 +113,195 @@ class DeviceDetector:
             return
         
         try:
-            # Load YOLOv8 model (will download automatically if not present)
-            # Using YOLOv8n (nano) for faster inference, can use YOLOv8s/m/l/x for better accuracy
-            self.yolo_model = YOLO('yolov5s.pt')
-            print("YOLO model loaded successfully")
+            # Load the configured variant/backend, exporting and caching it on first use
+            self.yolo_model, self.yolo_model_path, class_names = load_device_model(self.model_config)
+            self._build_yolo_class_lookup(class_names)
+            print(f"YOLO model loaded successfully ({self.model_config.name}: {self.yolo_model_path})")
         except Exception as e:
             print(f"Error loading YOLO model: {e}")
             self.yolo_available = False
             self.yolo_model = None
     
+    def _build_yolo_class_lookup(self, names: Dict[int, str]):
+        """Model class ids of the device classes, plus id -> (device type, class name) tables"""
+        self.yolo_class_ids = sorted(
+            class_id for class_id, class_name in names.items() if class_name in self.device_classes_mapping
+        )
+        size = max(names) + 1 if names else 0
+        self.yolo_class_names = [names.get(class_id, '') for class_id in range(size)]
+        self.yolo_device_types = np.array(
+            [self.device_classes_mapping.get(class_name) for class_name in self.yolo_class_names], dtype=object
+        )
+        person_ids = [class_id for class_id, class_name in names.items() if class_name == 'person']
+        self.yolo_person_class_id = person_ids[0] if person_ids else None
+    
+    def _yolo_inference_classes(self) -> List[int]:
+        if self.person_detection_enabled and self.yolo_person_class_id is not None:
+            return self.yolo_class_ids + [self.yolo_person_class_id]
+        return self.yolo_class_ids
+    
     def detect_devices_yolo(self, frame: np.ndarray) -> List[Dict]:
         """Advanced device detection using YOLO model"""
         if not self.yolo_available or self.yolo_model is None:
             return self.detect_devices_simple(frame)
         
         devices = []
+        persons = []
         
         try:
-            # Run YOLO inference with configurable confidence
-            results = self.yolo_model(frame, conf=self.detection_confidence, iou=0.5, verbose=False)
+            # Run YOLO inference only for the device classes (and person), with configurable confidence
+            results = self.yolo_model(frame, conf=self.detection_confidence, iou=0.5,
+                                      classes=self._yolo_inference_classes(), verbose=False,
+                                      **self.model_config.predict_kwargs())
             
-            # Process results
             for result in results:
-                boxes = result.boxes
-                if boxes is not None:
-                    for box in boxes:
-                        # Get class name
-                        class_id = int(box.cls)
-                        class_name = self.yolo_model.names[class_id]
-                        
-                        # Check if this class is a device we're interested in
-                        if class_name in self.device_classes_mapping:
-                            device_type = self.device_classes_mapping[class_name]
-                            confidence = float(box.conf.item())  # Convert to Python float
-                            
-                            # Get bounding box coordinates and convert to Python types
-                            x1, y1, x2, y2 = box.xyxy[0].cpu().numpy().astype(float)
-                            
-                            # Calculate area and aspect ratio
-                            area = float((x2 - x1) * (y2 - y1))
-                            aspect_ratio = float((x2 - x1) / (y2 - y1)) if (y2 - y1) > 0 else 1.0
-                            
-                            devices.append({
-                                'type': device_type,
-                                'confidence': confidence,
-                                'bbox': [int(x1), int(y1), int(x2), int(y2)],
-                                'area': area,
-                                'aspect_ratio': aspect_ratio,
-                                'original_class': class_name
-                            })
+                if result.boxes is not None and len(result.boxes):
+                    # One device-to-host copy per result: rows of x1, y1, x2, y2, [track id,] conf, cls
+                    data = result.boxes.data.cpu().numpy()
+                    devices.extend(self.devices_from_boxes(data, self.yolo_class_names, self.yolo_device_types))
+                    if self.person_detection_enabled:
+                        persons.extend(self.persons_from_boxes(data, self.yolo_person_class_id))
         
         except Exception as e:
             print(f"Error in YOLO detection: {e}")
             return self.detect_devices_simple(frame)
         
+        if self.person_detection_enabled:
+            self.person_detections = persons
+            self.person_detections_at = time.time()
         return devices
     
-    def _ensure_json_serializable(self, obj):
-        """Ensure all values in a dictionary/list are JSON serializable"""
-        if isinstance(obj, dict):
-            return {key: self._ensure_json_serializable(value) for key, value in obj.items()}
-        elif isinstance(obj, list):
-            return [self._ensure_json_serializable(item) for item in obj]
-        elif isinstance(obj, (np.integer, np.int8, np.int16, np.int32, np.int64)):
-            return int(obj)
-        elif isinstance(obj, (np.floating, np.float16, np.float32, np.float64)):
-            return float(obj)
-        elif isinstance(obj, np.ndarray):
-            return obj.tolist()
-        elif isinstance(obj, (np.bool_, bool)):
-            return bool(obj)
-        elif hasattr(obj, 'item'):  # For scalar numpy arrays
-            return obj.item()
-        else:
-            # Final fallback for any remaining numpy types
-            try:
-                # Try to convert to Python native type
-                if hasattr(obj, 'dtype'):
-                    if 'int' in str(obj.dtype):
-                        return int(obj)
-                    elif 'float' in str(obj.dtype):
-                        return float(obj)
-                    elif 'bool' in str(obj.dtype):
-                        return bool(obj)
-                return obj
-            except (ValueError, TypeError):
-                # If all else fails, convert to string
-                return str(obj)
+    @staticmethod
+    def persons_from_boxes(data: np.ndarray, person_class_id: Optional[int]) -> List[Dict]:
+        """Person {bbox, confidence} dicts from an (N, 6+) YOLO boxes array"""
+        if person_class_id is None or len(data) == 0:
+            return []
+        rows = data[data[:, -1].astype(np.int64) == person_class_id]
+        return [
+            {'bbox': bbox, 'confidence': confidence}
+            for bbox, confidence in zip(rows[:, :4].astype(np.int64).tolist(), rows[:, -2].astype(np.float64).tolist())
+        ]
+    
+    def get_person_detections(self, max_age: Optional[float] = None) -> Optional[List[Dict]]:
+        """Person boxes from the last YOLO pass, None when unknown (no YOLO, disabled) or older than ``max_age`` s"""
+        if not self.person_detection_enabled or self.person_detections_at is None:
+            return None
+        if max_age is not None and time.time() - self.person_detections_at > max_age:
+            return None
+        return self.person_detections
+    
+    @staticmethod
+    def devices_from_boxes(data: np.ndarray, class_names: List[str], device_types: np.ndarray) -> List[Dict]:
+        """Device dicts (plain Python types) from an (N, 6+) YOLO boxes array, vectorized per column.
+        
+        ``device_types`` is an object array indexed by class id, None for non-device classes.
+        """
+        if len(data) == 0:
+            return []
+        
+        class_ids = data[:, -1].astype(np.int64)
+        keep = class_ids < len(device_types)
+        keep[keep] = np.not_equal(device_types[class_ids[keep]], None)
+        data, class_ids = data[keep], class_ids[keep]
+        if len(data) == 0:
+            return []
+        
+        boxes = data[:, :4].astype(np.float64)
+        widths = boxes[:, 2] - boxes[:, 0]
+        heights = boxes[:, 3] - boxes[:, 1]
+        areas = widths * heights
+        aspect_ratios = np.divide(widths, heights, out=np.ones_like(widths), where=heights > 0)
+        
+        return [
+            {
+                'type': device_types[class_id],
+                'confidence': confidence,
+                'bbox': bbox,
+                'area': area,
+                'aspect_ratio': aspect_ratio,
+                'original_class': class_names[class_id]
+            }
+            for class_id, confidence, bbox, area, aspect_ratio in zip(
+                class_ids.tolist(), data[:, -2].astype(np.float64).tolist(),
+                boxes.astype(np.int64).tolist(), areas.tolist(), aspect_ratios.tolist()
+            )
+        ]
+    
+    # Contour area range (full-resolution pixels) considered by the simple detector
+    SIMPLE_MIN_AREA = 2000
+    SIMPLE_MAX_AREA = 100000
+    
+    def _simple_detection_buffers(self, frame: np.ndarray) -> Dict:
+        """Working images for detect_devices_simple, reallocated only when the frame size changes"""
+        height, width = frame.shape[:2]
+        buffers = self._simple_buffers
+        if buffers.get('source_shape') != (height, width):
+            scale = max(width / self.simple_detection_width, 1.0)
+            size = (int(round(width / scale)), int(round(height / scale)))
+            buffers.clear()
+            buffers.update({
+                'source_shape': (height, width),
+                'scale': scale,
+                'size': size,
+                'small': np.empty((size[1], size[0], 3), dtype=np.uint8),
+                'gray': np.empty((size[1], size[0]), dtype=np.uint8),
+                'edges': np.empty((size[1], size[0]), dtype=np.uint8),
+                'closed': np.empty((size[1], size[0]), dtype=np.uint8)
+            })
+        return buffers
+    
+    @staticmethod
+    def _contour_geometry(contours) -> Tuple[np.ndarray, np.ndarray]:
+        """Areas (shoelace, as cv2.contourArea) and x, y, w, h bounding rects of all contours at once"""
+        lengths = np.fromiter((len(contour) for contour in contours), dtype=np.int64, count=len(contours))
+        points = np.concatenate(contours).reshape(-1, 2).astype(np.int64)
+        starts = np.zeros(len(contours), dtype=np.int64)
+        np.cumsum(lengths[:-1], out=starts[1:])
+        
+        x, y = points[:, 0], points[:, 1]
+        following = np.arange(1, len(points) + 1)
+        following[starts + lengths - 1] = starts  # close each polygon
+        cross = x * y[following] - x[following] * y
+        areas = np.abs(np.add.reduceat(cross, starts)) / 2.0
+        
+        min_x, min_y = np.minimum.reduceat(x, starts), np.minimum.reduceat(y, starts)
+        max_x, max_y = np.maximum.reduceat(x, starts), np.maximum.reduceat(y, starts)
+        rects = np.stack([min_x, min_y, max_x - min_x + 1, max_y - min_y + 1], axis=1)
+        return areas, rects
     
     def detect_devices_simple(self, frame: np.ndarray) -> List[Dict]:
-        """Simple device detection using contours and shapes"""
+        """Simple device detection using contours and shapes (on a frame downscaled to simple_detection_width)"""
         devices = []
+        buffers = self._simple_detection_buffers(frame)
+        scale = buffers['scale']
         
-        # Convert to different color spaces for better detection
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+        # Downscale into the reusable buffers, then grayscale edges
+        if scale > 1.0:
+            small = cv2.resize(frame, buffers['size'], dst=buffers['small'], interpolation=cv2.INTER_AREA)
+        else:
+            small = frame
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY, dst=buffers['gray'])
         
         # Edge detection
-        edges = cv2.Canny(gray, 50, 150)
+        edges = cv2.Canny(gray, 50, 150, edges=buffers['edges'])
         
         # Morphological operations to clean up
-        kernel = np.ones((3,3), np.uint8)
-        edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, kernel)
+        edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, self._simple_kernel, dst=buffers['closed'])
         
         # Find contours
         contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            
-            # Filter by area (devices should have reasonable size)
-            if area < 2000 or area > 100000:
-                continue
-            
-            # Get bounding rectangle
-            x, y, w, h = cv2.boundingRect(contour)
+        if not contours:
+            return devices
+        
+        # Filter by area in one vectorized pass (devices should have reasonable size), in full-resolution pixels
+        areas, rects = self._contour_geometry(contours)
+        areas *= scale * scale
+        candidates = np.flatnonzero((areas >= self.SIMPLE_MIN_AREA) & (areas <= self.SIMPLE_MAX_AREA))
+        
+        for index in candidates.tolist():
+            contour = contours[index]
+            area = float(areas[index])
+            x, y, w, h = rects[index].tolist()
             aspect_ratio = w / h
             
             # Calculate contour properties
@@ -193,10 +315,10 @@ class DeviceDetector:
                 confidence = self._calculate_confidence(aspect_ratio, area, len(approx))
                 devices.append({
                     'type': device_type,
-                    'confidence': float(confidence),  # Ensure Python float
-                    'bbox': [int(x), int(y), int(x + w), int(y + h)],  # Ensure Python int
-                    'area': float(area),  # Ensure Python float
-                    'aspect_ratio': float(aspect_ratio)  # Ensure Python float
+                    'confidence': float(confidence),
+                    'bbox': [int(x * scale), int(y * scale), int((x + w) * scale), int((y + h) * scale)],
+                    'area': area,
+                    'aspect_ratio': float(aspect_ratio)
                 })
         
         return devices
@@ -241,19 +363,23 @@ class DeviceDetector:
         
         return min(base_confidence, 0.95)
     
+    def empty_detection_result(self, detection_method: str) -> Dict:
+        """Detection result without devices (tracking disabled, or no detection has run yet)"""
+        return {
+            'detected_devices': [],
+            'device_counts': {},
+            'total_devices': 0,
+            'timestamp': datetime.now().isoformat(),
+            'distraction_level': 'low',
+            'detection_method': detection_method,
+            'tracking_enabled': self.device_tracking_enabled
+        }
+    
     def detect_devices_in_frame(self, frame: np.ndarray) -> Dict:
         """Detect electronic devices in frame using YOLO or fallback to simple detection"""
         # Return empty result if device tracking is disabled
         if not self.device_tracking_enabled:
-            return {
-                'detected_devices': [],
-                'device_counts': {},
-                'total_devices': 0,
-                'timestamp': datetime.now().isoformat(),
-                'distraction_level': 'low',
-                'detection_method': 'disabled',
-                'tracking_enabled': False
-            }
+            return self.empty_detection_result('disabled')
         
         # Use YOLO detection if available, otherwise fall back to simple detection
         if self.yolo_available and self.yolo_model is not None:
@@ -261,6 +387,10 @@ class DeviceDetector:
         else:
             detected_devices = self.detect_devices_simple(frame)
         
+        # Assign persistent track ids
+        timestamp = datetime.now()
+        detected_devices = self.device_tracker.update(detected_devices, timestamp.timestamp())
+        
         # Count devices by type
         device_counts = {}
         for device in detected_devices:
@@ -270,57 +400,55 @@ class DeviceDetector:
         # Update current devices
         self.current_devices = device_counts
         
-        # Record in history
-        timestamp = datetime.now()
-        history_entry = {
-            'timestamp': timestamp.isoformat(),
-            'devices': device_counts,
-            'total_devices': sum(device_counts.values()),
-            'detection_method': 'yolo' if (self.yolo_available and self.yolo_model is not None) else 'simple'
-        }
-        
-        self.device_history.append(history_entry)
-        
-        # Keep only last 500 entries for performance
-        if len(self.device_history) > 500:
-            self.device_history = self.device_history[-500:]
+        # Record in history (the ring keeps the last 500 entries, the event log everything)
+        distraction_score = self._calculate_distraction_score(device_counts)
+        method = 'yolo' if (self.yolo_available and self.yolo_model is not None) else 'simple'
+        self.device_history.append(timestamp.timestamp(), device_counts, distraction_score, method)
+        if self.event_log is not None:
+            self.event_log.record_devices(timestamp.timestamp(), device_counts, distraction_score, method)
+        self.version += 1
         
         detection_result = {
             'detected_devices': detected_devices,
             'device_counts': device_counts,
             'total_devices': sum(device_counts.values()),
             'timestamp': timestamp.isoformat(),
-            'distraction_level': self._calculate_distraction_level(device_counts),
-            'detection_method': 'yolo' if (self.yolo_available and self.yolo_model is not None) else 'simple',
-            'tracking_enabled': True
+            'distraction_level': self._distraction_level_from_score(distraction_score),
+            'detection_method': method,
+            'tracking_enabled': True,
+            'active_device_counts': self.device_tracker.active_counts(),
+            'persons': self.get_person_detections(max_age=1.0) or []
         }
         
-        # Ensure all values are JSON serializable
-        return self._ensure_json_serializable(detection_result)
+        # Both detectors build plain Python types, the result is JSON serializable as is
+        return detection_result
     
-    def _calculate_distraction_level(self, device_counts: Dict) -> str:
-        """Calculate distraction level based on detected devices"""
-        # Enhanced distraction weights for more device types
-        distraction_weights = {
-            'smartphone': 4,      # High distraction
-            'tablet': 3,          # High distraction
-            'laptop': 1,          # Medium distraction (could be for work)
-            'monitor': 0.5,       # Low distraction (work-related)
-            'book': -1,           # Negative distraction (good for learning)
-            'mouse': 0.2,         # Low distraction
-            'keyboard': 0.2,      # Low distraction
-            'remote': 2,          # Medium distraction
-            'scissors': 0.1,      # Very low distraction
-            'toy': 2,             # Medium distraction
-            'hair_drier': 1,      # Low distraction
-            'toothbrush': 0.1     # Very low distraction
-        }
-        
+    # Enhanced distraction weights for more device types
+    DISTRACTION_WEIGHTS = {
+        'smartphone': 4,      # High distraction
+        'tablet': 3,          # High distraction
+        'laptop': 1,          # Medium distraction (could be for work)
+        'monitor': 0.5,       # Low distraction (work-related)
+        'book': -1,           # Negative distraction (good for learning)
+        'mouse': 0.2,         # Low distraction
+        'keyboard': 0.2,      # Low distraction
+        'remote': 2,          # Medium distraction
+        'scissors': 0.1,      # Very low distraction
+        'toy': 2,             # Medium distraction
+        'hair_drier': 1,      # Low distraction
+        'toothbrush': 0.1     # Very low distraction
+    }
+    
+    def _calculate_distraction_score(self, device_counts: Dict) -> float:
+        """Weighted distraction score of a set of device counts"""
         distraction_score = 0
         for device_type, count in device_counts.items():
-            weight = distraction_weights.get(device_type, 1)
+            weight = self.DISTRACTION_WEIGHTS.get(device_type, 1)
             distraction_score += count * weight
-        
+        return distraction_score
+    
+    @staticmethod
+    def _distraction_level_from_score(distraction_score: float) -> str:
         # Enhanced classification with more nuanced levels
         if distraction_score <= 0:
             return 'low'
@@ -331,87 +459,88 @@ class DeviceDetector:
         else:
             return 'high'
     
-    def annotate_frame_with_devices(self, frame: np.ndarray, detection_result: Dict) -> np.ndarray:
-        """Annotate frame with device detection results"""
-        annotated_frame = frame.copy()
-        
-        # Enhanced color mapping for different device types
-        device_colors = {
-            'smartphone': (0, 0, 255),      # Red - High distraction
-            'tablet': (0, 100, 255),        # Orange-Red - High distraction
-            'laptop': (255, 100, 0),        # Blue - Work device
-            'monitor': (255, 255, 0),       # Cyan - Work device
-            'book': (0, 255, 0),            # Green - Educational
-            'mouse': (255, 0, 255),         # Magenta - Peripheral
-            'keyboard': (255, 0, 200),      # Pink - Peripheral
-            'remote': (0, 255, 255),        # Yellow - Entertainment
-            'scissors': (128, 128, 128),    # Gray - Tool
-            'toy': (0, 150, 255),           # Orange - Distraction
-            'hair_drier': (100, 100, 100),  # Dark gray - Personal item
-            'toothbrush': (50, 50, 50)      # Very dark gray - Personal item
-        }
-        
-        # Draw bounding boxes and labels
-        for device in detection_result['detected_devices']:
+    def associate_devices_to_faces(self, devices: List[Dict], faces: List[Dict],
+                                   persons: Optional[List[Dict]] = None) -> Dict[str, Dict]:
+        """Per-student distraction: each device goes to the nearest student region (grid index).
+        
+        A student's region is the person box containing their face, or else the
+        face box widened and extended down to the desk. Devices further than
+        one region width from every student stay unassigned.
+        """
+        if not faces:
+            return {}
+        
+        person_boxes = [person['bbox'] for person in persons or []]
+        regions = []
+        for face in faces:
+            location = face['face_location']
+            center_x = (location['left'] + location['right']) / 2
+            center_y = (location['top'] + location['bottom']) / 2
+            containing = [box for box in person_boxes
+                          if box[0] <= center_x <= box[2] and box[1] <= center_y <= box[3]]
+            if containing:
+                regions.append(min(containing, key=lambda box: (box[2] - box[0]) * (box[3] - box[1])))
+            else:
+                width = location['right'] - location['left']
+                height = location['bottom'] - location['top']
+                regions.append((location['left'] - width, location['top'],
+                                location['right'] + width, location['bottom'] + 3 * height))
+        
+        widths = sorted(region[2] - region[0] for region in regions)
+        cell_size = max(widths[len(widths) // 2], 32)
+        grid = UniformGrid(cell_size)
+        for region in regions:
+            grid.insert(region)
+        
+        assigned: List[List[Dict]] = [[] for _ in faces]
+        for device in devices:
             x1, y1, x2, y2 = device['bbox']
-            device_type = device['type']
-            confidence = device['confidence']
-            
-            color = device_colors.get(device_type, (255, 255, 255))
-            
-            # Draw bounding box with thickness based on confidence
-            thickness = max(1, int(confidence * 3))
-            cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, thickness)
-            
-            # Prepare label with confidence and type
-            label = f"{device_type}: {confidence:.2f}"
-            if 'original_class' in device:
-                label += f" ({device['original_class']})"
-            
-            # Calculate label dimensions
-            font = cv2.FONT_HERSHEY_SIMPLEX
-            font_scale = 0.6
-            font_thickness = 2
-            (label_w, label_h), baseline = cv2.getTextSize(label, font, font_scale, font_thickness)
-            
-            # Draw label background
-            label_y = y1 - 10 if y1 - 10 > label_h else y1 + label_h + 10
-            cv2.rectangle(annotated_frame, 
-                         (x1, label_y - label_h - 5), 
-                         (x1 + label_w, label_y + baseline), 
-                         color, -1)
-            
-            # Draw label text
-            cv2.putText(annotated_frame, label, (x1, label_y - 5),
-                       font, font_scale, (255, 255, 255), font_thickness)
-        
-        # Add enhanced distraction level indicator
-        distraction_level = detection_result['distraction_level']
-        total_devices = detection_result['total_devices']
-        detection_method = detection_result.get('detection_method', 'simple')
-        
-        # Choose color based on distraction level
-        distraction_colors = {
-            'low': (0, 255, 0),      # Green
-            'medium': (0, 255, 255), # Yellow
-            'high': (0, 0, 255)      # Red
-        }
-        distraction_color = distraction_colors.get(distraction_level, (255, 255, 255))
-        
-        # Create status text
-        status_text = f"Distraction: {distraction_level.upper()} | Devices: {total_devices} | Method: {detection_method.upper()}"
-        
-        # Add semi-transparent background for status
-        overlay = annotated_frame.copy()
-        cv2.rectangle(overlay, (5, 5), (len(status_text) * 12, 40), (0, 0, 0), -1)
-        cv2.addWeighted(overlay, 0.7, annotated_frame, 0.3, 0, annotated_frame)
-        
-        # Draw status text
-        cv2.putText(annotated_frame, status_text, (10, 30),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.8, distraction_color, 2)
-        
+            nearest = grid.nearest((x1 + x2) / 2, (y1 + y2) / 2, max_distance=cell_size)
+            if nearest is not None:
+                assigned[nearest[0]].append(device)
+        
+        distraction = {}
+        for face, face_devices in zip(faces, assigned):
+            device_counts = {}
+            for device in face_devices:
+                device_counts[device['type']] = device_counts.get(device['type'], 0) + 1
+            score = self._calculate_distraction_score(device_counts)
+            distraction[face['face_id']] = {
+                'score': score,
+                'level': self._distraction_level_from_score(score),
+                'devices': [{'type': device['type'], 'track_id': device.get('track_id')} for device in face_devices]
+            }
+        return distraction
+    
+    def _calculate_distraction_level(self, device_counts: Dict) -> str:
+        """Calculate distraction level based on detected devices"""
+        return self._distraction_level_from_score(self._calculate_distraction_score(device_counts))
+    
+    def annotate_frame_with_devices(self, frame: np.ndarray, detection_result: Dict,
+                                    out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Annotate frame with device detection results (in place into ``out`` when given)"""
+        annotated_frame = frame.copy() if out is None else out
+        if out is not None and out is not frame:
+            np.copyto(out, frame)
+
+        draw_devices(annotated_frame, detection_result['detected_devices'])
+        draw_device_status(annotated_frame, detection_result)
         return annotated_frame
     
+    def propagate_detection_result(self, detection_result: Dict) -> Dict:
+        """Last detection result with the tracked boxes moved to the current time (between detections).
+
+        The propagated boxes are the tracks of the last detection's devices, so
+        its counts and distraction level still describe them.
+        """
+        if detection_result['detection_method'] in ('disabled', 'pending'):
+            return detection_result
+        return dict(detection_result, detected_devices=self.device_tracker.predict(time.time()))
+    
+    def get_device_tracks(self, include_finished: bool = True) -> List[Dict]:
+        """Tracked devices with first/last seen and dwell time"""
+        return self.device_tracker.describe(include_finished)
+    
     def get_current_device_summary(self) -> Dict:
         """Get current device detection summary"""
         return {
@@ -421,78 +550,108 @@ class DeviceDetector:
             'timestamp': datetime.now().isoformat()
         }
     
-    def get_device_history(self, minutes: int = 60) -> List[Dict]:
-        """Get device detection history for the last N minutes"""
-        if not self.device_history:
-            return []
-        
-        now = datetime.now()
-        filtered_history = []
+    def pop_summary_change(self, statistics_interval: float = 5.0) -> Optional[Dict]:
+        """Current device summary if it changed since the last call, else None.
+
+        A change in the current devices is reported right away; when only new
+        history was recorded (statistics moved) it is reported at most every
+        ``statistics_interval`` seconds.
+        """
+        summary = {
+            'devices': dict(self.current_devices),
+            'total_devices': sum(self.current_devices.values()),
+            'distraction_level': self._calculate_distraction_level(self.current_devices),
+            'tracking_enabled': self.device_tracking_enabled
+        }
+        now = time.monotonic()
+        history_changed = self.version != self._published_version
         
-        for entry in self.device_history:
-            entry_time = datetime.fromisoformat(entry['timestamp'])
-            time_diff = (now - entry_time).total_seconds() / 60  # Convert to minutes
-            
-            if time_diff <= minutes:
-                filtered_history.append(entry)
+        if summary == self._published_summary and not (
+                history_changed and now - self._published_at >= statistics_interval):
+            return None
         
-        return filtered_history
+        self._published_summary = summary
+        self._published_version = self.version
+        self._published_at = now
+        return dict(summary, timestamp=datetime.now().isoformat())
+    
+    def get_device_history(self, minutes: int = 60) -> List[Dict]:
+        """Get device detection history for the last N minutes"""
+        since = time.time() - minutes * 60
+        if self._ring_covers(since):
+            return self.device_history.entries(since=since)
+        return self.event_log.device_history(since)
+    
+    def _ring_covers(self, since: float) -> bool:
+        """Whether the in-memory ring alone can answer a window starting at ``since``"""
+        if self.event_log is None or self._ring_is_complete():
+            return True
+        # The ring only holds this process's recent entries, older ones (and those from
+        # before a restart) are in the event log
+        oldest = self.device_history.oldest_timestamp()
+        return oldest is not None and oldest <= since
+    
+    def _ring_is_complete(self) -> bool:
+        """Whether the ring holds every detection there is (nothing evicted, no earlier run in the log)"""
+        return not self.device_history.evicted and not self._log_predates_ring
     
     def get_device_statistics(self) -> Dict:
         """Get overall device statistics"""
-        if not self.device_history:
+        if not len(self.device_history):
             return {
                 'total_detections': 0,
                 'device_type_counts': {},
                 'avg_devices_per_detection': 0,
                 'peak_device_count': 0,
-                'avg_distraction_level': 'low'
+                'avg_distraction_level': 'low',
+                'unique_device_counts': dict(self.device_tracker.unique_counts),
+                'active_device_counts': self.device_tracker.active_counts()
             }
         
-        total_detections = len(self.device_history)
-        device_type_counts = {}
-        total_devices = 0
-        peak_count = 0
-        distraction_scores = []
-        
-        for entry in self.device_history:
-            total_devices += entry['total_devices']
-            peak_count = max(peak_count, entry['total_devices'])
-            
-            for device_type, count in entry['devices'].items():
-                device_type_counts[device_type] = device_type_counts.get(device_type, 0) + count
-            
-            # Calculate distraction for this entry
-            distraction_level = self._calculate_distraction_level(entry['devices'])
-            distraction_map = {'low': 1, 'medium': 2, 'high': 3}
-            distraction_scores.append(distraction_map[distraction_level])
+        # Whole-ring aggregates are maintained by DeviceHistoryRing on append/eviction
+        history = self.device_history
+        device_type_counts = {
+            device_type: count
+            for device_type, count in zip(history.device_types, history.type_sums)
+            if count
+        }
         
-        avg_distraction_score = sum(distraction_scores) / len(distraction_scores) if distraction_scores else 1
+        # Distraction level per entry: low=1, medium=2, high=3
+        total_detections = len(history)
+        avg_distraction_score = history.distraction_level_sum / total_detections
         avg_distraction_level = 'low' if avg_distraction_score < 1.5 else 'medium' if avg_distraction_score < 2.5 else 'high'
         
         return {
             'total_detections': total_detections,
             'device_type_counts': device_type_counts,
-            'avg_devices_per_detection': total_devices / total_detections if total_detections > 0 else 0,
-            'peak_device_count': peak_count,
-            'avg_distraction_level': avg_distraction_level
+            'avg_devices_per_detection': history.total_devices_sum / total_detections,
+            'peak_device_count': history.peak_total(),
+            'avg_distraction_level': avg_distraction_level,
+            # Distinct devices (tracks) rather than per-frame boxes
+            'unique_device_counts': dict(self.device_tracker.unique_counts),
+            'active_device_counts': self.device_tracker.active_counts()
         }
     
     def clear_history(self):
         """Clear device detection history"""
-        self.device_history = []
+        self.device_history.clear()
+        self.device_tracker.reset()
+        if self.event_log is not None:
+            self.event_log.clear('devices')
+        self._log_predates_ring = False
         self.current_devices = {}
+        self.version += 1
     
     def get_model_info(self) -> Dict:
         """Get information about the detection model being used"""
         if self.yolo_available and self.yolo_model is not None:
-            return {
-                'model_type': 'YOLOv8',
-                'model_file': 'yolov8n.pt',
-                'available_classes': len(self.yolo_model.names),
+            info = describe_device_model(self.model_config, self.yolo_model_path)
+            info.update({
+                'available_classes': len(self.yolo_class_names),
                 'target_device_classes': list(self.target_device_classes.keys()),
                 'status': 'active'
-            }
+            })
+            return info
         else:
             return {
                 'model_type': 'Simple Contour Detection',
@@ -509,6 +668,7 @@ class DeviceDetector:
     def set_device_tracking_enabled(self, enabled: bool):
         """Enable or disable device tracking"""
         self.device_tracking_enabled = enabled
+        self.version += 1
         print(f"Device tracking {'enabled' if enabled else 'disabled'}")
     
     def is_device_tracking_enabled(self) -> bool:
@@ -517,33 +677,38 @@ class DeviceDetector:
     
     def get_device_type_history(self, device_type: str, hours: int = 24) -> List[Dict]:
         """Get history for a specific device type over the last N hours"""
-        if not self.device_history:
-            return []
-        
-        now = datetime.now()
-        filtered_history = []
-        
-        for entry in self.device_history:
-            entry_time = datetime.fromisoformat(entry['timestamp'])
-            time_diff = (now - entry_time).total_seconds() / 3600  # Convert to hours
-            
-            if time_diff <= hours:
-                # Only include entries where this device type was detected
-                if device_type in entry['devices'] and entry['devices'][device_type] > 0:
-                    filtered_history.append({
-                        'timestamp': entry['timestamp'],
-                        'count': entry['devices'][device_type],
-                        'total_devices': entry['total_devices'],
-                        'detection_method': entry.get('detection_method', 'unknown')
-                    })
-        
-        return filtered_history
+        since = time.time() - hours * 3600
+        if self._ring_covers(since):
+            return self.device_history.type_entries(device_type, since=since)
+        return self.event_log.device_type_history(device_type, since)
     
     def get_device_timeline_stats(self, device_type: str, hours: int = 24) -> Dict:
         """Get comprehensive statistics for a device type over time"""
-        history = self.get_device_type_history(device_type, hours)
+        since = time.time() - hours * 3600
+        oldest = self.device_history.oldest_timestamp()
+        timeline = None
+        
+        if not self._ring_covers(since):
+            # Older than the ring: per-minute/hour rollups of the event log
+            summary = self.event_log.device_type_summary(device_type, since)
+            timeline = self.event_log.device_type_history(device_type, since, limit=50)
+        elif oldest is not None and oldest >= since:
+            # The window covers the whole ring and the ring is complete: read the running aggregates
+            summary = self.device_history.type_summary(device_type)
+        else:
+            rows = self.device_history.rows(since)
+            counts = self.device_history.counts(rows, device_type)
+            timestamps = self.device_history.timestamps(rows)[counts > 0]
+            counts = counts[counts > 0]
+            summary = {
+                'entries': len(counts),
+                'count_sum': int(counts.sum()),
+                'peak': int(counts.max()) if len(counts) else 0,
+                'first_seen': float(timestamps[0]) if len(timestamps) else None,
+                'last_seen': float(timestamps[-1]) if len(timestamps) else None
+            }
         
-        if not history:
+        if not summary['entries']:
             return {
                 'device_type': device_type,
                 'total_detections': 0,
@@ -555,27 +720,25 @@ class DeviceDetector:
                 'timeline': []
             }
         
-        # Calculate statistics
-        counts = [entry['count'] for entry in history]
-        timestamps = [entry['timestamp'] for entry in history]
-        
+        if timeline is None:
+            timeline = self.device_history.type_entries(device_type, since=since, limit=50)
+        first_seen, last_seen = iso_timestamps(np.array([summary['first_seen'], summary['last_seen']]))
         return {
             'device_type': device_type,
-            'total_detections': len(history),
-            'first_seen': min(timestamps),
-            'last_seen': max(timestamps),
-            'peak_count': max(counts),
-            'average_count': sum(counts) / len(counts),
-            'detection_frequency': len(history) / hours,  # detections per hour
-            'timeline': history[-50:]  # Last 50 entries for timeline visualization
+            'total_detections': summary['entries'],
+            'first_seen': first_seen,
+            'last_seen': last_seen,
+            'peak_count': summary['peak'],
+            'average_count': summary['count_sum'] / summary['entries'],
+            'detection_frequency': summary['entries'] / hours,  # detections per hour
+            # Last 50 entries for timeline visualization
+            'timeline': timeline
         }
     
     def get_all_device_types_detected(self) -> List[str]:
         """Get all device types that have been detected in history"""
-        device_types = set()
-        for entry in self.device_history:
-            device_types.update(entry['devices'].keys())
-        return sorted(list(device_types))
+        history = self.device_history
+        return sorted(device_type for device_type, count in zip(history.device_types, history.type_sums) if count)
     
     def get_supported_devices(self) -> List[str]:
         """Get list of supported device types"""
@@ -586,7 +749,7 @@ class DeviceDetector:
         try:
             data = {
                 'current_devices': self.current_devices,
-                'history': self.device_history,
+                'history': self.device_history.entries(),
                 'statistics': self.get_device_statistics(),
                 'model_info': self.get_model_info(),
                 'supported_devices': self.get_supported_devices(),
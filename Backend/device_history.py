@@ -0,0 +1,263 @@
+from collections import deque
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from time_columns import iso_timestamps
+
+
+class DeviceHistoryRing:
+    """Fixed-capacity device history stored as preallocated numpy columns.
+
+    Columns: epoch timestamp, per-device-type count, total devices,
+    distraction score and detection method. Entries are appended in time
+    order, so time-window queries are binary searches; dicts are only built
+    for the entries a query returns.
+
+    Aggregates over the whole ring (sums, distraction level total, peaks via
+    monotonic deques, first/last sighting per type) are updated on every
+    append and eviction, so whole-window statistics are O(1) reads.
+    """
+
+    def __init__(self, capacity: int = 500, device_types: Optional[List[str]] = None):
+        self.capacity = capacity
+        self.device_types: List[str] = []
+        self._type_index: Dict[str, int] = {}
+        self.methods: List[str] = []
+        self._method_index: Dict[str, int] = {}
+
+        self._timestamps = np.zeros(capacity, dtype=np.float64)
+        self._counts = np.zeros((capacity, 0), dtype=np.int32)
+        self._totals = np.zeros(capacity, dtype=np.int32)
+        self._distraction_scores = np.zeros(capacity, dtype=np.float32)
+        # Level code computed from the float64 score at append time, the float32
+        # score can round across a level boundary and must not be re-classified
+        self._level_codes = np.zeros(capacity, dtype=np.uint8)
+        self._method_codes = np.zeros(capacity, dtype=np.uint8)
+
+        self._start = 0
+        self._size = 0
+        self._reset_aggregates()
+
+        for device_type in device_types or []:
+            self._type_column(device_type)
+
+    def _reset_aggregates(self):
+        # Sequence number of the next appended entry (the oldest entry is _seq - _size)
+        self._seq = 0
+        self.total_devices_sum = 0
+        self.distraction_level_sum = 0
+        self._peak_totals = deque()  # (seq, total), totals decreasing
+        self.type_sums: List[int] = [0] * len(self.device_types)
+        self._type_present = [deque() for _ in self.device_types]  # (seq, timestamp) where count > 0
+        self._type_peaks = [deque() for _ in self.device_types]  # (seq, count), counts decreasing
+
+    @staticmethod
+    def distraction_level_code(distraction_score: float) -> int:
+        """low=1, medium=2, high=3 (same thresholds as DeviceDetector)"""
+        return 1 if distraction_score <= 1 else 2 if distraction_score <= 3 else 3
+
+    @staticmethod
+    def _push_peak(peaks: deque, seq: int, value: int):
+        while peaks and peaks[-1][1] <= value:
+            peaks.pop()
+        peaks.append((seq, value))
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def evicted(self) -> bool:
+        """Whether entries have been overwritten since the last clear"""
+        return self._seq > self._size
+
+    def _type_column(self, device_type: str) -> int:
+        column = self._type_index.get(device_type)
+        if column is None:
+            column = len(self.device_types)
+            self.device_types.append(device_type)
+            self._type_index[device_type] = column
+            self._counts = np.pad(self._counts, ((0, 0), (0, 1)))
+            self.type_sums.append(0)
+            self._type_present.append(deque())
+            self._type_peaks.append(deque())
+        return column
+
+    def _method_code(self, method: str) -> int:
+        code = self._method_index.get(method)
+        if code is None:
+            code = len(self.methods)
+            self.methods.append(method)
+            self._method_index[method] = code
+        return code
+
+    def append(self, timestamp: float, device_counts: Dict[str, int], distraction_score: float, method: str):
+        """Record one detection, overwriting the oldest entry once the ring is full"""
+        columns = [self._type_column(device_type) for device_type in device_counts]
+        if self._size < self.capacity:
+            row = (self._start + self._size) % self.capacity
+            self._size += 1
+        else:
+            row = self._start
+            self._evict(row, self._seq - self.capacity)
+            self._start = (self._start + 1) % self.capacity
+
+        total = sum(device_counts.values())
+        self._timestamps[row] = timestamp
+        self._counts[row] = 0
+        self._counts[row, columns] = list(device_counts.values())
+        self._totals[row] = total
+        self._distraction_scores[row] = distraction_score
+        level_code = self.distraction_level_code(distraction_score)
+        self._level_codes[row] = level_code
+        self._method_codes[row] = self._method_code(method)
+
+        seq = self._seq
+        self._seq += 1
+        self.total_devices_sum += total
+        self.distraction_level_sum += level_code
+        self._push_peak(self._peak_totals, seq, total)
+        for column, count in zip(columns, device_counts.values()):
+            if count > 0:
+                self.type_sums[column] += count
+                self._type_present[column].append((seq, timestamp))
+                self._push_peak(self._type_peaks[column], seq, count)
+
+    def _evict(self, row: int, seq: int):
+        """Remove the oldest entry (``row``, sequence ``seq``) from the aggregates"""
+        self.total_devices_sum -= int(self._totals[row])
+        self.distraction_level_sum -= int(self._level_codes[row])
+        if self._peak_totals and self._peak_totals[0][0] == seq:
+            self._peak_totals.popleft()
+        for column in np.flatnonzero(self._counts[row]).tolist():
+            self.type_sums[column] -= int(self._counts[row, column])
+            if self._type_present[column] and self._type_present[column][0][0] == seq:
+                self._type_present[column].popleft()
+            if self._type_peaks[column] and self._type_peaks[column][0][0] == seq:
+                self._type_peaks[column].popleft()
+
+    def clear(self):
+        self._start = 0
+        self._size = 0
+        self._reset_aggregates()
+
+    def peak_total(self) -> int:
+        return self._peak_totals[0][1] if self._peak_totals else 0
+
+    def oldest_timestamp(self) -> Optional[float]:
+        return float(self._timestamps[self._start]) if self._size else None
+
+    def type_summary(self, device_type: str) -> Dict:
+        """Whole-ring aggregates for one device type: entries seen in, count sum, peak, first/last time"""
+        column = self._type_index.get(device_type)
+        if column is None or not self._type_present[column]:
+            return {'entries': 0, 'count_sum': 0, 'peak': 0, 'first_seen': None, 'last_seen': None}
+        present = self._type_present[column]
+        return {
+            'entries': len(present),
+            'count_sum': self.type_sums[column],
+            'peak': self._type_peaks[column][0][1],
+            'first_seen': present[0][1],
+            'last_seen': present[-1][1]
+        }
+
+    def rows(self, since: Optional[float] = None) -> np.ndarray:
+        """Physical row indices, oldest first, of entries at or after ``since`` (epoch seconds)"""
+        first_len = min(self._size, self.capacity - self._start)
+        first = self._timestamps[self._start:self._start + first_len]
+        second = self._timestamps[:self._size - first_len]
+
+        if since is None:
+            offset = 0
+        elif first_len and since <= first[-1]:
+            offset = int(np.searchsorted(first, since, side='left'))
+        else:
+            offset = first_len + int(np.searchsorted(second, since, side='left'))
+
+        return (self._start + np.arange(offset, self._size)) % self.capacity
+
+    def timestamps(self, rows: np.ndarray) -> np.ndarray:
+        return self._timestamps[rows]
+
+    def counts(self, rows: np.ndarray, device_type: Optional[str] = None) -> np.ndarray:
+        """Per-type count matrix for ``rows``, or a single column for ``device_type``"""
+        if device_type is None:
+            return self._counts[rows]
+        column = self._type_index.get(device_type)
+        if column is None:
+            return np.zeros(len(rows), dtype=np.int32)
+        return self._counts[rows, column]
+
+    def totals(self, rows: np.ndarray) -> np.ndarray:
+        return self._totals[rows]
+
+    def distraction_scores(self, rows: np.ndarray) -> np.ndarray:
+        return self._distraction_scores[rows]
+
+    def _build_entries(self, timestamps: np.ndarray, counts: np.ndarray, totals: np.ndarray,
+                       method_codes: np.ndarray) -> List[Dict]:
+        types = self.device_types
+        methods = self.methods
+        return [
+            {
+                'timestamp': timestamp,
+                'devices': {types[i]: count for i, count in enumerate(row_counts) if count},
+                'total_devices': total,
+                'detection_method': methods[method]
+            }
+            for timestamp, row_counts, total, method in zip(
+                iso_timestamps(timestamps), counts.tolist(), totals.tolist(), method_codes.tolist()
+            )
+        ]
+
+    def entries(self, since: Optional[float] = None) -> List[Dict]:
+        """History entries (same shape as the former list of dicts) at or after ``since``"""
+        rows = self.rows(since)
+        return self._build_entries(self._timestamps[rows], self._counts[rows], self._totals[rows],
+                                   self._method_codes[rows])
+
+    def entry_chunks(self, chunk_size: int = 1000, since: Optional[float] = None) -> Iterator[List[Dict]]:
+        """``entries`` as lists of at most ``chunk_size`` dicts, for streaming exports.
+
+        The numeric columns are copied when this is called (cheap next to the
+        dicts), so the chunks can be built on another thread and appends that
+        overwrite ring rows during the export do not leak in.
+        """
+        rows = self.rows(since)
+        timestamps, counts = self._timestamps[rows], self._counts[rows]
+        totals, method_codes = self._totals[rows], self._method_codes[rows]
+
+        def chunks():
+            for start in range(0, len(rows), chunk_size):
+                end = start + chunk_size
+                yield self._build_entries(timestamps[start:end], counts[start:end], totals[start:end],
+                                          method_codes[start:end])
+
+        return chunks()
+
+    def type_entries(self, device_type: str, since: Optional[float] = None,
+                     limit: Optional[int] = None) -> List[Dict]:
+        """Entries at or after ``since`` in which ``device_type`` was detected (only the last ``limit``)"""
+        rows = self.rows(since)
+        type_counts = self.counts(rows, device_type)
+        rows = rows[type_counts > 0]
+        type_counts = type_counts[type_counts > 0]
+        if limit is not None:
+            rows, type_counts = rows[-limit:], type_counts[-limit:]
+        return [
+            {
+                'timestamp': timestamp,
+                'count': count,
+                'total_devices': total,
+                'detection_method': self.methods[method]
+            }
+            for timestamp, count, total, method in zip(
+                iso_timestamps(self._timestamps[rows]), type_counts.tolist(),
+                self._totals[rows].tolist(), self._method_codes[rows].tolist()
+            )
+        ]
+
+    def last_timestamp(self) -> Optional[float]:
+        if not self._size:
+            return None
+        return float(self._timestamps[(self._start + self._size - 1) % self.capacity])
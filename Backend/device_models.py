@@ -0,0 +1,137 @@
+import os
+import shutil
+from dataclasses import asdict, dataclass, replace
+from typing import Dict, Tuple
+
+import numpy as np
+
+BACKENDS = ('pytorch', 'onnx', 'openvino')
+PRECISIONS = ('fp32', 'fp16', 'int8')
+
+# Export format and cached file suffix per backend
+_EXPORT_FORMATS = {'onnx': ('onnx', '.onnx'), 'openvino': ('openvino', '_openvino_model')}
+
+
+@dataclass(frozen=True)
+class DeviceModelConfig:
+    """Which YOLO model the device detector runs and how.
+
+    ``variant`` is an ultralytics weight name without extension (yolov5s,
+    yolov8n, ...). ``imgsz`` is the inference input size. ``fp16`` only
+    applies to PyTorch on a GPU, ``int8`` only to OpenVINO (post-training
+    quantization during export).
+    """
+    variant: str = 'yolov5s'
+    imgsz: int = 640
+    precision: str = 'fp32'
+    backend: str = 'pytorch'
+    cache_dir: str = './model/yolo_cache'
+
+    def __post_init__(self):
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{self.backend}', expected one of {BACKENDS}")
+        if self.precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision '{self.precision}', expected one of {PRECISIONS}")
+        if self.precision == 'int8' and self.backend != 'openvino':
+            raise ValueError("int8 precision is only supported with the openvino backend")
+
+    @property
+    def name(self) -> str:
+        return f"{self.variant}-{self.backend}-{self.precision}-{self.imgsz}"
+
+    @property
+    def weights(self) -> str:
+        return f"{self.variant}.pt"
+
+    def cached_path(self) -> str:
+        """Where the exported model for this config lives (the .pt weights for PyTorch)"""
+        if self.backend == 'pytorch':
+            return self.weights
+        _, suffix = _EXPORT_FORMATS[self.backend]
+        return os.path.join(self.cache_dir, f"{self.variant}_{self.imgsz}_{self.precision}{suffix}")
+
+    def predict_kwargs(self) -> Dict:
+        return {'imgsz': self.imgsz, 'half': self.precision == 'fp16'}
+
+    @classmethod
+    def from_env(cls) -> 'DeviceModelConfig':
+        """Profile from DEVICE_MODEL (see DEVICE_MODEL_PROFILES) with DEVICE_MODEL_VARIANT/IMGSZ/PRECISION/BACKEND overrides"""
+        profile = os.environ.get('DEVICE_MODEL', 'default')
+        if profile not in DEVICE_MODEL_PROFILES:
+            raise ValueError(f"Unknown DEVICE_MODEL '{profile}', expected one of {list(DEVICE_MODEL_PROFILES)}")
+        config = DEVICE_MODEL_PROFILES[profile]
+        overrides = {}
+        for field, cast in (('variant', str), ('imgsz', int), ('precision', str), ('backend', str)):
+            value = os.environ.get(f"DEVICE_MODEL_{field.upper()}")
+            if value:
+                overrides[field] = cast(value)
+        return replace(config, **overrides) if overrides else config
+
+
+# Named configurations, 'default' keeps the model the detector always used
+DEVICE_MODEL_PROFILES: Dict[str, DeviceModelConfig] = {
+    'default': DeviceModelConfig('yolov5s', 640, 'fp32', 'pytorch'),
+    'yolov8n': DeviceModelConfig('yolov8n', 640, 'fp32', 'pytorch'),
+    'yolov8n-gpu-fp16': DeviceModelConfig('yolov8n', 640, 'fp16', 'pytorch'),
+    'yolov8n-onnx-416': DeviceModelConfig('yolov8n', 416, 'fp32', 'onnx'),
+    'yolov8n-openvino-416': DeviceModelConfig('yolov8n', 416, 'fp32', 'openvino'),
+    'yolov8n-openvino-int8-416': DeviceModelConfig('yolov8n', 416, 'int8', 'openvino'),
+    'yolov8s-openvino-int8-640': DeviceModelConfig('yolov8s', 640, 'int8', 'openvino'),
+}
+
+
+def export_device_model(config: DeviceModelConfig, force: bool = False) -> str:
+    """Export the config's weights to its backend once and cache the result, returns the model path"""
+    path = config.cached_path()
+    if config.backend == 'pytorch' or (os.path.exists(path) and not force):
+        return path
+
+    from ultralytics import YOLO
+
+    export_format, _ = _EXPORT_FORMATS[config.backend]
+    print(f"Exporting {config.weights} to {config.backend} ({config.precision}, imgsz={config.imgsz})...")
+    exported = YOLO(config.weights).export(
+        format=export_format,
+        imgsz=config.imgsz,
+        half=config.precision == 'fp16',
+        int8=config.precision == 'int8'
+    )
+
+    os.makedirs(config.cache_dir, exist_ok=True)
+    if os.path.exists(path):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+    shutil.move(str(exported), path)
+    print(f"Cached exported model at {path}")
+    return path
+
+
+def load_device_model(config: DeviceModelConfig) -> Tuple[object, str, Dict[int, str]]:
+    """Load (exporting first if needed) the model, returns (model, model path, class names by id)"""
+    from ultralytics import YOLO
+
+    path = export_device_model(config)
+    model = YOLO(path, task='detect')
+    # ultralytics may substitute weights (e.g. yolov5s.pt -> yolov5su.pt), report the file actually loaded
+    path = getattr(model, 'ckpt_path', None) or path
+
+    names = getattr(model, 'names', None)
+    if not names:
+        # Exported models only know their class names once a predictor is set up
+        model.predict(np.zeros((config.imgsz, config.imgsz, 3), dtype=np.uint8), verbose=False,
+                      **config.predict_kwargs())
+        names = model.predictor.model.names
+    names = dict(enumerate(names)) if isinstance(names, (list, tuple)) else dict(names)
+    return model, path, names
+
+
+def describe_device_model(config: DeviceModelConfig, path: str) -> Dict:
+    """Model info fields for a loaded config"""
+    info = asdict(config)
+    info.pop('cache_dir')
+    info['model_type'] = config.variant.upper().replace('YOLOV', 'YOLOv')
+    info['model_file'] = path
+    info['profile'] = config.name
+    return info
@@ -0,0 +1,229 @@
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+def iou_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of two (N, 4) / (M, 4) arrays of x1, y1, x2, y2 boxes"""
+    boxes_a = boxes_a[:, None, :]
+    boxes_b = boxes_b[None, :, :]
+    width = np.clip(np.minimum(boxes_a[..., 2], boxes_b[..., 2]) - np.maximum(boxes_a[..., 0], boxes_b[..., 0]), 0, None)
+    height = np.clip(np.minimum(boxes_a[..., 3], boxes_b[..., 3]) - np.maximum(boxes_a[..., 1], boxes_b[..., 1]), 0, None)
+    intersection = width * height
+    area_a = (boxes_a[..., 2] - boxes_a[..., 0]) * (boxes_a[..., 3] - boxes_a[..., 1])
+    area_b = (boxes_b[..., 2] - boxes_b[..., 0]) * (boxes_b[..., 3] - boxes_b[..., 1])
+    union = area_a + area_b - intersection
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+
+def _box_to_measurement(bbox) -> np.ndarray:
+    x1, y1, x2, y2 = bbox
+    width, height = max(x2 - x1, 1.0), max(y2 - y1, 1.0)
+    return np.array([x1 + width / 2, y1 + height / 2, width * height, width / height], dtype=np.float64)
+
+
+def _state_to_box(state: np.ndarray) -> np.ndarray:
+    area, ratio = max(state[2], 1.0), max(state[3], 1e-3)
+    width = np.sqrt(area * ratio)
+    height = area / width
+    return np.array([state[0] - width / 2, state[1] - height / 2, state[0] + width / 2, state[1] + height / 2])
+
+
+class DeviceTrack:
+    """One tracked device: a constant-velocity Kalman filter over (cx, cy, area, aspect ratio).
+
+    The state is anchored at the time of the last detection; ``box_at``
+    extrapolates without modifying it, so boxes can be propagated for any
+    number of frames between detections.
+    """
+
+    # Measurement noise and process noise (per second) of the SORT formulation
+    _R = np.diag([1.0, 1.0, 10.0, 10.0])
+    _Q = np.diag([1.0, 1.0, 1.0, 0.01, 0.01, 0.01, 0.0001]) * 30
+    _H = np.hstack([np.eye(4), np.zeros((4, 3))])
+
+    def __init__(self, track_id: int, device: Dict, seen_at: float):
+        self.track_id = track_id
+        self.device_type = device['type']
+        self.original_class = device.get('original_class')
+        self.confidence = device['confidence']
+        self.first_seen = seen_at
+        self.last_seen = seen_at
+        self.hits = 1
+
+        self.state = np.zeros(7)
+        self.state[:4] = _box_to_measurement(device['bbox'])
+        self.covariance = np.diag([10.0, 10.0, 10.0, 10.0, 1e4, 1e4, 1e4])
+
+    @staticmethod
+    def _transition(dt: float) -> np.ndarray:
+        transition = np.eye(7)
+        transition[0, 4] = transition[1, 5] = transition[2, 6] = dt
+        return transition
+
+    def box_at(self, now: float) -> np.ndarray:
+        """Extrapolated x1, y1, x2, y2 box at ``now`` (epoch seconds)"""
+        return _state_to_box(self._transition(max(now - self.last_seen, 0.0)) @ self.state)
+
+    def update(self, device: Dict, seen_at: float):
+        """Kalman predict to ``seen_at`` and correct with the detected box"""
+        dt = max(seen_at - self.last_seen, 0.0)
+        transition = self._transition(dt)
+        state = transition @ self.state
+        covariance = transition @ self.covariance @ transition.T + self._Q * max(dt, 1e-3)
+
+        residual = _box_to_measurement(device['bbox']) - self._H @ state
+        innovation = self._H @ covariance @ self._H.T + self._R
+        gain = covariance @ self._H.T @ np.linalg.inv(innovation)
+        self.state = state + gain @ residual
+        self.covariance = (np.eye(7) - gain @ self._H) @ covariance
+
+        self.confidence = device['confidence']
+        self.last_seen = seen_at
+        self.hits += 1
+
+    @property
+    def dwell_seconds(self) -> float:
+        return self.last_seen - self.first_seen
+
+    def to_dict(self, active: bool) -> Dict:
+        return {
+            'track_id': self.track_id,
+            'type': self.device_type,
+            'first_seen': datetime.fromtimestamp(self.first_seen).isoformat(),
+            'last_seen': datetime.fromtimestamp(self.last_seen).isoformat(),
+            'dwell_seconds': self.dwell_seconds,
+            'detections': self.hits,
+            'active': active
+        }
+
+
+class DeviceTracker:
+    """SORT-style multi-object tracker over device detections.
+
+    Detections are associated with the tracks of the same device type by
+    greedy IoU matching against the Kalman-predicted boxes. A track counts
+    as a unique device once it has been detected ``min_hits`` times, and is
+    retired after ``max_age`` seconds without a detection (time based, so
+    it works with any detection cadence).
+    """
+
+    def __init__(self, iou_threshold: float = 0.2, max_age: float = 6.0, min_hits: int = 2,
+                 finished_capacity: int = 500):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.min_hits = min_hits
+
+        self.tracks: List[DeviceTrack] = []
+        self.finished = deque(maxlen=finished_capacity)
+        # Confirmed tracks per device type since the last reset
+        self.unique_counts: Dict[str, int] = {}
+        self._next_id = 1
+        # Time of the last ``update``, the tracks detected then have last_seen == this
+        self._last_update: Optional[float] = None
+
+    def reset(self):
+        self.tracks = []
+        self.finished.clear()
+        self.unique_counts = {}
+        self._next_id = 1
+        self._last_update = None
+
+    def _confirm(self, track: DeviceTrack):
+        if track.hits == self.min_hits:
+            self.unique_counts[track.device_type] = self.unique_counts.get(track.device_type, 0) + 1
+
+    def update(self, devices: List[Dict], now: float) -> List[Dict]:
+        """Associate one frame's detections with tracks, returns the devices with ``track_id`` added"""
+        self._last_update = now
+        tracked = [dict(device) for device in devices]
+        unmatched = set(range(len(devices)))
+
+        for device_type in {device['type'] for device in devices}:
+            detection_indices = [i for i, device in enumerate(devices) if device['type'] == device_type]
+            candidates = [track for track in self.tracks if track.device_type == device_type]
+            if not candidates:
+                continue
+
+            predicted = np.stack([track.box_at(now) for track in candidates])
+            detected = np.array([devices[i]['bbox'] for i in detection_indices], dtype=np.float64)
+            overlaps = iou_matrix(predicted, detected)
+
+            # Greedy assignment, highest IoU first
+            track_rows, detection_cols = np.nonzero(overlaps >= self.iou_threshold)
+            order = np.argsort(-overlaps[track_rows, detection_cols], kind='stable')
+            used_tracks, used_detections = set(), set()
+            for row, col in zip(track_rows[order].tolist(), detection_cols[order].tolist()):
+                if row in used_tracks or col in used_detections:
+                    continue
+                used_tracks.add(row)
+                used_detections.add(col)
+                index = detection_indices[col]
+                track = candidates[row]
+                track.update(devices[index], now)
+                self._confirm(track)
+                tracked[index]['track_id'] = track.track_id
+                unmatched.discard(index)
+
+        for index in sorted(unmatched):
+            track = DeviceTrack(self._next_id, devices[index], now)
+            self._next_id += 1
+            self.tracks.append(track)
+            self._confirm(track)
+            tracked[index]['track_id'] = track.track_id
+
+        # Retire tracks that have not been detected for max_age seconds
+        alive = []
+        for track in self.tracks:
+            if now - track.last_seen > self.max_age:
+                if track.hits >= self.min_hits:
+                    self.finished.append(track)
+            else:
+                alive.append(track)
+        self.tracks = alive
+        return tracked
+
+    def predict(self, now: float) -> List[Dict]:
+        """Device dicts with boxes propagated to ``now``, for frames between detections.
+
+        Only the tracks detected in the last ``update`` are propagated (coasting
+        tracks are not), so the boxes are exactly the devices the last
+        detection result counted.
+        """
+        devices = []
+        if self._last_update is None or now == self._last_update:
+            return devices
+        for track in self.tracks:
+            if track.last_seen != self._last_update:
+                continue
+            x1, y1, x2, y2 = track.box_at(now).tolist()
+            width, height = x2 - x1, y2 - y1
+            device = {
+                'type': track.device_type,
+                'confidence': track.confidence,
+                'bbox': [int(x1), int(y1), int(x2), int(y2)],
+                'area': width * height,
+                'aspect_ratio': width / height if height > 0 else 1.0,
+                'track_id': track.track_id,
+                'predicted': True
+            }
+            if track.original_class:
+                device['original_class'] = track.original_class
+            devices.append(device)
+        return devices
+
+    def describe(self, include_finished: bool = True) -> List[Dict]:
+        """Confirmed tracks (active first) with first/last seen and dwell time"""
+        tracks = [track.to_dict(active=True) for track in self.tracks if track.hits >= self.min_hits]
+        if include_finished:
+            tracks.extend(track.to_dict(active=False) for track in reversed(self.finished))
+        return tracks
+
+    def active_counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for track in self.tracks:
+            if track.hits >= self.min_hits:
+                counts[track.device_type] = counts.get(track.device_type, 0) + 1
+        return counts
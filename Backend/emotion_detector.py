@@ -4,10 +4,11 @@ import face_recognition
 from keras.models import load_model
 from datetime import datetime
 import asyncio
-import base64
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 import os
 
+from frame_compositor import draw_face_detections
+
 IMG_SIZE = (48, 48)
 
 class EmotionDetector:
@@ -63,17 +64,61 @@ class EmotionDetector:
         
         return min(max(concentration * 100, 0), 100)  # Clamp between 0-100
     
-    def detect_emotions_in_frame(self, frame: np.ndarray) -> List[Dict]:
-        """Detect faces and emotions in a frame"""
+    @staticmethod
+    def _padded_region(bbox: List[int], padding: float, height: int, width: int) -> Tuple[int, int, int, int]:
+        """(top, right, bottom, left) of an x1, y1, x2, y2 box grown by ``padding`` of its size, clipped to the frame"""
+        x1, y1, x2, y2 = bbox
+        pad_x, pad_y = int((x2 - x1) * padding), int((y2 - y1) * padding)
+        return max(y1 - pad_y, 0), min(x2 + pad_x, width), min(y2 + pad_y, height), max(x1 - pad_x, 0)
+    
+    def locate_faces(self, rgb_frame: np.ndarray, search_regions: Optional[List[List[int]]] = None,
+                     padding: float = 0.15) -> List[Tuple[int, int, int, int]]:
+        """Face locations (top, right, bottom, left) in the whole frame, or only inside the padded search regions"""
+        if search_regions is None:
+            return face_recognition.face_locations(rgb_frame)
+        
+        height, width = rgb_frame.shape[:2]
+        locations = []
+        for bbox in search_regions:
+            top, right, bottom, left = self._padded_region(bbox, padding, height, width)
+            if bottom - top < 20 or right - left < 20:
+                continue
+            crop = rgb_frame[top:bottom, left:right]
+            for face_top, face_right, face_bottom, face_left in face_recognition.face_locations(crop):
+                location = (face_top + top, face_right + left, face_bottom + top, face_left + left)
+                # Overlapping person regions can find the same face twice
+                if not any(self._overlap(location, found) > 0.5 for found in locations):
+                    locations.append(location)
+        return locations
+    
+    @staticmethod
+    def _overlap(a: Tuple[int, int, int, int], b: Tuple[int, int, int, int]) -> float:
+        """IoU of two (top, right, bottom, left) boxes"""
+        height = min(a[2], b[2]) - max(a[0], b[0])
+        width = min(a[1], b[1]) - max(a[3], b[3])
+        if height <= 0 or width <= 0:
+            return 0.0
+        intersection = height * width
+        union = (a[2] - a[0]) * (a[1] - a[3]) + (b[2] - b[0]) * (b[1] - b[3]) - intersection
+        return intersection / union
+    
+    def detect_emotions_in_frame(self, frame: np.ndarray, search_regions: Optional[List[List[int]]] = None) -> List[Dict]:
+        """Detect faces and emotions in a frame.
+        
+        ``search_regions`` (x1, y1, x2, y2 boxes, e.g. YOLO person detections)
+        restricts the face scan to those padded regions; None scans the whole frame.
+        """
         if self.model is None:
             return []
         
         results = []
-        gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
         rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         
         # Detect faces using face_recognition for better accuracy
-        face_locations = face_recognition.face_locations(rgb_frame)
+        face_locations = self.locate_faces(rgb_frame, search_regions)
+        if not face_locations:
+            return []
+        # Encodings only compute landmarks for the known locations, on the full frame
         face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
         
         for (top, right, bottom, left), face_encoding in zip(face_locations, face_encodings):
@@ -96,17 +141,14 @@ class EmotionDetector:
                 confidence = float(prediction[max_index] * 100)
                 concentration = self.calculate_concentration(prediction)
                 
-                # Convert face image to base64 for transmission
-                _, buffer = cv2.imencode('.jpg', face_img)
-                face_image_b64 = base64.b64encode(buffer).decode('utf-8')
-                
                 results.append({
                     'face_encoding': face_encoding,
                     'face_location': {'top': top, 'right': right, 'bottom': bottom, 'left': left},
                     'emotion': emotion,
                     'confidence': confidence,
                     'concentration': concentration,
-                    'face_image': face_image_b64,
+                    # Raw crop (a view of the frame), thumbnails are encoded on demand by the thumbnail store
+                    'face_crop': face_img,
                     'timestamp': datetime.now().isoformat()
                 })
             except Exception as e:
@@ -115,27 +157,12 @@ class EmotionDetector:
         
         return results
     
-    def annotate_frame(self, frame: np.ndarray, detections: List[Dict]) -> np.ndarray:
-        """Annotate frame with detection results"""
-        annotated_frame = frame.copy()
-        
-        for detection in detections:
-            loc = detection['face_location']
-            emotion = detection['emotion']
-            confidence = detection['confidence']
-            concentration = detection['concentration']
-            
-            # Draw rectangle around face
-            cv2.rectangle(annotated_frame, (loc['left'], loc['top']), 
-                         (loc['right'], loc['bottom']), (0, 255, 0), 2)
-            
-            # Add text labels
-            label_y = loc['top'] - 10
-            cv2.putText(annotated_frame, f"{emotion}: {confidence:.1f}%", 
-                       (loc['left'], label_y), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-            
-            label_y -= 20
-            cv2.putText(annotated_frame, f"Concentration: {concentration:.1f}%", 
-                       (loc['left'], label_y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 2)
-        
+    def annotate_frame(self, frame: np.ndarray, detections: List[Dict],
+                       out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Annotate frame with detection results (in place into ``out`` when given)"""
+        annotated_frame = frame.copy() if out is None else out
+        if out is not None and out is not frame:
+            np.copyto(out, frame)
+
+        draw_face_detections(annotated_frame, detections)
         return annotated_frame
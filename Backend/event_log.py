@@ -0,0 +1,431 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from time_columns import iso_timestamps
+
+MINUTE = 60
+HOUR = 3600
+
+# device_type of the rollup row that aggregates all devices of a detection
+ALL_DEVICES = ''
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS device_detections (
+    ts REAL NOT NULL,
+    total_devices INTEGER NOT NULL,
+    distraction_score REAL NOT NULL,
+    method TEXT NOT NULL,
+    devices TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS device_detections_ts ON device_detections (ts);
+
+CREATE TABLE IF NOT EXISTS device_type_events (
+    ts REAL NOT NULL,
+    device_type TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    total_devices INTEGER NOT NULL,
+    method TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS device_type_events_type_ts ON device_type_events (device_type, ts);
+
+CREATE TABLE IF NOT EXISTS emotion_events (
+    ts REAL NOT NULL,
+    face_id TEXT NOT NULL,
+    emotion TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    concentration REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS emotion_events_ts ON emotion_events (ts);
+CREATE INDEX IF NOT EXISTS emotion_events_face_ts ON emotion_events (face_id, ts);
+
+CREATE TABLE IF NOT EXISTS device_rollups (
+    resolution INTEGER NOT NULL,
+    bucket REAL NOT NULL,
+    device_type TEXT NOT NULL,
+    entries INTEGER NOT NULL,
+    count_sum INTEGER NOT NULL,
+    peak INTEGER NOT NULL,
+    PRIMARY KEY (resolution, bucket, device_type)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS emotion_rollups (
+    resolution INTEGER NOT NULL,
+    bucket REAL NOT NULL,
+    emotion TEXT NOT NULL,
+    detections INTEGER NOT NULL,
+    confidence_sum REAL NOT NULL,
+    concentration_sum REAL NOT NULL,
+    PRIMARY KEY (resolution, bucket, emotion)
+) WITHOUT ROWID;
+"""
+
+_UPSERT_DEVICE_ROLLUP = """
+INSERT INTO device_rollups VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (resolution, bucket, device_type) DO UPDATE SET
+    entries = entries + excluded.entries,
+    count_sum = count_sum + excluded.count_sum,
+    peak = MAX(peak, excluded.peak)
+"""
+
+_UPSERT_EMOTION_ROLLUP = """
+INSERT INTO emotion_rollups VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (resolution, bucket, emotion) DO UPDATE SET
+    detections = detections + excluded.detections,
+    confidence_sum = confidence_sum + excluded.confidence_sum,
+    concentration_sum = concentration_sum + excluded.concentration_sum
+"""
+
+_TABLES = {
+    'devices': ('device_detections', 'device_type_events', 'device_rollups'),
+    'emotions': ('emotion_events', 'emotion_rollups')
+}
+
+
+def _bucket(timestamp: float, resolution: int) -> float:
+    return float(int(timestamp // resolution) * resolution)
+
+
+class EventLog:
+    """Durable device and emotion event log in SQLite (WAL mode) with time-bucketed rollups.
+
+    Raw events are appended by a background writer thread in batches; the
+    per-minute and per-hour rollups are upserted in the same transaction, so
+    day/week queries read a few hundred rollup rows instead of raw events.
+    Raw events and rollups are pruned after their retention period by a
+    periodic compaction pass.
+    """
+
+    def __init__(self, path: str = "./event_log.db", flush_interval: float = 1.0,
+                 raw_retention_hours: float = 24, minute_retention_days: float = 7,
+                 hour_retention_days: float = 365, compact_interval: float = 3600,
+                 raw_query_hours: float = 1, minute_query_hours: float = 48):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.raw_retention_hours = raw_retention_hours
+        self.minute_retention_days = minute_retention_days
+        self.hour_retention_days = hour_retention_days
+        self.compact_interval = compact_interval
+        # Windows up to raw_query_hours read raw events, up to minute_query_hours minute rollups
+        self.raw_query_hours = raw_query_hours
+        self.minute_query_hours = minute_query_hours
+
+        self._writer = self._connect()
+        self._reader = self._connect()
+        self._read_lock = threading.Lock()
+
+        # Pending batches: (ts, device_counts, distraction_score, method) and
+        # (ts, face_id, emotion, confidence, concentration)
+        self._pending_devices: List[Tuple] = []
+        self._pending_emotions: List[Tuple] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._last_compaction = time.monotonic()
+
+        self._thread = threading.Thread(target=self._run, name="event-log", daemon=True)
+        self._thread.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        # auto_vacuum only applies to a new database file, it lets compaction return pages
+        connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(_SCHEMA)
+        return connection
+
+    # Writing
+
+    def record_devices(self, timestamp: float, device_counts: Dict[str, int], distraction_score: float,
+                       method: str):
+        """Queue one device detection (epoch seconds, counts per device type)"""
+        with self._lock:
+            self._pending_devices.append((timestamp, dict(device_counts), distraction_score, method))
+
+    def record_emotions(self, events: List[Tuple[float, str, str, float, float]]):
+        """Queue emotion detections as (epoch seconds, face_id, emotion, confidence, concentration)"""
+        if not events:
+            return
+        with self._lock:
+            self._pending_emotions.extend(events)
+
+    def _write_devices(self, cursor: sqlite3.Cursor, detections: List[Tuple]):
+        rollups: Dict[Tuple[int, float, str], List[int]] = {}
+
+        def add_rollup(timestamp, device_type, count):
+            for resolution in (MINUTE, HOUR):
+                rollup = rollups.setdefault((resolution, _bucket(timestamp, resolution), device_type), [0, 0, 0])
+                rollup[0] += 1
+                rollup[1] += count
+                rollup[2] = max(rollup[2], count)
+
+        detection_rows, type_rows = [], []
+        for timestamp, device_counts, distraction_score, method in detections:
+            total = sum(device_counts.values())
+            detection_rows.append((timestamp, total, distraction_score, method, json.dumps(device_counts)))
+            add_rollup(timestamp, ALL_DEVICES, total)
+            for device_type, count in device_counts.items():
+                if count > 0:
+                    type_rows.append((timestamp, device_type, count, total, method))
+                    add_rollup(timestamp, device_type, count)
+
+        cursor.executemany("INSERT INTO device_detections VALUES (?, ?, ?, ?, ?)", detection_rows)
+        cursor.executemany("INSERT INTO device_type_events VALUES (?, ?, ?, ?, ?)", type_rows)
+        cursor.executemany(_UPSERT_DEVICE_ROLLUP, [key + tuple(value) for key, value in rollups.items()])
+
+    def _write_emotions(self, cursor: sqlite3.Cursor, events: List[Tuple]):
+        rollups: Dict[Tuple[int, float, str], List[float]] = {}
+        for timestamp, _, emotion, confidence, concentration in events:
+            for resolution in (MINUTE, HOUR):
+                rollup = rollups.setdefault((resolution, _bucket(timestamp, resolution), emotion), [0, 0.0, 0.0])
+                rollup[0] += 1
+                rollup[1] += confidence
+                rollup[2] += concentration
+
+        cursor.executemany("INSERT INTO emotion_events VALUES (?, ?, ?, ?, ?)", events)
+        cursor.executemany(_UPSERT_EMOTION_ROLLUP, [key + tuple(value) for key, value in rollups.items()])
+
+    def flush(self) -> int:
+        """Write all pending events and their rollups in one transaction, returns the number of events"""
+        with self._flush_lock:
+            with self._lock:
+                detections, self._pending_devices = self._pending_devices, []
+                emotions, self._pending_emotions = self._pending_emotions, []
+            if not detections and not emotions:
+                return 0
+
+            try:
+                with self._writer:
+                    cursor = self._writer.cursor()
+                    if detections:
+                        self._write_devices(cursor, detections)
+                    if emotions:
+                        self._write_emotions(cursor, emotions)
+            except Exception as e:
+                print(f"Error writing event log: {e}")
+                with self._lock:
+                    self._pending_devices[:0] = detections
+                    self._pending_emotions[:0] = emotions
+                return 0
+
+            return len(detections) + len(emotions)
+
+    def compact(self, now: Optional[float] = None) -> int:
+        """Drop raw events and rollups past their retention, then return freed pages to the OS"""
+        now = now or time.time()
+        raw_cutoff = now - self.raw_retention_hours * 3600
+        minute_cutoff = now - self.minute_retention_days * 86400
+        hour_cutoff = now - self.hour_retention_days * 86400
+
+        with self._flush_lock:
+            try:
+                with self._writer:
+                    deleted = 0
+                    for table in ('device_detections', 'device_type_events', 'emotion_events'):
+                        deleted += self._writer.execute(f"DELETE FROM {table} WHERE ts < ?", (raw_cutoff,)).rowcount
+                    for table in ('device_rollups', 'emotion_rollups'):
+                        for resolution, cutoff in ((MINUTE, minute_cutoff), (HOUR, hour_cutoff)):
+                            deleted += self._writer.execute(
+                                f"DELETE FROM {table} WHERE resolution = ? AND bucket < ?", (resolution, cutoff)
+                            ).rowcount
+                # execute() only steps the pragma once (one page), executescript runs it to completion
+                self._writer.executescript("PRAGMA incremental_vacuum;")
+                self._writer.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            except Exception as e:
+                print(f"Error compacting event log: {e}")
+                return 0
+        return deleted
+
+    def clear(self, kind: Optional[str] = None):
+        """Delete all device ('devices'), emotion ('emotions') or all events and rollups"""
+        kinds = [kind] if kind else list(_TABLES)
+        with self._flush_lock:
+            with self._lock:
+                if 'devices' in kinds:
+                    self._pending_devices = []
+                if 'emotions' in kinds:
+                    self._pending_emotions = []
+            with self._writer:
+                for name in kinds:
+                    for table in _TABLES[name]:
+                        self._writer.execute(f"DELETE FROM {table}")
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+            if time.monotonic() - self._last_compaction >= self.compact_interval:
+                self._last_compaction = time.monotonic()
+                self.compact()
+
+    def close(self, timeout: Optional[float] = 5.0):
+        """Stop the writer thread, flush what is still pending and close the database"""
+        self._stopped.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        self.flush()
+        self._writer.close()
+        self._reader.close()
+
+    # Reading
+
+    def resolution(self, since: float, now: Optional[float] = None) -> int:
+        """Granularity used for a window starting at ``since``: 0 (raw events), MINUTE or HOUR"""
+        hours = ((now or time.time()) - since) / 3600
+        if hours <= min(self.raw_query_hours, self.raw_retention_hours):
+            return 0
+        if hours <= min(self.minute_query_hours, self.minute_retention_days * 24):
+            return MINUTE
+        return HOUR
+
+    def _query(self, sql: str, parameters: Tuple) -> List[Tuple]:
+        with self._read_lock:
+            return self._reader.execute(sql, parameters).fetchall()
+
+    def has_device_data(self) -> bool:
+        """Whether any device detection has been written (rollups outlive raw events)"""
+        return bool(self._query("SELECT 1 FROM device_rollups LIMIT 1", ()))
+
+    def device_history(self, since: float) -> List[Dict]:
+        """Device detections since ``since``: raw entries for short windows, rollup buckets otherwise"""
+        resolution = self.resolution(since)
+        if not resolution:
+            rows = self._query(
+                "SELECT ts, total_devices, method, devices FROM device_detections WHERE ts >= ? ORDER BY ts",
+                (since,)
+            )
+            return [
+                {
+                    'timestamp': timestamp,
+                    'devices': json.loads(devices),
+                    'total_devices': total,
+                    'detection_method': method
+                }
+                for timestamp, (_, total, method, devices) in zip(iso_timestamps([row[0] for row in rows]), rows)
+            ]
+
+        rows = self._query(
+            "SELECT bucket, device_type, entries, count_sum, peak FROM device_rollups "
+            "WHERE resolution = ? AND bucket >= ? ORDER BY bucket",
+            (resolution, _bucket(since, resolution))
+        )
+        buckets: Dict[float, Dict] = {}
+        for bucket, device_type, entries, count_sum, peak in rows:
+            entry = buckets.setdefault(bucket, {'devices': {}})
+            if device_type == ALL_DEVICES:
+                entry['total_devices'] = peak
+                entry['avg_devices'] = count_sum / entries
+                entry['detections'] = entries
+            else:
+                entry['devices'][device_type] = peak
+        return [
+            dict(entry, timestamp=timestamp, resolution='minute' if resolution == MINUTE else 'hour')
+            for timestamp, entry in zip(iso_timestamps(list(buckets)), buckets.values())
+        ]
+
+    def device_type_history(self, device_type: str, since: float, limit: Optional[int] = None) -> List[Dict]:
+        """Detections of one device type since ``since`` (raw or rollup buckets, newest ``limit`` only)"""
+        resolution = self.resolution(since)
+        limit_sql = " LIMIT ?" if limit else ""
+        limit_parameters = (limit,) if limit else ()
+        if not resolution:
+            rows = self._query(
+                "SELECT ts, count, total_devices, method FROM device_type_events "
+                "WHERE device_type = ? AND ts >= ? ORDER BY ts DESC" + limit_sql,
+                (device_type, since) + limit_parameters
+            )[::-1]
+            return [
+                {'timestamp': timestamp, 'count': count, 'total_devices': total, 'detection_method': method}
+                for timestamp, (_, count, total, method) in zip(iso_timestamps([row[0] for row in rows]), rows)
+            ]
+
+        rows = self._query(
+            "SELECT bucket, entries, count_sum, peak FROM device_rollups "
+            "WHERE resolution = ? AND device_type = ? AND bucket >= ? ORDER BY bucket DESC" + limit_sql,
+            (resolution, device_type, _bucket(since, resolution)) + limit_parameters
+        )[::-1]
+        return [
+            {
+                'timestamp': timestamp,
+                'count': peak,
+                'average_count': count_sum / entries,
+                'detections': entries,
+                'resolution': 'minute' if resolution == MINUTE else 'hour'
+            }
+            for timestamp, (_, entries, count_sum, peak) in zip(iso_timestamps([row[0] for row in rows]), rows)
+        ]
+
+    def device_type_summary(self, device_type: str, since: float) -> Dict:
+        """Entries, count sum, peak and first/last time (epoch) of one device type since ``since``"""
+        resolution = self.resolution(since)
+        if not resolution:
+            row = self._query(
+                "SELECT COUNT(*), SUM(count), MAX(count), MIN(ts), MAX(ts) FROM device_type_events "
+                "WHERE device_type = ? AND ts >= ?", (device_type, since)
+            )[0]
+        else:
+            # first/last seen are only known to the bucket here
+            row = self._query(
+                "SELECT SUM(entries), SUM(count_sum), MAX(peak), MIN(bucket), MAX(bucket) FROM device_rollups "
+                "WHERE resolution = ? AND device_type = ? AND bucket >= ?",
+                (resolution, device_type, _bucket(since, resolution))
+            )[0]
+        entries, count_sum, peak, first_seen, last_seen = row
+        return {
+            'entries': entries or 0,
+            'count_sum': count_sum or 0,
+            'peak': peak or 0,
+            'first_seen': first_seen,
+            'last_seen': last_seen
+        }
+
+    def emotion_timeline(self, since: float, face_id: Optional[str] = None) -> Dict:
+        """Emotion detections since ``since``, per face raw events or rollup buckets for the whole class"""
+        resolution = 0 if face_id else self.resolution(since)
+        if not resolution:
+            sql = "SELECT ts, face_id, emotion, confidence, concentration FROM emotion_events WHERE ts >= ?"
+            parameters = (since,)
+            if face_id:
+                sql += " AND face_id = ?"
+                parameters += (face_id,)
+            rows = self._query(sql + " ORDER BY ts", parameters)
+            return {
+                'resolution': 'raw',
+                'events': [
+                    {'timestamp': timestamp, 'face_id': row[1], 'emotion': row[2],
+                     'confidence': row[3], 'concentration': row[4]}
+                    for timestamp, row in zip(iso_timestamps([row[0] for row in rows]), rows)
+                ]
+            }
+
+        rows = self._query(
+            "SELECT bucket, emotion, detections, confidence_sum, concentration_sum FROM emotion_rollups "
+            "WHERE resolution = ? AND bucket >= ? ORDER BY bucket",
+            (resolution, _bucket(since, resolution))
+        )
+        buckets: Dict[float, Dict] = {}
+        for bucket, emotion, detections, confidence_sum, concentration_sum in rows:
+            entry = buckets.setdefault(bucket, {'emotions': {}, 'detections': 0,
+                                                'confidence_sum': 0.0, 'concentration_sum': 0.0})
+            entry['emotions'][emotion] = detections
+            entry['detections'] += detections
+            entry['confidence_sum'] += confidence_sum
+            entry['concentration_sum'] += concentration_sum
+        return {
+            'resolution': 'minute' if resolution == MINUTE else 'hour',
+            'events': [
+                {
+                    'timestamp': timestamp,
+                    'emotions': entry['emotions'],
+                    'detections': entry['detections'],
+                    'avg_confidence': entry['confidence_sum'] / entry['detections'],
+                    'avg_concentration': entry['concentration_sum'] / entry['detections']
+                }
+                for timestamp, entry in zip(iso_timestamps(list(buckets)), buckets.values())
+            ]
+        }
@@ -0,0 +1,236 @@
+import asyncio
+import gzip
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from serialization import dumps
+
+EXPORT_KINDS = ('faces', 'devices', 'all')
+
+# (record, number of faces/detections/history entries it covers) pairs
+ExportRecords = Iterator[Tuple[Dict, int]]
+
+
+def face_export_records(face_tracker, statistics: Dict, chunk_size: int) -> Tuple[int, ExportRecords]:
+    """Total items and records of the face export: statistics, then per face a summary and its history in chunks.
+
+    Must be called on the event loop: the face summaries and history columns
+    are captured here, the records only read that snapshot.
+    """
+    faces = [
+        (face.face_id, face.to_dict(include_history=False), len(face.timestamps), face.history_chunks(chunk_size))
+        for face in list(face_tracker.tracked_faces.values())
+    ]
+    total = sum(1 + size for _, _, size, _ in faces)
+
+    def records():
+        yield {'record': 'face_statistics', **statistics}, 0
+        for face_id, summary, _, chunks in faces:
+            yield {'record': 'face', **summary}, 1
+            for chunk in chunks:
+                yield {'record': 'face_history', 'face_id': face_id, 'detections': chunk}, len(chunk)
+
+    return total, records()
+
+
+def device_export_records(device_detector, statistics: Dict, chunk_size: int) -> Tuple[int, ExportRecords]:
+    """Total items and records of the device export: summary, then the history in chunks.
+
+    Must be called on the event loop, like ``face_export_records``.
+    """
+    total = len(device_detector.device_history)
+    summary = {
+        'record': 'device_summary',
+        'current_devices': dict(device_detector.current_devices),
+        'statistics': statistics,
+        'model_info': device_detector.get_model_info(),
+        'supported_devices': device_detector.get_supported_devices()
+    }
+    chunks = device_detector.device_history.entry_chunks(chunk_size)
+
+    def records():
+        yield summary, 0
+        for chunk in chunks:
+            yield {'record': 'device_history', 'entries': chunk}, len(chunk)
+
+    return total, records()
+
+
+class ExportJob:
+    """State and progress of one background export"""
+
+    def __init__(self, job_id: str, kind: str, compress: bool, path: str):
+        self.job_id = job_id
+        self.kind = kind
+        self.compress = compress
+        self.path = path
+        self.status = 'queued'
+        self.items_total = 0
+        self.items_done = 0
+        self.records_written = 0
+        # Serialized (uncompressed) JSON bytes
+        self.json_bytes = 0
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.cancel_requested = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ('completed', 'failed', 'cancelled')
+
+    @property
+    def filename(self) -> str:
+        return os.path.basename(self.path)
+
+    @property
+    def media_type(self) -> str:
+        return 'application/gzip' if self.compress else 'application/x-ndjson'
+
+    def to_dict(self) -> Dict:
+        return {
+            'job_id': self.job_id,
+            'kind': self.kind,
+            'format': 'ndjson.gz' if self.compress else 'ndjson',
+            'status': self.status,
+            # Detections added while a face is exported are included, so clamp
+            'progress': min(self.items_done / self.items_total, 1.0) if self.items_total else (1.0 if self.finished else 0.0),
+            'items_done': self.items_done,
+            'items_total': self.items_total,
+            'records_written': self.records_written,
+            'json_bytes': self.json_bytes,
+            'file': self.filename,
+            'created_at': datetime.fromtimestamp(self.created_at).isoformat(),
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat() if self.started_at else None,
+            'finished_at': datetime.fromtimestamp(self.finished_at).isoformat() if self.finished_at else None,
+            'error': self.error
+        }
+
+
+class ExportJobManager:
+    """Runs exports as background jobs that stream NDJSON records to disk.
+
+    The tracker and device history are snapshotted on the event loop when the
+    job starts; the worker thread then builds records a chunk at a time from
+    that snapshot (the whole document is never built), serializes one per line
+    and flushes a few times a second (a gzip sync flush when compressed), so
+    the file can be read and downloaded while the job is still running.
+    """
+
+    def __init__(self, face_tracker, device_detector, statistics_publisher, directory: str = "./exports",
+                 chunk_size: int = 1000, max_jobs: int = 50, flush_interval: float = 0.25):
+        self.face_tracker = face_tracker
+        self.device_detector = device_detector
+        self.statistics_publisher = statistics_publisher
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.max_jobs = max_jobs
+        self.flush_interval = flush_interval
+        self._jobs: 'OrderedDict[str, ExportJob]' = OrderedDict()
+
+    def start(self, kind: str = 'all', compress: bool = False) -> ExportJob:
+        """Queue an export on the default executor, must be called from the event loop"""
+        if kind not in EXPORT_KINDS:
+            raise ValueError(f"Unknown export kind '{kind}', expected one of {list(EXPORT_KINDS)}")
+        os.makedirs(self.directory, exist_ok=True)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        extension = 'ndjson.gz' if compress else 'ndjson'
+        job_id = uuid.uuid4().hex[:12]
+        path = os.path.join(self.directory, f"{kind}_export_{timestamp}_{job_id}.{extension}")
+        job = ExportJob(job_id, kind, compress, path)
+        sources = self._sources(kind)
+        job.items_total = sum(total for total, _ in sources)
+
+        self._jobs[job.job_id] = job
+        # Forget the oldest finished jobs (their files stay on disk)
+        while len(self._jobs) > self.max_jobs:
+            oldest = next((job_id for job_id, old in self._jobs.items() if old.finished), None)
+            if oldest is None:
+                break
+            del self._jobs[oldest]
+
+        asyncio.get_running_loop().run_in_executor(None, self._run, job, sources)
+        return job
+
+    def _sources(self, kind: str) -> List[Tuple[int, ExportRecords]]:
+        # The tracker and detector are mutated by the frame loop, so everything is read here
+        statistics = self.statistics_publisher.current
+        sources = []
+        if kind in ('faces', 'all'):
+            sources.append(face_export_records(self.face_tracker, statistics.faces, self.chunk_size))
+        if kind in ('devices', 'all'):
+            sources.append(device_export_records(self.device_detector, statistics.devices, self.chunk_size))
+        return sources
+
+    def _run(self, job: ExportJob, sources: List[Tuple[int, ExportRecords]]):
+        job.status = 'running'
+        job.started_at = time.time()
+        try:
+            opener = gzip.open if job.compress else open
+            cancelled = False
+            with opener(job.path, 'wb') as f:
+                header = {'record': 'export', 'kind': job.kind, 'job_id': job.job_id,
+                          'exported_at': datetime.now().isoformat()}
+                self._write(job, f, header)
+                last_flush = time.monotonic()
+                for record, items in (pair for _, records in sources for pair in records):
+                    if job.cancel_requested.is_set():
+                        cancelled = True
+                        break
+                    self._write(job, f, record)
+                    job.items_done += items
+                    # Readers tailing the file see whole records (gzip: sync flush), a few times a second
+                    if time.monotonic() - last_flush >= self.flush_interval:
+                        f.flush()
+                        last_flush = time.monotonic()
+            # Only now is the file complete (gzip trailer written on close)
+            job.status = 'cancelled' if cancelled else 'completed'
+        except Exception as e:
+            print(f"Error exporting data: {e}")
+            job.status = 'failed'
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+
+    @staticmethod
+    def _write(job: ExportJob, f, record: Dict):
+        line = dumps(record) + b'\n'
+        f.write(line)
+        job.records_written += 1
+        job.json_bytes += len(line)
+
+    def get(self, job_id: str) -> Optional[ExportJob]:
+        return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[Dict]:
+        return [job.to_dict() for job in reversed(self._jobs.values())]
+
+    def cancel(self, job_id: str) -> Optional[ExportJob]:
+        job = self._jobs.get(job_id)
+        if job is not None and not job.finished:
+            job.cancel_requested.set()
+        return job
+
+    async def stream(self, job: ExportJob, chunk_bytes: int = 1 << 16, poll_interval: float = 0.2) -> AsyncIterator[bytes]:
+        """File contents as they are written, ends when the job has finished and the file is drained"""
+        while not os.path.exists(job.path):
+            if job.finished:
+                return
+            await asyncio.sleep(poll_interval)
+
+        with open(job.path, 'rb') as f:
+            while True:
+                finished = job.finished
+                data = await asyncio.to_thread(f.read, chunk_bytes)
+                if data:
+                    yield data
+                elif finished:
+                    return
+                else:
+                    await asyncio.sleep(poll_interval)
@@ -0,0 +1,350 @@
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+
+class FaceIndex:
+    """In-process nearest-neighbour index over face encodings (Euclidean distance).
+
+    Small galleries are searched exactly. Once the gallery reaches
+    ``exact_threshold`` faces an IVF index is trained (k-means coarse
+    quantizer over float32 vectors) and only the ``nprobe`` closest inverted
+    lists are scanned, which is the recall/latency knob. Inserts and deletes
+    are incremental; the quantizer is retrained when the gallery has grown by
+    ``retrain_factor`` since the last training.
+
+    With ``background_training`` the k-means runs in a worker thread on a
+    copy of the vectors, and the current search mode (exact, or the previous
+    quantizer) stays in use until the next call on the owning thread swaps
+    the new centroids in. Vectors added or replaced meanwhile are assigned to
+    the new centroids at that point.
+    """
+
+    def __init__(self, dimension: int = 128, exact_threshold: int = 2000, nprobe: int = 8,
+                 retrain_factor: float = 2.0, kmeans_iterations: int = 10, seed: int = 0,
+                 background_training: bool = True):
+        self.dimension = dimension
+        self.exact_threshold = exact_threshold
+        self.nprobe = nprobe
+        self.retrain_factor = retrain_factor
+        self.kmeans_iterations = kmeans_iterations
+        self.seed = seed
+        self.background_training = background_training
+        self._generation = 0
+        self._training_thread: Optional[threading.Thread] = None
+        self.clear()
+
+    def clear(self):
+        """Remove every vector and drop the trained quantizer"""
+        self._vectors = np.empty((1024, self.dimension), dtype=np.float32)
+        self._norms = np.empty(1024, dtype=np.float32)
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+
+        # IVF state (None until trained)
+        self._centroids: Optional[np.ndarray] = None
+        self._centroid_norms: Optional[np.ndarray] = None
+        self._assignments = np.empty(1024, dtype=np.int32)
+        self._lists: List[List[int]] = []
+        self._list_arrays: Dict[int, np.ndarray] = {}
+        self._trained_size = 0
+
+        # Background training: results of an older generation are discarded
+        self._generation += 1
+        self._pending_training: Optional[Tuple] = None
+        self._training_in_flight = False
+        self._changed_during_training: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, face_id: str) -> bool:
+        return face_id in self._rows
+
+    @property
+    def is_trained(self) -> bool:
+        return self._centroids is not None
+
+    def set_nprobe(self, nprobe: int):
+        """Number of inverted lists scanned per query (higher = better recall, slower)"""
+        self.nprobe = max(1, int(nprobe))
+
+    def get(self, face_id: str) -> Optional[np.ndarray]:
+        row = self._rows.get(face_id)
+        return None if row is None else self._vectors[row]
+
+    # ------------------------------------------------------------------ writes
+
+    def _ensure_capacity(self, size: int):
+        capacity = len(self._vectors)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        vectors = np.empty((capacity, self.dimension), dtype=np.float32)
+        vectors[:len(self._ids)] = self._vectors[:len(self._ids)]
+        norms = np.empty(capacity, dtype=np.float32)
+        norms[:len(self._ids)] = self._norms[:len(self._ids)]
+        assignments = np.empty(capacity, dtype=np.int32)
+        assignments[:len(self._ids)] = self._assignments[:len(self._ids)]
+        self._vectors, self._norms, self._assignments = vectors, norms, assignments
+
+    def add(self, face_id: str, vector: np.ndarray):
+        """Insert or replace a single vector"""
+        self.add_many([face_id], np.asarray(vector).reshape(1, -1))
+
+    def add_many(self, face_ids: List[str], vectors: np.ndarray):
+        """Insert or replace a batch of vectors"""
+        self._install_pending_training()
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        if self._training_in_flight:
+            self._changed_during_training.update(face_ids)
+        for face_id in face_ids:
+            if face_id in self._rows:
+                self.remove(face_id)
+
+        start = len(self._ids)
+        end = start + len(face_ids)
+        self._ensure_capacity(end)
+        self._vectors[start:end] = vectors
+        self._norms[start:end] = np.einsum('ij,ij->i', vectors, vectors)
+        for offset, face_id in enumerate(face_ids):
+            self._rows[face_id] = start + offset
+        self._ids.extend(face_ids)
+
+        if self.is_trained:
+            assignments = self._nearest_centroids(vectors)
+            self._assignments[start:end] = assignments
+            for offset, cluster in enumerate(assignments):
+                self._lists[cluster].append(start + offset)
+                self._list_arrays.pop(int(cluster), None)
+
+        self._maybe_train()
+
+    def remove(self, face_id: str) -> bool:
+        """Delete a vector, the last row is moved into its slot to keep storage dense"""
+        self._install_pending_training()
+        row = self._rows.pop(face_id, None)
+        if row is None:
+            return False
+
+        last = len(self._ids) - 1
+        if self.is_trained:
+            cluster = int(self._assignments[row])
+            self._lists[cluster].remove(row)
+            self._list_arrays.pop(cluster, None)
+
+        if row != last:
+            moved_id = self._ids[last]
+            self._vectors[row] = self._vectors[last]
+            self._norms[row] = self._norms[last]
+            self._ids[row] = moved_id
+            self._rows[moved_id] = row
+            if self.is_trained:
+                cluster = int(self._assignments[last])
+                self._assignments[row] = cluster
+                members = self._lists[cluster]
+                members[members.index(last)] = row
+                self._list_arrays.pop(cluster, None)
+        self._ids.pop()
+
+        if len(self._ids) < self.exact_threshold // 2:
+            # Small again, exact search is cheaper than keeping the quantizer up to date
+            self._centroids = None
+            self._centroid_norms = None
+            self._lists = []
+            self._list_arrays = {}
+            self._trained_size = 0
+            self._generation += 1
+            self._pending_training = None
+            self._training_in_flight = False
+        return True
+
+    # ---------------------------------------------------------------- training
+
+    def _maybe_train(self):
+        size = len(self._ids)
+        if size < self.exact_threshold:
+            return
+        if self.is_trained and size < self._trained_size * self.retrain_factor:
+            return
+        if not self.background_training:
+            self.train()
+        elif not self._training_in_flight:
+            self._start_background_training()
+
+    def train(self):
+        """(Re)build the coarse quantizer and inverted lists from the current vectors, synchronously"""
+        size = len(self._ids)
+        if size == 0:
+            return
+        data = self._vectors[:size]
+        centroids = self._train_centroids(data)
+        centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+        self._apply_training(centroids, self._nearest_centroids(data, centroids, centroid_norms), size)
+
+    def _train_centroids(self, data: np.ndarray) -> np.ndarray:
+        size = len(data)
+        nlist = max(1, min(size, int(4 * np.sqrt(size))))
+        rng = np.random.default_rng(self.seed)
+        sample_size = min(size, nlist * 32)
+        sample = data[rng.choice(size, sample_size, replace=False)] if sample_size < size else data
+        return self._kmeans(sample, nlist, rng)
+
+    def _apply_training(self, centroids: np.ndarray, assignments: np.ndarray, trained_size: int):
+        """Install centroids with the assignment of every current row"""
+        nlist = len(centroids)
+        self._centroids = centroids
+        self._centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+        self._assignments[:len(assignments)] = assignments
+
+        order = np.argsort(assignments, kind='stable')
+        bounds = np.searchsorted(assignments[order], np.arange(nlist + 1))
+        self._lists = [order[bounds[c]:bounds[c + 1]].tolist() for c in range(nlist)]
+        self._list_arrays = {}
+        self._trained_size = trained_size
+
+    def _start_background_training(self):
+        # The worker only sees this copy, the live arrays keep changing on the owning thread
+        face_ids = list(self._ids)
+        data = self._vectors[:len(face_ids)].copy()
+        self._training_in_flight = True
+        self._changed_during_training = set()
+        self._training_thread = threading.Thread(
+            target=self._train_worker, args=(self._generation, face_ids, data),
+            name="face-index-train", daemon=True
+        )
+        self._training_thread.start()
+
+    def _train_worker(self, generation: int, face_ids: List[str], data: np.ndarray):
+        try:
+            centroids = self._train_centroids(data)
+            centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+            assignments = self._nearest_centroids(data, centroids, centroid_norms)
+            # A single attribute store, picked up by the owning thread
+            self._pending_training = (generation, face_ids, centroids, assignments)
+        except Exception as e:
+            print(f"Error training face index: {e}")
+            self._pending_training = (generation, None, None, None)
+
+    def _install_pending_training(self):
+        pending = self._pending_training
+        if pending is None:
+            return
+        self._pending_training = None
+        generation, face_ids, centroids, assignments = pending
+        if generation != self._generation:
+            return
+        self._training_in_flight = False
+        changed, self._changed_during_training = self._changed_during_training, set()
+        if centroids is None:
+            return
+
+        # Rows moved (deletes) and vectors were added since the snapshot: map by face_id
+        cluster_of = dict(zip(face_ids, assignments.tolist()))
+        size = len(self._ids)
+        current = np.empty(size, dtype=np.int32)
+        stale_rows = []
+        for row, face_id in enumerate(self._ids):
+            cluster = None if face_id in changed else cluster_of.get(face_id)
+            if cluster is None:
+                stale_rows.append(row)
+            else:
+                current[row] = cluster
+        if stale_rows:
+            centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+            current[stale_rows] = self._nearest_centroids(self._vectors[stale_rows], centroids, centroid_norms)
+        self._apply_training(centroids, current, len(face_ids))
+
+    def wait_for_training(self, timeout: Optional[float] = None) -> bool:
+        """Block until a background training finishes and install it, returns whether the index is trained"""
+        thread = self._training_thread
+        if thread is not None:
+            thread.join(timeout)
+        self._install_pending_training()
+        return self.is_trained
+
+    def _kmeans(self, data: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+        centroids = data[rng.choice(len(data), k, replace=False)].copy()
+        for _ in range(self.kmeans_iterations):
+            centroid_norms = np.einsum('ij,ij->i', centroids, centroids)
+            assignments = self._nearest_centroids(data, centroids, centroid_norms)
+
+            counts = np.bincount(assignments, minlength=k)
+            order = np.argsort(assignments, kind='stable')
+            non_empty = np.flatnonzero(counts)
+            starts = np.searchsorted(assignments[order], non_empty)
+            sums = np.add.reduceat(data[order], starts, axis=0)
+            centroids[non_empty] = sums / counts[non_empty, None]
+
+            empty = np.flatnonzero(counts == 0)
+            if len(empty):
+                centroids[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+        return centroids
+
+    def _nearest_centroids(self, vectors: np.ndarray, centroids: Optional[np.ndarray] = None,
+                           centroid_norms: Optional[np.ndarray] = None, chunk: int = 4096) -> np.ndarray:
+        if centroids is None:
+            centroids, centroid_norms = self._centroids, self._centroid_norms
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), chunk):
+            block = vectors[start:start + chunk]
+            distances = centroid_norms[None, :] - 2.0 * block @ centroids.T
+            assignments[start:start + chunk] = np.argmin(distances, axis=1)
+        return assignments
+
+    # ------------------------------------------------------------------ search
+
+    def _list_rows(self, cluster: int) -> np.ndarray:
+        rows = self._list_arrays.get(cluster)
+        if rows is None:
+            rows = np.asarray(self._lists[cluster], dtype=np.int64)
+            self._list_arrays[cluster] = rows
+        return rows
+
+    def _top_k(self, rows: Optional[np.ndarray], query: np.ndarray, query_norm: float,
+               k: int) -> List[Tuple[str, float]]:
+        size = len(self._ids)
+        if rows is None:
+            squared = self._norms[:size] - 2.0 * (self._vectors[:size] @ query) + query_norm
+        else:
+            if len(rows) == 0:
+                return []
+            squared = self._norms[rows] - 2.0 * (self._vectors[rows] @ query) + query_norm
+
+        k = min(k, len(squared))
+        best = np.argpartition(squared, k - 1)[:k] if k < len(squared) else np.arange(len(squared))
+        best = best[np.argsort(squared[best])]
+        distances = np.sqrt(np.maximum(squared[best], 0.0))
+        if rows is not None:
+            best = rows[best]
+        return [(self._ids[row], float(distance)) for row, distance in zip(best, distances)]
+
+    def search(self, query: np.ndarray, k: int = 1) -> List[Tuple[str, float]]:
+        """k nearest faces to ``query`` as (face_id, distance) pairs, nearest first"""
+        return self.search_batch(np.asarray(query).reshape(1, -1), k)[0]
+
+    def search_batch(self, queries: np.ndarray, k: int = 1) -> List[List[Tuple[str, float]]]:
+        """k nearest faces for every query row"""
+        self._install_pending_training()
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dimension)
+        if not self._ids:
+            return [[] for _ in range(len(queries))]
+
+        query_norms = np.einsum('ij,ij->i', queries, queries)
+        if not self.is_trained:
+            return [self._top_k(None, q, q_norm, k) for q, q_norm in zip(queries, query_norms)]
+
+        nprobe = min(self.nprobe, len(self._centroids))
+        centroid_distances = self._centroid_norms[None, :] - 2.0 * queries @ self._centroids.T
+        if nprobe < len(self._centroids):
+            probes = np.argpartition(centroid_distances, nprobe - 1, axis=1)[:, :nprobe]
+        else:
+            probes = np.tile(np.arange(len(self._centroids)), (len(queries), 1))
+
+        results = []
+        for q, q_norm, probe in zip(queries, query_norms, probes):
+            rows = np.concatenate([self._list_rows(int(c)) for c in probe])
+            results.append(self._top_k(rows, q, q_norm, k))
+        return results
@@ -0,0 +1,152 @@
+import threading
+from typing import Dict, List, Optional, Set
+
+
+class FacePersistenceQueue:
+    """Write-behind queue that coalesces ChromaDB writes per face_id.
+
+    The frame loop only records what changed; a background thread flushes the
+    pending writes as batched upserts/updates every ``flush_interval`` seconds,
+    or sooner once ``max_pending`` faces are waiting.
+    """
+
+    def __init__(self, collection, flush_interval: float = 2.0, max_pending: int = 64):
+        self.collection = collection
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        # face_id -> {'embedding': List[float], 'metadata': Dict}
+        self._pending_adds: Dict[str, Dict] = {}
+        # face_id -> metadata (later updates overwrite earlier keys)
+        self._pending_updates: Dict[str, Dict] = {}
+        # face_ids to remove from the collection
+        self._pending_deletes: Set[str] = set()
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+
+        self._thread = threading.Thread(target=self._run, name="face-persistence", daemon=True)
+        self._thread.start()
+
+    def enqueue_add(self, face_id: str, embedding: List[float], metadata: Dict):
+        """Queue a new face (embedding + metadata) for insertion"""
+        with self._lock:
+            self._pending_updates.pop(face_id, None)
+            self._pending_deletes.discard(face_id)
+            self._pending_adds[face_id] = {'embedding': embedding, 'metadata': dict(metadata)}
+            self._maybe_wake()
+
+    def enqueue_update(self, face_id: str, metadata: Dict):
+        """Queue a metadata update, merged into any write already pending for this face"""
+        with self._lock:
+            if face_id in self._pending_adds:
+                self._pending_adds[face_id]['metadata'].update(metadata)
+            else:
+                self._pending_updates.setdefault(face_id, {}).update(metadata)
+            self._maybe_wake()
+
+    def enqueue_delete(self, face_id: str):
+        """Queue removal of a face, dropping any write still pending for it"""
+        with self._lock:
+            self._pending_adds.pop(face_id, None)
+            self._pending_updates.pop(face_id, None)
+            self._pending_deletes.add(face_id)
+            self._maybe_wake()
+
+    def pending_add_ids(self) -> Set[str]:
+        """Face ids that have been queued but not yet written to ChromaDB"""
+        with self._lock:
+            return set(self._pending_adds)
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending_adds) + len(self._pending_updates) + len(self._pending_deletes)
+
+    def _maybe_wake(self):
+        # Caller holds self._lock
+        pending = len(self._pending_adds) + len(self._pending_updates) + len(self._pending_deletes)
+        if pending >= self.max_pending:
+            self._wake.set()
+
+    def _swap_pending(self):
+        with self._lock:
+            adds, self._pending_adds = self._pending_adds, {}
+            updates, self._pending_updates = self._pending_updates, {}
+            deletes, self._pending_deletes = self._pending_deletes, set()
+        return adds, updates, deletes
+
+    def _requeue(self, adds: Dict[str, Dict], updates: Dict[str, Dict], deletes: Set[str]):
+        """Put failed writes back without clobbering anything queued since"""
+        with self._lock:
+            for face_id in deletes:
+                if face_id not in self._pending_adds:
+                    self._pending_deletes.add(face_id)
+            for face_id, entry in adds.items():
+                if face_id in self._pending_deletes:
+                    continue
+                if face_id in self._pending_adds:
+                    entry['metadata'].update(self._pending_adds[face_id]['metadata'])
+                    entry['embedding'] = self._pending_adds[face_id]['embedding']
+                entry['metadata'].update(self._pending_updates.pop(face_id, {}))
+                self._pending_adds[face_id] = entry
+            for face_id, metadata in updates.items():
+                if face_id in self._pending_adds or face_id in self._pending_deletes:
+                    continue
+                metadata.update(self._pending_updates.get(face_id, {}))
+                self._pending_updates[face_id] = metadata
+
+    def flush(self) -> int:
+        """Write all pending changes to ChromaDB, returns the number of faces written or deleted"""
+        with self._flush_lock:
+            adds, updates, deletes = self._swap_pending()
+            if not adds and not updates and not deletes:
+                return 0
+
+            written = len(adds) + len(updates) + len(deletes)
+            try:
+                if deletes:
+                    self.collection.delete(ids=list(deletes))
+                    deletes = set()
+                if adds:
+                    ids = list(adds)
+                    self.collection.upsert(
+                        ids=ids,
+                        embeddings=[adds[face_id]['embedding'] for face_id in ids],
+                        metadatas=[adds[face_id]['metadata'] for face_id in ids]
+                    )
+                    adds = {}
+                if updates:
+                    ids = list(updates)
+                    self.collection.update(
+                        ids=ids,
+                        metadatas=[updates[face_id] for face_id in ids]
+                    )
+                    updates = {}
+            except Exception as e:
+                print(f"Error flushing faces to ChromaDB: {e}")
+                self._requeue(adds, updates, deletes)
+                return 0
+
+            return written
+
+    def discard(self, collection=None):
+        """Drop all pending writes, optionally switching to a new collection (used on reset)"""
+        with self._flush_lock:
+            self._swap_pending()
+            if collection is not None:
+                self.collection = collection
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self, timeout: Optional[float] = 5.0):
+        """Stop the background thread and flush whatever is still pending"""
+        self._stopped.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        self.flush()
@@ -0,0 +1,117 @@
+import glob
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class FaceSnapshotStore:
+    """On-disk snapshot of the tracker gallery for fast startup.
+
+    A snapshot is a float32 embedding matrix (``embeddings-<generation>.npy``,
+    loaded memory-mapped) plus ``meta.json`` holding the per-face aggregates as
+    columns. ``meta.json`` is replaced atomically and names the embedding file
+    it belongs to, so a crash mid-write leaves the previous snapshot readable.
+    """
+
+    FORMAT_VERSION = 1
+
+    def __init__(self, path: str = "./face_vectors_snapshot"):
+        self.path = path
+        self.meta_path = os.path.join(path, "meta.json")
+
+    def write(self, columns: Dict) -> str:
+        """Write a snapshot from column data, returns the embedding file name.
+
+        ``columns`` holds ``ids``, ``embeddings`` (n x d), ``first_seen`` and
+        ``last_seen`` (epoch seconds), ``total_detections``,
+        ``concentration_total`` and ``emotion_counts`` (list of dicts).
+        """
+        os.makedirs(self.path, exist_ok=True)
+
+        generation = time.time_ns()
+        embeddings_file = f"embeddings-{generation}.npy"
+        embeddings = np.ascontiguousarray(columns['embeddings'], dtype=np.float32)
+        np.save(os.path.join(self.path, embeddings_file), embeddings)
+
+        # Emotion counts are stored as a dense matrix against a label header
+        emotion_labels = sorted({label for counts in columns['emotion_counts'] for label in counts})
+        emotion_matrix = [[counts.get(label, 0) for label in emotion_labels]
+                          for counts in columns['emotion_counts']]
+
+        meta = {
+            'format_version': self.FORMAT_VERSION,
+            'saved_at': time.time(),
+            'embeddings_file': embeddings_file,
+            'count': len(columns['ids']),
+            'dimension': int(embeddings.shape[1]) if embeddings.ndim == 2 else 0,
+            'ids': list(columns['ids']),
+            'first_seen': [float(t) for t in columns['first_seen']],
+            'last_seen': [float(t) for t in columns['last_seen']],
+            'total_detections': [int(n) for n in columns['total_detections']],
+            'concentration_total': [float(c) for c in columns['concentration_total']],
+            'emotion_labels': emotion_labels,
+            'emotion_counts': emotion_matrix
+        }
+
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f, separators=(',', ':'))
+        os.replace(tmp_path, self.meta_path)
+
+        self._remove_stale_generations(keep=embeddings_file)
+        return embeddings_file
+
+    def load(self) -> Optional[Dict]:
+        """Load the latest snapshot as columns, or None if there is no usable snapshot"""
+        if not os.path.exists(self.meta_path):
+            return None
+
+        try:
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+            if meta.get('format_version') != self.FORMAT_VERSION:
+                return None
+
+            # Copy-on-write map: pages are read lazily and only copied if written to
+            embeddings = np.load(os.path.join(self.path, meta['embeddings_file']), mmap_mode='c')
+            if embeddings.shape[0] != meta['count']:
+                return None
+
+            labels = meta['emotion_labels']
+            return {
+                'ids': meta['ids'],
+                'embeddings': embeddings,
+                'first_seen': meta['first_seen'],
+                'last_seen': meta['last_seen'],
+                'total_detections': meta['total_detections'],
+                'concentration_total': meta['concentration_total'],
+                'emotion_counts': [
+                    {label: count for label, count in zip(labels, row) if count}
+                    for row in meta['emotion_counts']
+                ],
+                'saved_at': meta['saved_at']
+            }
+        except Exception as e:
+            print(f"Error loading face snapshot: {e}")
+            return None
+
+    def clear(self):
+        """Remove every snapshot file"""
+        for path in [self.meta_path] + glob.glob(os.path.join(self.path, "embeddings-*.npy")):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _remove_stale_generations(self, keep: str):
+        for path in glob.glob(os.path.join(self.path, "embeddings-*.npy")):
+            if os.path.basename(path) == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                # Still memory-mapped somewhere (Windows), retried on the next write
+                pass
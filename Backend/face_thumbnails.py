@@ -0,0 +1,102 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class _Thumbnail:
+    __slots__ = ('image', 'sharpness', 'updated_at', 'version', 'jpeg')
+
+    def __init__(self, image: np.ndarray, sharpness: float, updated_at: float, version: int):
+        self.image = image
+        self.sharpness = sharpness
+        self.updated_at = updated_at
+        self.version = version
+        # Encoded on first request, dropped when the image changes
+        self.jpeg: Optional[bytes] = None
+
+
+class FaceThumbnailStore:
+    """Latest good face crop per face_id, served as a cached JPEG.
+
+    ``offer`` is called for every detection but only keeps the crop when it
+    is sharper than the stored one (variance of the Laplacian) or the stored
+    one is older than ``refresh_seconds``. Crops are kept as small raw images
+    and JPEG-encoded lazily, once per version, when the thumbnail is fetched.
+    """
+
+    def __init__(self, size: int = 128, quality: int = 85, refresh_seconds: float = 30.0, capacity: int = 2000):
+        self.size = size
+        self.quality = quality
+        self.refresh_seconds = refresh_seconds
+        self.capacity = capacity
+        self._thumbnails: 'OrderedDict[str, _Thumbnail]' = OrderedDict()
+        # Seeded with the start time (microseconds): versioned URLs are cached as
+        # immutable, so a version must never be reused by a later process
+        self._version = time.time_ns() // 1000
+        self._lock = threading.Lock()
+
+    def _fit(self, crop: np.ndarray) -> np.ndarray:
+        height, width = crop.shape[:2]
+        scale = self.size / max(height, width)
+        if scale >= 1:
+            return crop.copy()
+        return cv2.resize(crop, (max(1, round(width * scale)), max(1, round(height * scale))),
+                          interpolation=cv2.INTER_AREA)
+
+    @staticmethod
+    def sharpness(image: np.ndarray) -> float:
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        return float(cv2.Laplacian(gray, cv2.CV_32F).var())
+
+    def offer(self, face_id: str, crop: np.ndarray, seen_at: Optional[float] = None) -> Optional[int]:
+        """Consider a new crop of ``face_id``, returns the thumbnail version (None if there is none)"""
+        seen_at = time.time() if seen_at is None else seen_at
+        current = self._thumbnails.get(face_id)
+        if crop is None or crop.size == 0:
+            return current.version if current is not None else None
+
+        # Score on the downscaled crop, so crops of different sizes compare fairly
+        image = self._fit(crop)
+        sharpness = self.sharpness(image)
+        if current is not None and sharpness <= current.sharpness and seen_at - current.updated_at < self.refresh_seconds:
+            return current.version
+
+        with self._lock:
+            self._version += 1
+            self._thumbnails[face_id] = _Thumbnail(image, sharpness, seen_at, self._version)
+            self._thumbnails.move_to_end(face_id)
+            while len(self._thumbnails) > self.capacity:
+                self._thumbnails.popitem(last=False)
+            return self._version
+
+    def version(self, face_id: str) -> Optional[int]:
+        thumbnail = self._thumbnails.get(face_id)
+        return thumbnail.version if thumbnail is not None else None
+
+    def get(self, face_id: str) -> Optional[Tuple[bytes, int, float]]:
+        """(JPEG bytes, version, updated_at epoch seconds) of a face's thumbnail, or None"""
+        with self._lock:
+            thumbnail = self._thumbnails.get(face_id)
+            if thumbnail is None:
+                return None
+            if thumbnail.jpeg is None:
+                ok, buffer = cv2.imencode('.jpg', thumbnail.image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+                if not ok:
+                    return None
+                thumbnail.jpeg = buffer.tobytes()
+            return thumbnail.jpeg, thumbnail.version, thumbnail.updated_at
+
+    def versions(self) -> Dict[str, int]:
+        return {face_id: thumbnail.version for face_id, thumbnail in list(self._thumbnails.items())}
+
+    def remove(self, face_id: str):
+        with self._lock:
+            self._thumbnails.pop(face_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._thumbnails.clear()
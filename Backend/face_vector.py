@@ -0,0 +1,174 @@
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+from time_columns import iso_timestamps
+
+# Same order as EmotionDetector.emotion_labels, unknown labels are appended on first use
+EMOTION_LABELS: List[str] = ['angry', 'disgust', 'fear', 'happy', 'neutral', 'sad', 'surprise']
+_EMOTION_CODES: Dict[str, int] = {label: code for code, label in enumerate(EMOTION_LABELS)}
+
+
+def emotion_code(emotion: str) -> int:
+    """uint8 code for an emotion label"""
+    code = _EMOTION_CODES.get(emotion)
+    if code is None:
+        if len(EMOTION_LABELS) >= 256:
+            raise ValueError(f"Too many emotion labels to encode '{emotion}'")
+        code = len(EMOTION_LABELS)
+        EMOTION_LABELS.append(emotion)
+        _EMOTION_CODES[emotion] = code
+    return code
+
+
+class FaceVector:
+    """A tracked face: float32 encoding, running aggregates and a columnar detection history.
+
+    Each detection is stored as one entry in four typed arrays (uint8 emotion
+    code, float64 epoch timestamp, float32 confidence, float32 concentration).
+    Dict views are only built by ``to_dict``/``emotions`` at the API boundary.
+    """
+
+    __slots__ = (
+        'face_id', 'encoding', 'first_seen', 'last_seen',
+        'total_detections', 'concentration_total', 'emotion_counts',
+        'emotion_codes', 'timestamps', 'confidences', 'concentrations', 'distraction'
+    )
+
+    def __init__(self, face_id: str, encoding: np.ndarray, first_seen: datetime, last_seen: datetime,
+                 total_detections: int = 0, concentration_total: float = 0.0,
+                 emotion_counts: Optional[Dict[str, int]] = None):
+        self.face_id = face_id
+        self.encoding = np.asarray(encoding, dtype=np.float32)
+        self.first_seen = first_seen
+        self.last_seen = last_seen
+
+        # Running aggregates, restored from a snapshot they also cover history from earlier runs
+        self.total_detections = total_detections
+        self.concentration_total = concentration_total
+        self.emotion_counts = emotion_counts if emotion_counts is not None else {}
+
+        # Detection history columns
+        self.emotion_codes = array('B')
+        self.timestamps = array('d')
+        self.confidences = array('f')
+        self.concentrations = array('f')
+
+        # Latest per-student distraction from the devices associated with this face
+        self.distraction: Optional[Dict] = None
+
+    def add_detection(self, emotion: str, confidence: float, concentration: float, seen_at: datetime):
+        self.last_seen = seen_at
+        self.emotion_codes.append(emotion_code(emotion))
+        self.timestamps.append(seen_at.timestamp())
+        self.confidences.append(confidence)
+        self.concentrations.append(concentration)
+
+        self.total_detections += 1
+        self.concentration_total += concentration
+        self.emotion_counts[emotion] = self.emotion_counts.get(emotion, 0) + 1
+
+    def absorb(self, other: 'FaceVector'):
+        """Merge another face (a duplicate identity) into this one, histories stay time-ordered"""
+        weight_self, weight_other = max(self.total_detections, 1), max(other.total_detections, 1)
+        self.encoding = ((self.encoding * weight_self + other.encoding * weight_other)
+                         / (weight_self + weight_other)).astype(np.float32)
+        self.first_seen = min(self.first_seen, other.first_seen)
+        self.last_seen = max(self.last_seen, other.last_seen)
+
+        self.total_detections += other.total_detections
+        self.concentration_total += other.concentration_total
+        for emotion, count in other.emotion_counts.items():
+            self.emotion_counts[emotion] = self.emotion_counts.get(emotion, 0) + count
+
+        timestamps = np.concatenate([np.frombuffer(self.timestamps, dtype=np.float64),
+                                     np.frombuffer(other.timestamps, dtype=np.float64)])
+        order = np.argsort(timestamps, kind='stable')
+        merged = []
+        for name, dtype in (('emotion_codes', np.uint8), ('timestamps', np.float64),
+                            ('confidences', np.float32), ('concentrations', np.float32)):
+            combined = np.concatenate([np.frombuffer(getattr(self, name), dtype=dtype),
+                                       np.frombuffer(getattr(other, name), dtype=dtype)])[order]
+            column = array(getattr(self, name).typecode)
+            column.frombytes(combined.tobytes())
+            merged.append((name, column))
+        for name, column in merged:
+            setattr(self, name, column)
+
+    @property
+    def avg_concentration(self) -> float:
+        return self.concentration_total / self.total_detections if self.total_detections else 0
+
+    @property
+    def dominant_emotion(self) -> str:
+        return max(self.emotion_counts, key=self.emotion_counts.get) if self.emotion_counts else 'unknown'
+
+    def _history_start(self, since: Optional[float]) -> int:
+        # Columns are appended in time order (and kept ordered by absorb), so bisect works
+        return 0 if since is None else bisect_left(self.timestamps, since)
+
+    def emotion_history(self, since: Optional[float] = None) -> List[Dict]:
+        """Detections (optionally only those at or after ``since``, epoch seconds) as dicts"""
+        start = self._history_start(since)
+        labels = EMOTION_LABELS
+        return [
+            {'emotion': labels[code], 'confidence': confidence, 'timestamp': timestamp}
+            for code, confidence, timestamp in zip(
+                self.emotion_codes[start:], self.confidences[start:].tolist(),
+                iso_timestamps(self.timestamps[start:])
+            )
+        ]
+
+    def history_chunks(self, chunk_size: int = 1000) -> Iterator[List[Dict]]:
+        """Detection history as lists of at most ``chunk_size`` dicts, for streaming exports.
+
+        The columns and their length are captured when this is called, so the
+        chunks can be built on another thread: later detections are appended
+        past that length and ``absorb`` replaces the columns instead of
+        rewriting them.
+        """
+        size = len(self.timestamps)
+        emotion_codes, timestamps = self.emotion_codes, self.timestamps
+        confidences, concentrations = self.confidences, self.concentrations
+
+        def chunks():
+            labels = EMOTION_LABELS
+            for start in range(0, size, chunk_size):
+                end = min(start + chunk_size, size)
+                yield [
+                    {'emotion': labels[code], 'confidence': confidence, 'concentration': concentration, 'timestamp': timestamp}
+                    for code, confidence, concentration, timestamp in zip(
+                        emotion_codes[start:end], confidences[start:end].tolist(),
+                        concentrations[start:end].tolist(), iso_timestamps(timestamps[start:end])
+                    )
+                ]
+
+        return chunks()
+
+    @property
+    def emotions(self) -> List[Dict]:
+        """Detection history as {emotion, confidence, timestamp} dicts"""
+        return self.emotion_history()
+
+    @property
+    def concentration_scores(self) -> List[float]:
+        return self.concentrations.tolist()
+
+    def to_dict(self, include_history: bool = True, since: Optional[float] = None):
+        """Dict view of the face; the summary omits the per-detection history"""
+        data = {
+            'face_id': self.face_id,
+            'first_seen': self.first_seen.isoformat(),
+            'last_seen': self.last_seen.isoformat(),
+            'total_detections': self.total_detections,
+            'avg_concentration': self.avg_concentration,
+            'dominant_emotion': self.dominant_emotion,
+            'distraction': self.distraction
+        }
+        if include_history:
+            data['emotions'] = self.emotion_history(since)
+            data['concentration_scores'] = self.concentrations[self._history_start(since):].tolist()
+        return data
@@ -0,0 +1,170 @@
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+# Box colors (BGR) per device type
+DEVICE_COLORS = {
+    'smartphone': (0, 0, 255),      # Red - High distraction
+    'tablet': (0, 100, 255),        # Orange-Red - High distraction
+    'laptop': (255, 100, 0),        # Blue - Work device
+    'monitor': (255, 255, 0),       # Cyan - Work device
+    'book': (0, 255, 0),            # Green - Educational
+    'mouse': (255, 0, 255),         # Magenta - Peripheral
+    'keyboard': (255, 0, 200),      # Pink - Peripheral
+    'remote': (0, 255, 255),        # Yellow - Entertainment
+    'scissors': (128, 128, 128),    # Gray - Tool
+    'toy': (0, 150, 255),           # Orange - Distraction
+    'hair_drier': (100, 100, 100),  # Dark gray - Personal item
+    'toothbrush': (50, 50, 50)      # Very dark gray - Personal item
+}
+
+DISTRACTION_COLORS = {
+    'low': (0, 255, 0),      # Green
+    'medium': (0, 255, 255), # Yellow
+    'high': (0, 0, 255)      # Red
+}
+
+
+def bgr_to_hex(color) -> str:
+    """OpenCV BGR tuple as a CSS #rrggbb color"""
+    blue, green, red = color
+    return f"#{red:02x}{green:02x}{blue:02x}"
+
+
+def device_status_text(detection_result: Dict) -> str:
+    return (f"Distraction: {detection_result['distraction_level'].upper()} | "
+            f"Devices: {detection_result['total_devices']} | "
+            f"Method: {detection_result.get('detection_method', 'simple').upper()}")
+
+
+def darken_region(image: np.ndarray, x1: int, y1: int, x2: int, y2: int, alpha: float = 0.3):
+    """Scale a rectangle of ``image`` by ``alpha`` in place (a black overlay at 1 - alpha opacity)"""
+    height, width = image.shape[:2]
+    x1, y1, x2, y2 = max(x1, 0), max(y1, 0), min(x2, width), min(y2, height)
+    if x2 <= x1 or y2 <= y1:
+        return
+    roi = image[y1:y2, x1:x2]
+    cv2.convertScaleAbs(roi, dst=roi, alpha=alpha)
+
+
+def draw_face_detections(image: np.ndarray, detections: List[Dict]):
+    """Face boxes with emotion and concentration labels, drawn in place"""
+    for detection in detections:
+        loc = detection['face_location']
+        emotion = detection['emotion']
+        confidence = detection['confidence']
+        concentration = detection['concentration']
+
+        # Draw rectangle around face
+        cv2.rectangle(image, (loc['left'], loc['top']), (loc['right'], loc['bottom']), (0, 255, 0), 2)
+
+        # Add text labels
+        label_y = loc['top'] - 10
+        cv2.putText(image, f"{emotion}: {confidence:.1f}%",
+                    (loc['left'], label_y), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+
+        label_y -= 20
+        cv2.putText(image, f"Concentration: {concentration:.1f}%",
+                    (loc['left'], label_y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 2)
+
+
+def draw_devices(image: np.ndarray, devices: List[Dict]):
+    """Device boxes with type/confidence labels, drawn in place"""
+    font = cv2.FONT_HERSHEY_SIMPLEX
+    font_scale = 0.6
+    font_thickness = 2
+    for device in devices:
+        x1, y1, x2, y2 = device['bbox']
+        device_type = device['type']
+        confidence = device['confidence']
+        color = DEVICE_COLORS.get(device_type, (255, 255, 255))
+
+        # Draw bounding box with thickness based on confidence
+        thickness = max(1, int(confidence * 3))
+        cv2.rectangle(image, (x1, y1), (x2, y2), color, thickness)
+
+        # Prepare label with confidence and type
+        label = f"{device_type}: {confidence:.2f}"
+        if 'original_class' in device:
+            label += f" ({device['original_class']})"
+
+        # Draw label background and text
+        (label_w, label_h), baseline = cv2.getTextSize(label, font, font_scale, font_thickness)
+        label_y = y1 - 10 if y1 - 10 > label_h else y1 + label_h + 10
+        cv2.rectangle(image, (x1, label_y - label_h - 5), (x1 + label_w, label_y + baseline), color, -1)
+        cv2.putText(image, label, (x1, label_y - 5), font, font_scale, (255, 255, 255), font_thickness)
+
+
+def draw_device_status(image: np.ndarray, detection_result: Dict):
+    """Distraction/device status bar: only the bar's region is blended"""
+    distraction_color = DISTRACTION_COLORS.get(detection_result['distraction_level'], (255, 255, 255))
+    status_text = device_status_text(detection_result)
+    darken_region(image, 5, 5, len(status_text) * 12 + 1, 41, alpha=0.3)
+    cv2.putText(image, status_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, distraction_color, 2)
+
+
+def overlay_layers(frame_shape, detections: List[Dict], device_result: Optional[Dict] = None) -> Dict:
+    """The annotation layers as box/label/color metadata, for clients that draw the overlays themselves"""
+    height, width = frame_shape[:2]
+    faces = []
+    for detection in detections:
+        loc = detection['face_location']
+        faces.append({
+            'face_id': detection.get('face_id'),
+            'box': [loc['left'], loc['top'], loc['right'], loc['bottom']],
+            'color': bgr_to_hex((0, 255, 0)),
+            'labels': [
+                {'text': f"{detection['emotion']}: {detection['confidence']:.1f}%", 'color': bgr_to_hex((0, 255, 0))},
+                {'text': f"Concentration: {detection['concentration']:.1f}%", 'color': bgr_to_hex((255, 255, 0))}
+            ]
+        })
+
+    devices, status = [], None
+    if device_result is not None:
+        for device in device_result['detected_devices']:
+            label = f"{device['type']}: {device['confidence']:.2f}"
+            if 'original_class' in device:
+                label += f" ({device['original_class']})"
+            devices.append({
+                'track_id': device.get('track_id'),
+                'box': list(device['bbox']),
+                'color': bgr_to_hex(DEVICE_COLORS.get(device['type'], (255, 255, 255))),
+                'thickness': max(1, int(device['confidence'] * 3)),
+                'label': label,
+                'predicted': device.get('predicted', False)
+            })
+        status = {
+            'text': device_status_text(device_result),
+            'color': bgr_to_hex(DISTRACTION_COLORS.get(device_result['distraction_level'], (255, 255, 255)))
+        }
+
+    return {'width': width, 'height': height, 'faces': faces, 'devices': devices, 'status': status}
+
+
+class FrameCompositor:
+    """Draws every annotation layer into one reusable output buffer.
+
+    ``begin`` copies the camera frame into the buffer (the only per-frame
+    copy, the raw frame stays untouched for other consumers); the layers are
+    then drawn in place and the status bar blends only its own region.
+    """
+
+    def __init__(self):
+        self._buffer: Optional[np.ndarray] = None
+
+    def begin(self, frame: np.ndarray) -> np.ndarray:
+        if self._buffer is None or self._buffer.shape != frame.shape or self._buffer.dtype != frame.dtype:
+            self._buffer = np.empty_like(frame)
+        np.copyto(self._buffer, frame)
+        return self._buffer
+
+    def compose(self, frame: np.ndarray, face_detections: List[Dict],
+                device_result: Optional[Dict] = None) -> np.ndarray:
+        """Annotated frame (faces, devices, status bar); valid until the next call"""
+        canvas = self.begin(frame)
+        draw_face_detections(canvas, face_detections)
+        if device_result is not None:
+            draw_devices(canvas, device_result['detected_devices'])
+            draw_device_status(canvas, device_result)
+        return canvas
@@ -0,0 +1,163 @@
+import base64
+import time
+from dataclasses import asdict, dataclass, replace
+from typing import Dict, Iterable, List, Optional
+
+import cv2
+import numpy as np
+
+
+@dataclass(frozen=True)
+class EncodingTier:
+    """One JPEG rendition of the stream: frames taller than ``max_height`` are downscaled (None keeps full size)"""
+    name: str
+    max_height: Optional[int] = None
+    quality: int = 80
+
+    def __post_init__(self):
+        if not 1 <= self.quality <= 100:
+            raise ValueError("JPEG quality must be between 1 and 100")
+        if self.max_height is not None and self.max_height <= 0:
+            raise ValueError("max_height must be positive")
+
+
+DEFAULT_TIERS = (
+    EncodingTier('thumbnail', max_height=320, quality=60),
+    EncodingTier('full', max_height=None, quality=85),
+)
+DEFAULT_TIER = 'full'
+
+
+class _TierStats:
+    __slots__ = ('frames', 'encode_seconds', 'bytes', 'last_encode_seconds', 'last_bytes', 'width', 'height')
+
+    def __init__(self):
+        self.frames = 0
+        self.encode_seconds = 0.0
+        self.bytes = 0
+        self.last_encode_seconds = 0.0
+        self.last_bytes = 0
+        self.width = 0
+        self.height = 0
+
+    def to_dict(self) -> Dict:
+        return {
+            'frames': self.frames,
+            'avg_encode_ms': self.encode_seconds * 1000 / self.frames if self.frames else 0.0,
+            'last_encode_ms': self.last_encode_seconds * 1000,
+            'avg_bytes': self.bytes / self.frames if self.frames else 0.0,
+            'last_bytes': self.last_bytes,
+            'resolution': [self.width, self.height]
+        }
+
+
+class TieredEncoder:
+    """Encodes each frame into a small set of JPEG tiers (simulcast).
+
+    ``encode`` only produces the tiers that are asked for, and each tier at
+    most once per frame: the bytes (and their base64 form) are cached until
+    the next frame, so any number of viewers of a tier share one encode.
+    """
+
+    def __init__(self, tiers: Iterable[EncodingTier] = DEFAULT_TIERS):
+        self.tiers: Dict[str, EncodingTier] = {tier.name: tier for tier in tiers}
+        if not self.tiers:
+            raise ValueError("At least one encoding tier is required")
+        self.frame_id = 0
+        self._frame: Optional[np.ndarray] = None
+        self._encoded: Dict[str, bytes] = {}
+        self._base64: Dict[str, str] = {}
+        self._resize_buffers: Dict[str, np.ndarray] = {}
+        self._stats: Dict[str, _TierStats] = {name: _TierStats() for name in self.tiers}
+
+    def begin_frame(self, frame: np.ndarray) -> int:
+        """Start a new frame, the previous frame's encodings are dropped"""
+        self.frame_id += 1
+        self._frame = frame
+        self._encoded = {}
+        self._base64 = {}
+        return self.frame_id
+
+    def _resized(self, name: str, frame: np.ndarray) -> np.ndarray:
+        max_height = self.tiers[name].max_height
+        height, width = frame.shape[:2]
+        if max_height is None or height <= max_height:
+            return frame
+        shape = (max_height, max(1, round(width * max_height / height))) + frame.shape[2:]
+        # Downscale into a buffer reused across frames
+        buffer = self._resize_buffers.get(name)
+        if buffer is None or buffer.shape != shape or buffer.dtype != frame.dtype:
+            buffer = self._resize_buffers[name] = np.empty(shape, dtype=frame.dtype)
+        cv2.resize(frame, (shape[1], shape[0]), dst=buffer, interpolation=cv2.INTER_AREA)
+        return buffer
+
+    def get_bytes(self, name: str) -> Optional[bytes]:
+        """JPEG bytes of the current frame in tier ``name``, encoded on first request"""
+        if name in self._encoded:
+            return self._encoded[name]
+        if self._frame is None:
+            return None
+        if name not in self.tiers:
+            raise KeyError(name)
+
+        started = time.perf_counter()
+        image = self._resized(name, self._frame)
+        ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, self.tiers[name].quality])
+        elapsed = time.perf_counter() - started
+        if not ok:
+            return None
+
+        data = buffer.tobytes()
+        self._encoded[name] = data
+        stats = self._stats[name]
+        stats.frames += 1
+        stats.encode_seconds += elapsed
+        stats.bytes += len(data)
+        stats.last_encode_seconds = elapsed
+        stats.last_bytes = len(data)
+        stats.height, stats.width = image.shape[:2]
+        return data
+
+    def get_base64(self, name: str) -> Optional[str]:
+        """Base64 text of ``get_bytes(name)``, also computed once per frame"""
+        if name not in self._base64:
+            data = self.get_bytes(name)
+            if data is None:
+                return None
+            self._base64[name] = base64.b64encode(data).decode('utf-8')
+        return self._base64[name]
+
+    def encode(self, names: Iterable[str]) -> Dict[str, bytes]:
+        """Encode the requested tiers of the current frame (typically those with at least one viewer)"""
+        encoded = {}
+        for name in names:
+            data = self.get_bytes(name)
+            if data is not None:
+                encoded[name] = data
+        return encoded
+
+    def configure(self, name: str, quality: Optional[int] = None, max_height: Optional[int] = None,
+                  full_size: bool = False) -> EncodingTier:
+        """Change a tier's quality/height at runtime, applies from the next frame"""
+        if name not in self.tiers:
+            raise KeyError(name)
+        tier = self.tiers[name]
+        changes = {}
+        if quality is not None:
+            changes['quality'] = quality
+        if full_size:
+            changes['max_height'] = None
+        elif max_height is not None:
+            changes['max_height'] = max_height
+        self.tiers[name] = replace(tier, **changes)
+        return self.tiers[name]
+
+    def tier_names(self) -> List[str]:
+        return list(self.tiers)
+
+    def describe(self) -> Dict[str, Dict]:
+        """Per-tier settings with encode time and size statistics"""
+        return {
+            name: dict(asdict(tier), stats=self._stats[name].to_dict())
+            for name, tier in self.tiers.items()
+        }
@@ -0,0 +1,166 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from face_index import FaceIndex
+
+
+def find_duplicate_groups(face_ids: List[str], encodings: np.ndarray, merge_threshold: float,
+                          neighbours: int = 8, nprobe: int = 16) -> List[List[str]]:
+    """Group faces whose encodings are all within ``merge_threshold`` (Euclidean) of each other.
+
+    Candidate pairs are each face's ``neighbours`` nearest faces in a FaceIndex
+    over the encodings, so memory stays O(N * neighbours). Pairs are joined
+    closest first with complete linkage: two groups merge only when every
+    pair across them is within the threshold, so a chain A~B~C does not pull
+    a distant A and C together.
+    """
+    count = len(face_ids)
+    if count < 2:
+        return []
+
+    encodings = np.asarray(encodings, dtype=np.float32)
+    index = FaceIndex(dimension=encodings.shape[1], nprobe=nprobe, background_training=False)
+    index.add_many(face_ids, encodings)
+    positions = {face_id: position for position, face_id in enumerate(face_ids)}
+
+    pairs: Dict[Tuple[int, int], float] = {}
+    for start in range(0, count, 4096):
+        results = index.search_batch(encodings[start:start + 4096], k=neighbours + 1)
+        for offset, nearest in enumerate(results):
+            i = start + offset
+            for face_id, distance in nearest:
+                j = positions[face_id]
+                if j != i and distance < merge_threshold:
+                    pairs[(min(i, j), max(i, j))] = distance
+    if not pairs:
+        return []
+
+    # Agglomerate closest pairs first; groups are keyed by their first member
+    squared_threshold = merge_threshold ** 2
+    group_of: Dict[int, int] = {}
+    groups: Dict[int, List[int]] = {}
+    for (i, j), _ in sorted(pairs.items(), key=lambda item: item[1]):
+        a, b = group_of.get(i, i), group_of.get(j, j)
+        if a == b:
+            continue
+        members_a, members_b = groups.get(a, [a]), groups.get(b, [b])
+        difference = encodings[members_a][:, None, :] - encodings[members_b][None, :, :]
+        if np.einsum('ijk,ijk->ij', difference, difference).max() >= squared_threshold:
+            continue
+        groups[a] = members_a + members_b
+        groups.pop(b, None)
+        for member in groups[a]:
+            group_of[member] = a
+
+    return [[face_ids[member] for member in members] for members in groups.values()]
+
+
+class GalleryMaintainer:
+    """Background job that merges duplicate identities and evicts stale faces.
+
+    Clustering runs in a worker thread on a copy of the gallery encodings; the
+    merges and evictions are then applied on the event loop through the
+    tracker, which keeps the index, the snapshot and ChromaDB in sync. Faces
+    that are merged away or evicted are archived first (``archive_path``) and
+    lose their stored thumbnail.
+    """
+
+    def __init__(self, tracker, merge_threshold: float = 0.5, stale_after_hours: float = 24 * 30,
+                 archive_path: Optional[str] = "face_archive.jsonl", interval_seconds: float = 600,
+                 thumbnails=None):
+        self.tracker = tracker
+        self.thumbnails = thumbnails
+        self.merge_threshold = merge_threshold
+        self.stale_after_hours = stale_after_hours
+        self.archive_path = archive_path
+        self.interval_seconds = interval_seconds
+        self.last_report: Optional[Dict] = None
+
+    def _drop_thumbnails(self, face_ids: List[str]):
+        if self.thumbnails is not None:
+            for face_id in face_ids:
+                self.thumbnails.remove(face_id)
+
+    def _pick_survivor(self, group: List[str]) -> str:
+        # Keep the most observed identity, the oldest one on ties
+        faces = [self.tracker.tracked_faces[face_id] for face_id in group]
+        return max(faces, key=lambda face: (face.total_detections, -face.first_seen.timestamp())).face_id
+
+    def _archive(self, face_ids: List[str], reason: str, merged_into: Optional[str] = None):
+        """Append the faces (with their encodings) to the archive before they leave the gallery"""
+        if not self.archive_path:
+            return
+        with open(self.archive_path, 'a') as f:
+            for face_id in face_ids:
+                face = self.tracker.tracked_faces[face_id]
+                record = face.to_dict()
+                record['encoding'] = face.encoding.tolist()
+                record['archived_at'] = datetime.now().isoformat()
+                record['reason'] = reason
+                if merged_into is not None:
+                    record['merged_into'] = merged_into
+                f.write(json.dumps(record, default=str) + "\n")
+
+    def merge_duplicates(self, groups: List[List[str]]) -> int:
+        """Fold each group into its most observed face, archiving the duplicates first"""
+        merged = 0
+        for group in groups:
+            group = [face_id for face_id in group if face_id in self.tracker.tracked_faces]
+            if len(group) < 2:
+                continue
+            keep_id = self._pick_survivor(group)
+            duplicate_ids = [face_id for face_id in group if face_id != keep_id]
+            self._archive(duplicate_ids, 'merged', merged_into=keep_id)
+            self.tracker.merge_faces(keep_id, duplicate_ids)
+            self._drop_thumbnails(duplicate_ids)
+            merged += len(duplicate_ids)
+        return merged
+
+    def evict_stale(self, now: Optional[datetime] = None) -> int:
+        """Remove faces not seen for ``stale_after_hours``, archiving them first if configured"""
+        cutoff = (now or datetime.now()) - timedelta(hours=self.stale_after_hours)
+        stale_ids = [face_id for face_id, face in self.tracker.tracked_faces.items() if face.last_seen < cutoff]
+        if not stale_ids:
+            return 0
+
+        self._archive(stale_ids, 'evicted')
+        for face_id in stale_ids:
+            self.tracker.remove_face(face_id)
+        self._drop_thumbnails(stale_ids)
+        return len(stale_ids)
+
+    async def run_once(self) -> Dict:
+        """One maintenance pass: evict stale faces, then merge duplicates"""
+        started = datetime.now()
+        evicted = self.evict_stale(started)
+
+        face_ids = list(self.tracker.tracked_faces.keys())
+        groups = []
+        if len(face_ids) > 1:
+            encodings = np.stack([self.tracker.tracked_faces[face_id].encoding for face_id in face_ids])
+            groups = await asyncio.to_thread(find_duplicate_groups, face_ids, encodings, self.merge_threshold)
+        merged = self.merge_duplicates(groups)
+
+        self.last_report = {
+            'evicted': evicted,
+            'merged': merged,
+            'duplicate_groups': len(groups),
+            'remaining_faces': len(self.tracker.tracked_faces),
+            'duration_ms': (datetime.now() - started).total_seconds() * 1000,
+            'ran_at': started.isoformat()
+        }
+        return self.last_report
+
+    async def run_forever(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                report = await self.run_once()
+                if report['evicted'] or report['merged']:
+                    print(f"Gallery maintenance: merged {report['merged']}, evicted {report['evicted']}")
+            except Exception as e:
+                print(f"Error in gallery maintenance: {e}")
@@ -1,21 +1,41 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 import cv2
 import numpy as np
 import asyncio
 import json
-import base64
 from typing import List, Dict, Optional
 from datetime import datetime
+from email.utils import formatdate
 import uvicorn
 
 from emotion_detector import EmotionDetector
 from vector_face_tracker import VectorFaceTracker
 from device_detector import DeviceDetector
 from sign_language_detector import SignLanguageDetector
+from gallery_maintenance import GalleryMaintainer
+from statistics_snapshot import StatisticsPublisher
+from event_log import EventLog
+from stage_scheduler import StageScheduler
+from frame_compositor import FrameCompositor, overlay_layers
+from frame_encoder import DEFAULT_TIER, TieredEncoder
+from mjpeg_stream import MEDIA_TYPE as MJPEG_MEDIA_TYPE, MjpegHub
+from face_thumbnails import FaceThumbnailStore
+from serialization import DetectionUpdate, FragmentCache, dumps, dumps_text
+from export_jobs import EXPORT_KINDS, ExportJobManager
 
-app = FastAPI(title="Student Concentration Tracker API", version="1.0.0")
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with the fast encoder (numpy scalars and arrays included).
+
+    Routes returning it directly also skip FastAPI's jsonable_encoder pass,
+    which walks the whole result and fails on numpy scalars.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+app = FastAPI(title="Student Concentration Tracker API", version="1.0.0", default_response_class=FastJSONResponse)
 
 # CORS middleware
 app.add_middleware(
@@ -29,31 +49,86 @@ app.add_middleware(
 # Global instances
 emotion_detector = EmotionDetector()
 face_tracker = VectorFaceTracker()
-device_detector = DeviceDetector()
+event_log = EventLog()
+device_detector = DeviceDetector(event_log=event_log)
 sign_language_detector = SignLanguageDetector()
+# Best recent crop per face, JPEG-encoded only when a client fetches it
+face_thumbnails = FaceThumbnailStore()
+gallery_maintainer = GalleryMaintainer(face_tracker, thumbnails=face_thumbnails)
+statistics_publisher = StatisticsPublisher(face_tracker, device_detector)
+# Reusable output buffer of the annotated camera frame
+frame_compositor = FrameCompositor()
+# JPEG tiers of the camera stream, each encoded at most once per frame
+frame_encoder = TieredEncoder()
+# MJPEG viewers of the encoded streams
+mjpeg_hub = MjpegHub(['camera', 'signlanguage'])
+# Serialized message sections reused while unchanged
+message_fragments = FragmentCache()
+# Background NDJSON exports
+export_jobs = ExportJobManager(face_tracker, device_detector, statistics_publisher)
+
+# Per-stage cadences of the frame loop (seconds), faces and devices never run in the same tick
+stage_scheduler = StageScheduler({'faces': 0.2, 'devices': 2.0}, exclusive={'faces', 'devices'})
+
+# Where the faces stage looks: "full_frame", or "person_regions" (inside YOLO person boxes)
+FACE_SEARCH_MODES = ("full_frame", "person_regions")
+face_search_mode = "full_frame"
+
+# Who draws the annotations: "server" (burned into the JPEG) or "client" (raw JPEG plus overlay metadata)
+OVERLAY_MODES = ("server", "client")
+overlay_mode = "server"
 
 # WebSocket connection manager
 class ConnectionManager:
     def __init__(self):
         self.active_connections: List[WebSocket] = []
+        # Stream tier each connection watches
+        self.tiers: Dict[WebSocket, str] = {}
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, tier: str = DEFAULT_TIER):
         await websocket.accept()
         self.active_connections.append(websocket)
+        self.tiers[websocket] = tier
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        if websocket in self.active_connections:
+            self.active_connections.remove(websocket)
+        self.tiers.pop(websocket, None)
+
+    def set_tier(self, websocket: WebSocket, tier: str):
+        self.tiers[websocket] = tier
+
+    def subscribed_tiers(self) -> List[str]:
+        """Tiers with at least one viewer"""
+        return sorted(set(self.tiers.values()))
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
         await websocket.send_text(message)
 
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
+    async def _send_all(self, message_for):
+        # Iterate over a snapshot, dead connections are removed afterwards
+        dead = []
+        for connection in list(self.active_connections):
+            message = message_for(connection)
+            if message is None:
+                continue
             try:
                 await connection.send_text(message)
-            except:
-                # Remove dead connections
-                self.active_connections.remove(connection)
+            except Exception:
+                dead.append(connection)
+        for connection in dead:
+            self.disconnect(connection)
+
+    async def broadcast(self, message: str):
+        await self._send_all(lambda connection: message)
+
+    async def broadcast_by_tier(self, messages: Dict[str, str]):
+        """Send every connection the message of the tier it watches.
+
+        A connection that switched to a tier not encoded for this frame (set_tier
+        while sending) is skipped until the next frame, it is not disconnected.
+        """
+        await self._send_all(lambda connection: messages.get(self.tiers.get(connection)))
 
 manager = ConnectionManager()
 
@@ -65,35 +140,135 @@ cap = None
 async def root():
     return {"message": "Student Concentration Tracker API", "status": "running"}
 
+def _history_since(since: Optional[str], history_minutes: Optional[float]) -> Optional[float]:
+    """Start of the requested history window as epoch seconds"""
+    if since:
+        return datetime.fromisoformat(since).timestamp()
+    if history_minutes is not None:
+        return datetime.now().timestamp() - history_minutes * 60
+    return None
+
+def _conditional_json(request: Request, etag: str, build_content) -> Response:
+    """304 when the client already has this version, otherwise the JSON body with its ETag"""
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return FastJSONResponse(content=build_content(), headers=headers)
+
 @app.get("/faces")
-async def get_all_faces():
-    """Get all tracked faces with their statistics"""
+async def get_all_faces(request: Request, cursor: Optional[str] = None, limit: int = 0,
+                        fields: str = "full", since: Optional[str] = None,
+                        history_minutes: Optional[float] = None):
+    """Get tracked faces with their statistics.
+
+    - cursor/limit: page through faces ordered by face_id (next_cursor is null on the last page)
+    - fields: "summary" for aggregates only, "full" to include the detection history
+    - since/history_minutes: only return history from this ISO time / the last N minutes
+    """
+    if fields not in ("summary", "full"):
+        raise HTTPException(status_code=400, detail="fields must be 'summary' or 'full'")
+    try:
+        history_since = _history_since(since, history_minutes)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="since must be an ISO timestamp")
+    
     try:
-        faces = face_tracker.get_all_faces()
-        return {"faces": faces, "count": len(faces)}
+        def build_content():
+            faces, next_cursor = face_tracker.get_faces_page(
+                cursor=cursor,
+                limit=limit,
+                include_history=fields == "full",
+                since=history_since
+            )
+            return {
+                "faces": faces,
+                "count": len(faces),
+                "total": len(face_tracker.tracked_faces),
+                "next_cursor": next_cursor,
+                "version": face_tracker.version
+            }
+        
+        # A relative history window changes with the clock, so it is not revalidated
+        if history_minutes is not None:
+            return FastJSONResponse(content=build_content())
+        return _conditional_json(request, f'W/"faces-{face_tracker.version}"', build_content)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/faces/{face_id}")
-async def get_face_by_id(face_id: str):
-    """Get specific face by ID"""
+async def get_face_by_id(request: Request, face_id: str, fields: str = "full",
+                         since: Optional[str] = None, history_minutes: Optional[float] = None):
+    """Get specific face by ID (same fields/since/history_minutes options as /faces)"""
+    if fields not in ("summary", "full"):
+        raise HTTPException(status_code=400, detail="fields must be 'summary' or 'full'")
+    try:
+        history_since = _history_since(since, history_minutes)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="since must be an ISO timestamp")
+    
+    face_vector = face_tracker.tracked_faces.get(face_id)
+    if face_vector is None:
+        raise HTTPException(status_code=404, detail="Face not found")
+    
     try:
-        face = face_tracker.get_face_by_id(face_id)
-        if face is None:
-            raise HTTPException(status_code=404, detail="Face not found")
-        return face
+        def build_content():
+            return face_tracker.get_face_by_id(face_id, fields == "full", history_since)
+        
+        if history_minutes is not None:
+            return FastJSONResponse(content=build_content())
+        # The face's change version covers detections and distraction changes, the
+        # distraction timestamp refreshes on every devices tick without a change
+        distraction_at = face_vector.distraction['updated_at'] if face_vector.distraction else ''
+        etag = f'W/"face-{face_id}-{face_tracker.face_version(face_id)}-{distraction_at}"'
+        return _conditional_json(request, etag, build_content)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/faces/{face_id}/thumbnail")
+async def get_face_thumbnail(request: Request, face_id: str, v: Optional[int] = None):
+    """JPEG thumbnail of a face. With ?v=<thumbnail_version> the response is cacheable for good"""
+    thumbnail = face_thumbnails.get(face_id)
+    if thumbnail is None:
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
+    
+    jpeg, version, updated_at = thumbnail
+    etag = f'"thumb-{face_id}-{version}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(updated_at, usegmt=True),
+        # A versioned URL never changes, the bare URL is revalidated with the ETag
+        "Cache-Control": "public, max-age=31536000, immutable" if v == version else "no-cache"
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=jpeg, media_type="image/jpeg", headers=headers)
+
 @app.get("/statistics")
 async def get_statistics():
     """Get overall statistics about all tracked faces"""
     try:
-        stats = face_tracker.get_face_statistics()
-        return stats
+        return FastJSONResponse(statistics_publisher.current.faces)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/faces/maintenance")
+async def run_gallery_maintenance():
+    """Merge duplicate identities and evict stale faces now"""
+    try:
+        return await gallery_maintainer.run_once()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/faces/maintenance")
+async def get_gallery_maintenance_status():
+    """Get the settings and result of the last gallery maintenance pass"""
+    return {
+        "merge_threshold": gallery_maintainer.merge_threshold,
+        "stale_after_hours": gallery_maintainer.stale_after_hours,
+        "interval_seconds": gallery_maintainer.interval_seconds,
+        "last_report": gallery_maintainer.last_report
+    }
+
 @app.post("/camera/start")
 async def start_camera():
     """Start the camera and begin detection"""
@@ -140,17 +315,16 @@ async def get_camera_status():
 async def get_device_counts():
     """Get current device counts"""
     try:
-        stats = device_detector.get_device_statistics()
-        return stats
+        return FastJSONResponse(statistics_publisher.current.devices)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/devices/history")
 async def get_device_history(hours: int = 24):
-    """Get device detection history for the last N hours"""
+    """Get device detection history for the last N hours (per-minute/hour buckets for long ranges)"""
     try:
-        history = device_detector.get_device_history(hours)
-        return {"history": history, "count": len(history)}
+        history = device_detector.get_device_history(hours * 60)
+        return FastJSONResponse({"history": history, "count": len(history)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -158,25 +332,24 @@ async def get_device_history(hours: int = 24):
 async def get_device_statistics():
     """Get device detection statistics"""
     try:
-        stats = device_detector.get_device_statistics()
-        return stats
+        return FastJSONResponse(statistics_publisher.current.devices)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/devices/current")
 async def get_current_devices():
     """Get current device detection summary"""
-    return device_detector.get_current_device_summary()
+    return FastJSONResponse(device_detector.get_current_device_summary())
 
 @app.get("/api/devices/statistics")
 async def get_device_statistics_api():
     """Get device detection statistics for API"""
-    return device_detector.get_device_statistics()
+    return FastJSONResponse(statistics_publisher.current.devices)
 
 @app.get("/api/devices/history")
 async def get_device_history_api(minutes: int = 60):
     """Get device detection history for API"""
-    return device_detector.get_device_history(minutes)
+    return FastJSONResponse(device_detector.get_device_history(minutes))
 
 @app.post("/api/devices/clear-history")
 async def clear_device_history():
@@ -207,11 +380,20 @@ async def get_device_type_history(device_type: str, hours: int = 24):
     try:
         history = device_detector.get_device_type_history(device_type, hours)
         stats = device_detector.get_device_timeline_stats(device_type, hours)
-        return {
+        return FastJSONResponse({
             "device_type": device_type,
             "history": history,
             "statistics": stats
-        }
+        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/devices/tracks")
+async def get_device_tracks(include_finished: bool = True):
+    """Tracked devices (persistent ids) with first/last seen and dwell time"""
+    try:
+        tracks = device_detector.get_device_tracks(include_finished)
+        return FastJSONResponse({"tracks": tracks, "count": len(tracks)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -219,21 +401,112 @@ async def get_device_type_history(device_type: str, hours: int = 24):
 async def get_detected_device_types():
     """Get all device types that have been detected"""
     try:
-        return {
+        return FastJSONResponse({
             "detected_types": device_detector.get_all_device_types_detected(),
             "supported_types": device_detector.get_supported_devices()
-        }
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/devices/export")
-async def export_device_data():
-    """Export device data to JSON"""
-    success = device_detector.save_device_data("device_export.json")
-    if success:
-        return {"message": "Device data exported successfully"}
-    else:
-        raise HTTPException(status_code=500, detail="Failed to export device data")
+async def export_device_data(compress: bool = False):
+    """Export device data as a background NDJSON job (see /api/exports/{job_id})"""
+    try:
+        job = export_jobs.start('devices', compress)
+        return {"message": f"Device export started, writing {job.filename}", "job": job.to_dict()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to export device data: {str(e)}")
+
+@app.get("/api/emotions/timeline")
+async def get_emotion_timeline(hours: float = 24, face_id: Optional[str] = None):
+    """Emotion detections from the event log: raw events for one face or short ranges, rollups otherwise"""
+    try:
+        since = datetime.now().timestamp() - hours * 3600
+        return FastJSONResponse(event_log.emotion_timeline(since, face_id))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/pipeline/cadence")
+async def get_pipeline_cadence():
+    """Interval, exclusivity and result age of every frame-loop stage"""
+    return stage_scheduler.describe()
+
+@app.post("/api/pipeline/cadence")
+async def set_pipeline_cadence(stage: str, interval_ms: float):
+    """Change how often a frame-loop stage (faces, devices) runs"""
+    try:
+        stage_scheduler.set_cadence(stage, interval_ms / 1000)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown stage '{stage}'")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "message": f"Stage '{stage}' now runs every {interval_ms:g} ms",
+        "stages": stage_scheduler.describe()
+    }
+
+@app.get("/api/stream/tiers")
+async def get_stream_tiers():
+    """Settings and per-tier encode time/size statistics of the camera stream"""
+    return {
+        "default": DEFAULT_TIER,
+        "tiers": frame_encoder.describe(),
+        "viewers": {tier: list(manager.tiers.values()).count(tier) for tier in frame_encoder.tier_names()},
+        "mjpeg": mjpeg_hub.describe()
+    }
+
+@app.get("/api/stream/{source}/mjpeg")
+async def stream_mjpeg(source: str, tier: str = DEFAULT_TIER):
+    """Annotated video as multipart/x-mixed-replace JPEG, usable directly in an <img> tag"""
+    if source not in mjpeg_hub.sources:
+        raise HTTPException(status_code=404, detail=f"Unknown source '{source}', expected one of {mjpeg_hub.sources}")
+    if tier not in frame_encoder.tiers:
+        raise HTTPException(status_code=404, detail=f"Unknown tier '{tier}', expected one of {frame_encoder.tier_names()}")
+    return StreamingResponse(
+        mjpeg_hub.stream(source, tier),
+        media_type=MJPEG_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache, no-store", "Pragma": "no-cache"}
+    )
+
+@app.post("/api/stream/tiers/{tier}")
+async def configure_stream_tier(tier: str, quality: Optional[int] = None, max_height: Optional[int] = None,
+                                full_size: bool = False):
+    """Change a stream tier's JPEG quality or height (full_size=true disables downscaling)"""
+    try:
+        frame_encoder.configure(tier, quality=quality, max_height=max_height, full_size=full_size)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown tier '{tier}'")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"message": f"Tier '{tier}' updated", "tiers": frame_encoder.describe()}
+
+@app.get("/api/pipeline/face-search")
+async def get_face_search_mode():
+    """Current face search mode"""
+    return {"mode": face_search_mode, "modes": list(FACE_SEARCH_MODES)}
+
+@app.post("/api/pipeline/face-search")
+async def set_face_search_mode(mode: str):
+    """Scan the full frame for faces, or only the regions of YOLO person detections"""
+    global face_search_mode
+    if mode not in FACE_SEARCH_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown mode '{mode}', expected one of {list(FACE_SEARCH_MODES)}")
+    face_search_mode = mode
+    return {"message": f"Face search mode set to {mode}", "mode": mode}
+
+@app.get("/api/pipeline/overlay")
+async def get_overlay_mode():
+    """Current overlay mode of the camera stream"""
+    return {"mode": overlay_mode, "modes": list(OVERLAY_MODES)}
+
+@app.post("/api/pipeline/overlay")
+async def set_overlay_mode(mode: str):
+    """Draw the overlays into the frame on the server, or send the raw frame and let clients draw them"""
+    global overlay_mode
+    if mode not in OVERLAY_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown mode '{mode}', expected one of {list(OVERLAY_MODES)}")
+    overlay_mode = mode
+    return {"message": f"Overlay mode set to {mode}", "mode": mode}
 
 # Sign Language Endpoints
 @app.get("/api/signlanguage/statistics")
@@ -257,93 +530,195 @@ async def process_camera_frames():
     """Background task to process camera frames"""
     global camera_active, cap
     
-    frame_count = 0
+    stage_scheduler.reset()
     while camera_active and cap is not None:
         try:
             ret, frame = cap.read()
             if not ret:
                 break
             
-            # Process every 5th frame to reduce computational load
-            frame_count += 1
-            if frame_count % 5 != 0:
-                await asyncio.sleep(0.033)  # ~30 FPS
+            # Only run the stages whose cadence is due, the others republish their last result
+            stages = stage_scheduler.plan()
+            if not stages:
+                await asyncio.sleep(min(0.033, stage_scheduler.time_until_next()))
                 continue
             
-            # Detect emotions in the frame
-            detections = emotion_detector.detect_emotions_in_frame(frame)
-            
-            # Process each detection for face tracking
-            detection_results = []
-            for detection in detections:
-                face_encoding = detection['face_encoding']
-                emotion = detection['emotion']
-                confidence = detection['confidence']
-                concentration = detection['concentration']
-                face_image = detection['face_image']
+            if 'faces' in stages:
+                # Person boxes from the last device pass, falls back to a full-frame scan when unavailable or stale
+                search_regions = None
+                if face_search_mode == "person_regions":
+                    persons = device_detector.get_person_detections(max_age=stage_scheduler.intervals['devices'] * 1.5)
+                    if persons is not None:
+                        search_regions = [person['bbox'] for person in persons]
                 
-                # Add or update face in vector tracker
-                face_id = face_tracker.add_or_update_face(
-                    face_encoding, emotion, confidence, concentration
-                )
+                # Detect emotions in the frame
+                detections = emotion_detector.detect_emotions_in_frame(frame, search_regions)
+                
+                # Add or update all faces in the vector tracker with one batched gallery lookup
+                face_ids = face_tracker.add_or_update_faces(detections)
+                
+                # Append the emotion detections to the durable event log
+                event_log.record_emotions([
+                    (datetime.fromisoformat(detection['timestamp']).timestamp(), face_id,
+                     detection['emotion'], float(detection['confidence']), float(detection['concentration']))
+                    for detection, face_id in zip(detections, face_ids)
+                ])
                 
-                detection_results.append({
-                    'face_id': face_id,
-                    'emotion': emotion,
-                    'confidence': confidence,
-                    'concentration': concentration,
-                    'face_location': detection['face_location'],
-                    'face_image': face_image,
-                    'timestamp': detection['timestamp']
-                })
+                # Process each detection for face tracking
+                detection_results = []
+                for detection, face_id in zip(detections, face_ids):
+                    emotion = detection['emotion']
+                    confidence = detection['confidence']
+                    concentration = detection['concentration']
+                    # Clients fetch /faces/{face_id}/thumbnail when the version changes
+                    thumbnail_version = face_thumbnails.offer(face_id, detection['face_crop'])
+                    
+                    detection_results.append({
+                        'face_id': face_id,
+                        'emotion': emotion,
+                        'confidence': confidence,
+                        'concentration': concentration,
+                        'face_location': detection['face_location'],
+                        'thumbnail_version': thumbnail_version,
+                        'timestamp': detection['timestamp']
+                    })
+                stage_scheduler.record('faces', (detections, detection_results))
+            
+            if 'devices' in stages:
+                # Deep learning device detection
+                stage_scheduler.record('devices', device_detector.detect_devices_in_frame(frame))
+            
+            faces_result, faces_age = stage_scheduler.held('faces')
+            detections, detection_results = faces_result or ([], [])
+            device_result, devices_age = stage_scheduler.held('devices')
+            if device_result is None:
+                device_result = device_detector.empty_detection_result('pending')
+            elif 'devices' not in stages:
+                # Between detections the tracker propagates the device boxes
+                device_result = device_detector.propagate_detection_result(device_result)
+            device_result = dict(device_result, age_ms=(devices_age or 0) * 1000)
             
-            # Deep learning device detection
-            device_result = device_detector.detect_devices_in_frame(frame)
+            # Per-student distraction from the devices nearest to each student
+            distraction = device_detector.associate_devices_to_faces(
+                device_result['detected_devices'], detection_results, device_result.get('persons')
+            )
+            for face_id, face_distraction in distraction.items():
+                face_distraction['updated_at'] = device_result['timestamp']
+                face_tracker.set_face_distraction(face_id, face_distraction)
+            detection_results = [
+                dict(result, distraction=distraction.get(result['face_id'])) for result in detection_results
+            ]
             
-            # Annotate frame with emotions
-            annotated_frame = emotion_detector.annotate_frame(frame, detections)
+            if overlay_mode == "client":
+                # Clients draw the overlays, the JPEG stays free of text and compresses better
+                annotated_frame = frame
+                overlays = overlay_layers(frame.shape, detection_results, device_result)
+            else:
+                # Annotate emotions and devices in place into the compositor's reusable buffer
+                annotated_frame = frame_compositor.compose(frame, detections, device_result)
+                overlays = None
             
-            # Annotate frame with devices
-            annotated_frame = device_detector.annotate_frame_with_devices(annotated_frame, device_result)
+            # Only the tiers somebody watches are encoded, each once for all of its viewers
+            frame_encoder.begin_frame(annotated_frame)
+            mjpeg_hub.publish_encoded('camera', frame_encoder)
             
-            # Encode frame for streaming
-            _, buffer = cv2.imencode('.jpg', annotated_frame)
-            frame_base64 = base64.b64encode(buffer).decode('utf-8')
+            # Publish this tick's statistics snapshot (shared with REST readers)
+            snapshot = statistics_publisher.publish()
             
-            # Get current statistics
-            stats = face_tracker.get_face_statistics()
+            # Periodically snapshot the gallery for fast restarts
+            face_tracker.maybe_save_snapshot()
             
             # Prepare WebSocket message
-            message = {
-                "type": "detection_update",
-                "data": {
-                    "frame": frame_base64,
-                    "detections": detection_results,
-                    "devices": device_result,
-                    "statistics": stats
+            message = DetectionUpdate(
+                overlay_mode=overlay_mode,
+                overlays=overlays,
+                detections=detection_results,
+                devices=device_result,
+                stages=stages,
+                ages_ms={
+                    "faces": (faces_age or 0) * 1000,
+                    "devices": (devices_age or 0) * 1000
                 },
-                "timestamp": datetime.now().isoformat()
-            }
+                timestamp=datetime.now().isoformat()
+            )
             
-            # Broadcast results to all connected clients
-            await manager.broadcast(json.dumps(message))
+            # Broadcast results to all connected clients, with the frame of their tier.
+            # The statistics are re-serialized only when a new snapshot is published
+            tiers = manager.subscribed_tiers()
+            if tiers:
+                statistics = message_fragments.get('statistics', snapshot.version, lambda: snapshot.faces)
+                messages = message.encode_for_tiers(
+                    {tier: frame_encoder.get_base64(tier) for tier in tiers}, statistics
+                )
+                await manager.broadcast_by_tier(messages)
             
-            # Small delay to prevent overwhelming
-            await asyncio.sleep(0.1)
+            # Yield to the event loop between ticks
+            await asyncio.sleep(0)
             
         except Exception as e:
             print(f"Error processing frame: {e}")
             await asyncio.sleep(0.1)
 
+async def publish_changes(interval: float = 0.25):
+    """Push face-list and device-summary deltas to every /ws client"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if not manager.active_connections:
+                continue
+            
+            face_delta = face_tracker.drain_changes()
+            device_summary = device_detector.pop_summary_change()
+            if face_delta is None and device_summary is None:
+                continue
+            
+            device_delta = None
+            if device_summary is not None:
+                device_delta = {
+                    "summary": device_summary,
+                    "statistics": statistics_publisher.current.devices
+                }
+            
+            await manager.broadcast(dumps_text({
+                "type": "delta",
+                "data": {
+                    "faces": face_delta,
+                    "devices": device_delta
+                },
+                "timestamp": datetime.now().isoformat()
+            }))
+        except Exception as e:
+            print(f"Error publishing changes: {e}")
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+    # Stream tier from ?tier=..., can be changed later with {"action": "set_tier", "tier": ...}
+    tier = websocket.query_params.get("tier", DEFAULT_TIER)
+    if tier not in frame_encoder.tiers:
+        tier = DEFAULT_TIER
+    await manager.connect(websocket, tier)
     try:
         while True:
             # Keep connection alive and handle any incoming messages
             data = await websocket.receive_text()
-            # Echo back for now, can be extended for client commands
-            await websocket.send_text(f"Message received: {data}")
+            try:
+                command = json.loads(data)
+            except ValueError:
+                command = None
+            
+            if isinstance(command, dict) and command.get("action") == "set_tier":
+                tier = command.get("tier")
+                if tier in frame_encoder.tiers:
+                    manager.set_tier(websocket, tier)
+                    await websocket.send_text(dumps_text({"type": "tier", "tier": tier}))
+                else:
+                    await websocket.send_text(dumps_text({
+                        "type": "error",
+                        "message": f"Unknown tier '{tier}', expected one of {frame_encoder.tier_names()}"
+                    }))
+            else:
+                # Echo back other messages
+                await websocket.send_text(f"Message received: {data}")
     except WebSocketDisconnect:
         manager.disconnect(websocket)
 
@@ -359,7 +734,7 @@ async def sign_language_websocket(websocket: WebSocket):
     
     try:
         # Send initial status
-        await websocket.send_text(json.dumps({
+        await websocket.send_text(dumps_text({
             "type": "connected",
             "message": "Sign language WebSocket connected"
         }))
@@ -376,7 +751,7 @@ async def sign_language_websocket(websocket: WebSocket):
                         sign_cap = cv2.VideoCapture(0)
                         
                         if sign_cap.isOpened():
-                            await websocket.send_text(json.dumps({
+                            await websocket.send_text(dumps_text({
                                 "type": "status",
                                 "message": "Sign language detection started"
                             }))
@@ -386,7 +761,7 @@ async def sign_language_websocket(websocket: WebSocket):
                                 process_sign_language_frames_continuous(websocket, sign_cap)
                             )
                         else:
-                            await websocket.send_text(json.dumps({
+                            await websocket.send_text(dumps_text({
                                 "type": "error",
                                 "message": "Could not open camera"
                             }))
@@ -400,7 +775,7 @@ async def sign_language_websocket(websocket: WebSocket):
                         sign_cap.release()
                         sign_cap = None
                     
-                    await websocket.send_text(json.dumps({
+                    await websocket.send_text(dumps_text({
                         "type": "status",
                         "message": "Sign language detection stopped"
                     }))
@@ -425,6 +800,8 @@ async def sign_language_websocket(websocket: WebSocket):
 async def process_sign_language_frames_continuous(websocket: WebSocket, cap):
     """Continuously process sign language detection frames"""
     frame_count = 0
+    # Each session has its own camera, so its own encoder
+    sign_encoder = TieredEncoder(frame_encoder.tiers.values())
     
     try:
         while cap and cap.isOpened():
@@ -439,22 +816,23 @@ async def process_sign_language_frames_continuous(websocket: WebSocket, cap):
                 # Detect sign language
                 detection_result = sign_language_detector.detect_sign_in_frame(frame)
                 
-                # Annotate frame
-                annotated_frame = sign_language_detector.annotate_frame_with_landmarks(frame)
+                # Annotate in place, the raw frame is not used afterwards
+                annotated_frame = sign_language_detector.annotate_frame_with_landmarks(frame, out=frame)
                 
-                # Encode frame to base64
-                _, buffer = cv2.imencode('.jpg', annotated_frame)
-                frame_base64 = base64.b64encode(buffer).decode('utf-8')
+                # Encode with the stream's tier settings, for this session and any MJPEG viewers
+                sign_encoder.begin_frame(annotated_frame)
+                mjpeg_hub.publish_encoded('signlanguage', sign_encoder)
+                frame_base64 = sign_encoder.get_base64(DEFAULT_TIER)
                 
                 # Send frame update
-                await websocket.send_text(json.dumps({
+                await websocket.send_text(dumps_text({
                     "type": "frame_update",
                     "frame": frame_base64
                 }))
                 
                 # Send detection if sign was detected
                 if detection_result.get('sign'):
-                    await websocket.send_text(json.dumps({
+                    await websocket.send_text(dumps_text({
                         "type": "sign_detection",
                         "data": detection_result
                     }))
@@ -479,22 +857,24 @@ async def process_single_sign_frame(websocket: WebSocket, cap):
         # Detect sign language
         detection_result = sign_language_detector.detect_sign_in_frame(frame)
         
-        # Annotate frame
-        annotated_frame = sign_language_detector.annotate_frame_with_landmarks(frame)
+        # Annotate in place, the raw frame is not used afterwards
+        annotated_frame = sign_language_detector.annotate_frame_with_landmarks(frame, out=frame)
         
-        # Encode frame to base64
-        _, buffer = cv2.imencode('.jpg', annotated_frame)
-        frame_base64 = base64.b64encode(buffer).decode('utf-8')
+        # Encode with the stream's tier settings, for this session and any MJPEG viewers
+        sign_encoder = TieredEncoder(frame_encoder.tiers.values())
+        sign_encoder.begin_frame(annotated_frame)
+        mjpeg_hub.publish_encoded('signlanguage', sign_encoder)
+        frame_base64 = sign_encoder.get_base64(DEFAULT_TIER)
         
         # Send frame update
-        await websocket.send_text(json.dumps({
+        await websocket.send_text(dumps_text({
             "type": "frame_update",
             "frame": frame_base64
         }))
         
         # Send detection if sign was detected
         if detection_result.get('sign'):
-            await websocket.send_text(json.dumps({
+            await websocket.send_text(dumps_text({
                 "type": "sign_detection",
                 "data": detection_result
             }))
@@ -505,6 +885,8 @@ async def process_single_sign_frame(websocket: WebSocket, cap):
 async def process_sign_language_frames(websocket: WebSocket, cap, active_flag):
     """Process sign language detection frames"""
     frame_count = 0
+    # Each session has its own camera, so its own encoder
+    sign_encoder = TieredEncoder(frame_encoder.tiers.values())
     
     while cap and cap.isOpened() and active_flag:
         try:
@@ -519,22 +901,23 @@ async def process_sign_language_frames(websocket: WebSocket, cap, active_flag):
                 # Detect sign language
                 detection_result = sign_language_detector.detect_sign_in_frame(frame)
                 
-                # Annotate frame
-                annotated_frame = sign_language_detector.annotate_frame_with_landmarks(frame)
+                # Annotate in place, the raw frame is not used afterwards
+                annotated_frame = sign_language_detector.annotate_frame_with_landmarks(frame, out=frame)
                 
-                # Encode frame to base64
-                _, buffer = cv2.imencode('.jpg', annotated_frame)
-                frame_base64 = base64.b64encode(buffer).decode('utf-8')
+                # Encode with the stream's tier settings, for this session and any MJPEG viewers
+                sign_encoder.begin_frame(annotated_frame)
+                mjpeg_hub.publish_encoded('signlanguage', sign_encoder)
+                frame_base64 = sign_encoder.get_base64(DEFAULT_TIER)
                 
                 # Send frame update
-                await websocket.send_text(json.dumps({
+                await websocket.send_text(dumps_text({
                     "type": "frame_update",
                     "frame": frame_base64
                 }))
                 
                 # Send detection if sign was detected
                 if detection_result.get('sign'):
-                    await websocket.send_text(json.dumps({
+                    await websocket.send_text(dumps_text({
                         "type": "sign_detection",
                         "data": detection_result
                     }))
@@ -549,23 +932,54 @@ async def process_sign_language_frames(websocket: WebSocket, cap, active_flag):
         cap.release()
 
 @app.post("/export/json")
-async def export_data_json():
-    """Export all tracking data to JSON"""
+async def export_data_json(compress: bool = False):
+    """Export all tracking data as a background NDJSON job (see /api/exports/{job_id})"""
     try:
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        
-        # Export face tracking data
-        face_filename = f"face_tracking_export_{timestamp}.json"
-        face_tracker.save_to_json(face_filename)
-        
-        # Export device tracking data
-        device_filename = f"device_tracking_export_{timestamp}.json"
-        device_detector.save_device_data(device_filename)
-        
-        return {"message": f"Data exported to {face_filename} and {device_filename}"}
+        job = export_jobs.start('all', compress)
+        return {"message": f"Export started, writing {job.filename}", "job": job.to_dict()}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/exports")
+async def start_export(kind: str = "all", compress: bool = False):
+    """Start a background export of faces, devices or all, as NDJSON (gzip-compressed with compress=true)"""
+    if kind not in EXPORT_KINDS:
+        raise HTTPException(status_code=400, detail=f"Unknown kind '{kind}', expected one of {list(EXPORT_KINDS)}")
+    return export_jobs.start(kind, compress).to_dict()
+
+@app.get("/api/exports")
+async def list_exports():
+    """Recent export jobs, newest first"""
+    return {"jobs": export_jobs.list_jobs()}
+
+@app.get("/api/exports/{job_id}")
+async def get_export(job_id: str):
+    """Status and progress of an export job"""
+    job = export_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return job.to_dict()
+
+@app.post("/api/exports/{job_id}/cancel")
+async def cancel_export(job_id: str):
+    """Stop a running export, the records written so far stay readable"""
+    job = export_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return job.to_dict()
+
+@app.get("/api/exports/{job_id}/download")
+async def download_export(job_id: str):
+    """Stream an export's file, also while the job is still writing it"""
+    job = export_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return StreamingResponse(
+        export_jobs.stream(job),
+        media_type=job.media_type,
+        headers={"Content-Disposition": f'attachment; filename="{job.filename}"'}
+    )
+
 @app.post("/api/system/reset-all-data")
 async def reset_all_data():
     """Reset all data including face database and device history"""
@@ -577,13 +991,23 @@ async def reset_all_data():
         from reset_database import reset_face_tracking_database
         reset_face_tracking_database()
         
-        # Reset face tracker
+        # Reset face tracker and the thumbnails of its faces
         face_tracker.reset()
+        face_thumbnails.clear()
+        
+        # Drop the logged emotion events (device events are cleared with the device history)
+        event_log.clear('emotions')
         
         return {"message": "All data has been reset successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to reset data: {str(e)}")
 
+# Background gallery maintenance and change feed
+@app.on_event("startup")
+async def startup_event():
+    asyncio.create_task(gallery_maintainer.run_forever())
+    asyncio.create_task(publish_changes())
+
 # Cleanup on shutdown
 @app.on_event("shutdown")
 async def shutdown_event():
@@ -591,6 +1015,10 @@ async def shutdown_event():
     camera_active = False
     if cap is not None:
         cap.release()
+    
+    # Flush write-behind ChromaDB updates and logged events before the process exits
+    face_tracker.close()
+    event_log.close()
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,94 @@
+import asyncio
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set
+
+BOUNDARY = "frame"
+MEDIA_TYPE = f"multipart/x-mixed-replace; boundary={BOUNDARY}"
+
+
+class _Subscriber:
+    """One HTTP viewer: holds only the newest unsent frame"""
+    __slots__ = ('event', 'frame', 'sent', 'dropped')
+
+    def __init__(self):
+        self.event = asyncio.Event()
+        self.frame: Optional[bytes] = None
+        self.sent = 0
+        self.dropped = 0
+
+    def offer(self, frame: bytes):
+        if self.frame is not None:
+            # The viewer has not taken the previous frame yet, replace it
+            self.dropped += 1
+        self.frame = frame
+        self.event.set()
+
+
+class MjpegHub:
+    """Fans already-encoded JPEG frames out to multipart/x-mixed-replace viewers.
+
+    Viewers subscribe to a (source, tier) pair. Each one has a single-frame
+    slot, so a slow consumer skips to the newest frame instead of building
+    a backlog, and the same bytes object is written to every viewer.
+    """
+
+    def __init__(self, sources: Iterable[str]):
+        self._subscribers: Dict[str, Dict[str, Set[_Subscriber]]] = {source: {} for source in sources}
+        # Frames sent/dropped by viewers that have disconnected
+        self._finished: Dict[str, Dict[str, List[int]]] = {source: {} for source in self._subscribers}
+
+    @property
+    def sources(self) -> List[str]:
+        return list(self._subscribers)
+
+    def demanded_tiers(self, source: str) -> List[str]:
+        """Tiers of ``source`` with at least one viewer"""
+        return [tier for tier, subscribers in self._subscribers[source].items() if subscribers]
+
+    def publish(self, source: str, tier: str, frame: bytes):
+        for subscriber in self._subscribers[source].get(tier, ()):
+            subscriber.offer(frame)
+
+    def publish_encoded(self, source: str, encoder):
+        """Publish the current frame of a TieredEncoder in every tier someone watches"""
+        for tier in self.demanded_tiers(source):
+            frame = encoder.get_bytes(tier)
+            if frame is not None:
+                self.publish(source, tier, frame)
+
+    async def stream(self, source: str, tier: str) -> AsyncIterator[bytes]:
+        """Multipart body for one viewer, runs until the client disconnects"""
+        subscriber = _Subscriber()
+        self._subscribers[source].setdefault(tier, set()).add(subscriber)
+        try:
+            while True:
+                await subscriber.event.wait()
+                subscriber.event.clear()
+                frame, subscriber.frame = subscriber.frame, None
+                if frame is None:
+                    continue
+                # Header, payload and trailer as separate chunks, the JPEG bytes are not copied
+                yield (f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                       f"Content-Length: {len(frame)}\r\n\r\n").encode('ascii')
+                yield frame
+                yield b"\r\n"
+                subscriber.sent += 1
+        finally:
+            self._subscribers[source][tier].discard(subscriber)
+            totals = self._finished[source].setdefault(tier, [0, 0])
+            totals[0] += subscriber.sent
+            totals[1] += subscriber.dropped
+
+    def describe(self) -> Dict[str, Dict[str, Dict]]:
+        """Viewers, frames sent and frames dropped per source and tier"""
+        description = {}
+        for source, tiers in self._subscribers.items():
+            description[source] = {}
+            for tier in set(tiers) | set(self._finished[source]):
+                subscribers = tiers.get(tier, ())
+                sent, dropped = self._finished[source].get(tier, (0, 0))
+                description[source][tier] = {
+                    'viewers': len(subscribers),
+                    'frames_sent': sent + sum(subscriber.sent for subscriber in subscribers),
+                    'frames_dropped': dropped + sum(subscriber.dropped for subscriber in subscribers)
+                }
+        return description
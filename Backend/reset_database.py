@@ -5,6 +5,7 @@ import chromadb
 def reset_face_tracking_database():
     """Reset the face tracking database by removing all data"""
     db_path = "./face_vectors_db"
+    snapshot_path = "./face_vectors_snapshot"
     
     try:
         # Try to delete the collection first using ChromaDB API
@@ -23,6 +24,11 @@ def reset_face_tracking_database():
             shutil.rmtree(db_path)
             print(f"Removed directory: {db_path}")
         
+        # Delete the startup snapshot so the old gallery is not restored
+        if os.path.exists(snapshot_path):
+            shutil.rmtree(snapshot_path)
+            print(f"Removed directory: {snapshot_path}")
+        
         print("Face tracking database has been reset. The application will create a new database on next startup.")
     except Exception as e:
         print(f"Error resetting database: {e}")
@@ -0,0 +1,107 @@
+import dataclasses
+import json
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    print("Warning: orjson not installed, using the slower json module. Install with: pip install orjson")
+
+
+def _default(obj: Any):
+    """Types neither encoder handles natively: numpy scalars/arrays, sets (and datetimes/dataclasses for json)"""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if ORJSON_AVAILABLE:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any) -> bytes:
+        """UTF-8 JSON of ``obj``, numpy scalars/arrays, datetimes and dataclasses included"""
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+else:
+    def dumps(obj: Any) -> bytes:
+        """UTF-8 JSON of ``obj``, numpy scalars/arrays, datetimes and dataclasses included"""
+        return json.dumps(obj, default=_default, separators=(',', ':')).encode('utf-8')
+
+
+def dumps_text(obj: Any) -> str:
+    """``dumps`` as a str, for WebSocket text frames"""
+    return dumps(obj).decode('utf-8')
+
+
+def join_object(fields: List[Tuple[str, bytes]]) -> bytes:
+    """JSON object from already-serialized values (the keys must not need escaping)"""
+    return b'{' + b','.join(b'"' + name.encode('ascii') + b'":' + value for name, value in fields) + b'}'
+
+
+class FragmentCache:
+    """Serialized JSON of sections that change rarely, reused while their version is unchanged"""
+
+    def __init__(self):
+        self._fragments: Dict[Hashable, Tuple[Hashable, bytes]] = {}
+
+    def get(self, key: Hashable, version: Hashable, build: Callable[[], Any]) -> bytes:
+        cached = self._fragments.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        fragment = dumps(build())
+        self._fragments[key] = (version, fragment)
+        return fragment
+
+    def clear(self):
+        self._fragments.clear()
+
+
+@dataclass
+class DetectionUpdate:
+    """Per-tick camera message; everything except the frame is shared by all stream tiers"""
+    overlay_mode: str
+    overlays: Optional[Dict]
+    detections: List[Dict]
+    devices: Dict
+    stages: List[str]
+    ages_ms: Dict[str, float]
+    timestamp: str
+
+    def encode_for_tiers(self, frames: Dict[str, str], statistics: bytes) -> Dict[str, str]:
+        """Message text per tier from the tiers' base64 frames and the pre-serialized statistics.
+
+        The shared sections are serialized once and spliced into each tier's
+        message, the base64 frame needs no JSON escaping.
+        """
+        # The data object's fields and closing brace, without its opening brace
+        shared = join_object([
+            ('overlay_mode', dumps(self.overlay_mode)),
+            ('overlays', dumps(self.overlays)),
+            ('detections', dumps(self.detections)),
+            ('devices', dumps(self.devices)),
+            ('statistics', statistics),
+            ('stages', dumps(self.stages)),
+            ('ages_ms', dumps(self.ages_ms)),
+        ])[1:]
+        timestamp = dumps(self.timestamp)
+
+        messages = {}
+        for tier, frame in frames.items():
+            messages[tier] = b''.join((
+                b'{"type":"detection_update","data":{"frame":"', frame.encode('ascii'),
+                b'","tier":', dumps(tier), b',', shared, b',"timestamp":', timestamp, b'}'
+            )).decode('utf-8')
+        return messages
@@ -350,10 +350,12 @@ class SignLanguageDetector:
             print(f"Error in prediction: {e}")
             return None
     
-    def annotate_frame_with_landmarks(self, frame: np.ndarray) -> np.ndarray:
-        """Annotate frame with hand landmarks and detection results"""
+    def annotate_frame_with_landmarks(self, frame: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Annotate frame with hand landmarks and detection results (in place into ``out`` when given)"""
         try:
-            annotated_frame = frame.copy()
+            annotated_frame = frame.copy() if out is None else out
+            if out is not None and out is not frame:
+                np.copyto(out, frame)
             
             # Convert BGR to RGB for MediaPipe
             rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
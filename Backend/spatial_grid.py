@@ -0,0 +1,87 @@
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+Box = Sequence[float]  # x1, y1, x2, y2
+
+
+def point_to_box_distance(x: float, y: float, box: Box) -> float:
+    """Euclidean distance from a point to a box, 0 inside it"""
+    dx = max(box[0] - x, 0.0, x - box[2])
+    dy = max(box[1] - y, 0.0, y - box[3])
+    return math.hypot(dx, dy)
+
+
+class UniformGrid:
+    """Uniform-grid index of boxes for nearest-box queries.
+
+    Each box is registered in every cell it overlaps. A query scans rings of
+    cells around the query point and stops once no unvisited ring can hold a
+    closer box, so with evenly spread boxes a query touches a handful of cells
+    instead of every box.
+    """
+
+    def __init__(self, cell_size: float):
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+        self.cell_size = cell_size
+        self.boxes: List[Box] = []
+        self._cells: Dict[Tuple[int, int], List[int]] = {}
+        self._bounds: Optional[Tuple[int, int, int, int]] = None
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size))
+
+    def insert(self, box: Box) -> int:
+        index = len(self.boxes)
+        self.boxes.append(box)
+        min_cx, min_cy = self._cell(box[0], box[1])
+        max_cx, max_cy = self._cell(box[2], box[3])
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                self._cells.setdefault((cx, cy), []).append(index)
+
+        if self._bounds is None:
+            self._bounds = (min_cx, min_cy, max_cx, max_cy)
+        else:
+            bounds = self._bounds
+            self._bounds = (min(bounds[0], min_cx), min(bounds[1], min_cy),
+                            max(bounds[2], max_cx), max(bounds[3], max_cy))
+        return index
+
+    def _ring(self, cx: int, cy: int, radius: int):
+        if radius == 0:
+            yield cx, cy
+            return
+        for x in range(cx - radius, cx + radius + 1):
+            yield x, cy - radius
+            yield x, cy + radius
+        for y in range(cy - radius + 1, cy + radius):
+            yield cx - radius, y
+            yield cx + radius, y
+
+    def nearest(self, x: float, y: float, max_distance: float = math.inf) -> Optional[Tuple[int, float]]:
+        """(box index, distance) of the box closest to the point within ``max_distance``, or None"""
+        if not self.boxes:
+            return None
+        cx, cy = self._cell(x, y)
+        min_cx, min_cy, max_cx, max_cy = self._bounds
+        # Beyond this ring there are no occupied cells
+        last_ring = max(abs(cx - min_cx), abs(cx - max_cx), abs(cy - min_cy), abs(cy - max_cy))
+
+        best_index, best_distance = None, max_distance
+        seen = set()
+        for radius in range(last_ring + 1):
+            # Every cell of ring r + 1 is at least r cells away from the point
+            if (radius - 1) * self.cell_size > best_distance:
+                break
+            for cell in self._ring(cx, cy, radius):
+                for index in self._cells.get(cell, ()):
+                    if index in seen:
+                        continue
+                    seen.add(index)
+                    distance = point_to_box_distance(x, y, self.boxes[index])
+                    if distance <= best_distance:
+                        best_index, best_distance = index, distance
+        if best_index is None:
+            return None
+        return best_index, best_distance
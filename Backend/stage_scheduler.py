@@ -0,0 +1,89 @@
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class StageScheduler:
+    """Per-stage cadences for the frame loop, with the last result held between runs.
+
+    Each stage (e.g. faces every 200 ms, devices every 2 s) runs when its
+    interval has elapsed. Stages start with staggered phases, and at most one
+    ``exclusive`` (expensive) stage runs per tick: when several are due the
+    most overdue one runs and the others slip to the next tick.
+    """
+
+    def __init__(self, cadences: Dict[str, float], exclusive: Iterable[str] = ()):
+        self.intervals: Dict[str, float] = {}
+        self.exclusive = set(exclusive)
+        self._next_due: Dict[str, float] = {}
+        self._last_run: Dict[str, Optional[float]] = {}
+        self._results: Dict[str, Any] = {}
+
+        now = time.monotonic()
+        stagger = min(cadences.values()) / len(cadences) if cadences else 0
+        for index, (name, interval) in enumerate(cadences.items()):
+            self._validate(interval)
+            self.intervals[name] = interval
+            self._next_due[name] = now + index * stagger
+            self._last_run[name] = None
+
+    @staticmethod
+    def _validate(interval: float):
+        if interval <= 0:
+            raise ValueError("Stage interval must be positive")
+
+    def plan(self, now: Optional[float] = None) -> List[str]:
+        """Stages to run this tick, most overdue (relative to its interval) first"""
+        now = time.monotonic() if now is None else now
+        due = [name for name, next_due in self._next_due.items() if now >= next_due]
+        due.sort(key=lambda name: (now - self._next_due[name]) / self.intervals[name], reverse=True)
+
+        run, exclusive_taken = [], False
+        for name in due:
+            if name in self.exclusive:
+                if exclusive_taken:
+                    continue
+                exclusive_taken = True
+            run.append(name)
+        return run
+
+    def time_until_next(self, now: Optional[float] = None) -> float:
+        now = time.monotonic() if now is None else now
+        return max(0.0, min(self._next_due.values()) - now) if self._next_due else 0.0
+
+    def record(self, name: str, result: Any, now: Optional[float] = None):
+        """Store a stage's fresh result and schedule its next run"""
+        now = time.monotonic() if now is None else now
+        self._results[name] = result
+        self._last_run[name] = now
+        self._next_due[name] = now + self.intervals[name]
+
+    def held(self, name: str, now: Optional[float] = None) -> Tuple[Any, Optional[float]]:
+        """Last result of a stage and its age in seconds (None before the first run)"""
+        now = time.monotonic() if now is None else now
+        last_run = self._last_run.get(name)
+        return self._results.get(name), (now - last_run) if last_run is not None else None
+
+    def set_cadence(self, name: str, interval: float):
+        """Change a stage's interval at runtime, a shorter interval takes effect right away"""
+        if name not in self.intervals:
+            raise KeyError(name)
+        self._validate(interval)
+        self.intervals[name] = interval
+        last_run = self._last_run[name]
+        if last_run is not None:
+            self._next_due[name] = min(self._next_due[name], last_run + interval)
+
+    def reset(self):
+        """Forget held results (e.g. when the camera restarts) and restart the staggered phases"""
+        self.__init__(dict(self.intervals), self.exclusive)
+
+    def describe(self, now: Optional[float] = None) -> Dict[str, Dict]:
+        now = time.monotonic() if now is None else now
+        return {
+            name: {
+                'interval_ms': interval * 1000,
+                'exclusive': name in self.exclusive,
+                'age_ms': (now - self._last_run[name]) * 1000 if self._last_run[name] is not None else None
+            }
+            for name, interval in self.intervals.items()
+        }
@@ -0,0 +1,60 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional
+
+
+@dataclass(frozen=True)
+class StatisticsSnapshot:
+    """Face and device statistics computed once and shared by every reader.
+
+    The dicts are served as-is to REST routes and WebSocket messages, so they
+    must be treated as read-only.
+    """
+    version: int
+    faces: Dict
+    devices: Dict
+    created_at: str
+    face_tracker_version: int
+    device_detector_version: int
+
+
+class StatisticsPublisher:
+    """Publishes an immutable StatisticsSnapshot per pipeline tick.
+
+    ``publish`` is called once per tick by the frame loop. ``current`` returns
+    the latest snapshot and only recomputes when the tracker or detector has
+    changed since (e.g. after a reset while the camera is off), so concurrent
+    readers cost a couple of integer comparisons.
+    """
+
+    def __init__(self, face_tracker, device_detector):
+        self.face_tracker = face_tracker
+        self.device_detector = device_detector
+        self._snapshot: Optional[StatisticsSnapshot] = None
+
+    def _is_stale(self) -> bool:
+        snapshot = self._snapshot
+        return (snapshot is None
+                or snapshot.face_tracker_version != self.face_tracker.version
+                or snapshot.device_detector_version != self.device_detector.version)
+
+    def publish(self) -> StatisticsSnapshot:
+        """Compute a new snapshot if any source changed, returns the current one"""
+        if not self._is_stale():
+            return self._snapshot
+
+        face_tracker_version = self.face_tracker.version
+        device_detector_version = self.device_detector.version
+        self._snapshot = StatisticsSnapshot(
+            version=(self._snapshot.version + 1) if self._snapshot else 1,
+            faces=self.face_tracker.get_face_statistics(),
+            devices=self.device_detector.get_device_statistics(),
+            created_at=datetime.now().isoformat(),
+            face_tracker_version=face_tracker_version,
+            device_detector_version=device_detector_version
+        )
+        return self._snapshot
+
+    @property
+    def current(self) -> StatisticsSnapshot:
+        return self.publish()
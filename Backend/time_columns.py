@@ -0,0 +1,22 @@
+from datetime import datetime, timezone
+from typing import List
+
+import numpy as np
+
+
+def _utc_offset(timestamp: float) -> float:
+    local = datetime.fromtimestamp(timestamp)
+    utc = datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+    return (local - utc).total_seconds()
+
+
+def iso_timestamps(timestamps) -> List[str]:
+    """Local ISO strings for a float64 column of epoch seconds, vectorized when no DST change is in range"""
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    if len(timestamps) == 0:
+        return []
+    offset = _utc_offset(float(timestamps[0]))
+    if offset != _utc_offset(float(timestamps[-1])):
+        return [datetime.fromtimestamp(t).isoformat() for t in timestamps.tolist()]
+    local_us = (timestamps + offset) * 1e6
+    return np.datetime_as_string(local_us.astype('datetime64[us]'), unit='us').tolist()
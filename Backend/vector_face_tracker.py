@@ -3,43 +3,48 @@ import base64
 import cv2
 import numpy as np
 import face_recognition
+from bisect import bisect_right
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import uuid
 import chromadb
 from chromadb.config import Settings
 import json
+import threading
+import time
 from sklearn.metrics.pairwise import cosine_similarity
 
-class FaceVector:
-    def __init__(self, face_id: str, encoding: np.ndarray, first_seen: datetime, 
-                 last_seen: datetime, emotions: List[Dict], concentration_scores: List[float]):
-        self.face_id = face_id
-        self.encoding = encoding
-        self.first_seen = first_seen
-        self.last_seen = last_seen
-        self.emotions = emotions  # List of {emotion: str, confidence: float, timestamp: datetime}
-        self.concentration_scores = concentration_scores
-        self.total_detections = len(emotions)
-
-    def to_dict(self):
-        return {
-            'face_id': self.face_id,
-            'first_seen': self.first_seen.isoformat(),
-            'last_seen': self.last_seen.isoformat(),
-            'emotions': self.emotions,
-            'concentration_scores': self.concentration_scores,
-            'total_detections': self.total_detections,
-            'avg_concentration': np.mean(self.concentration_scores) if self.concentration_scores else 0,
-            'dominant_emotion': max(set([e['emotion'] for e in self.emotions]), 
-                                  key=[e['emotion'] for e in self.emotions].count) if self.emotions else 'unknown'
-        }
+from face_index import FaceIndex
+from face_persistence import FacePersistenceQueue
+from face_vector import FaceVector
+from face_snapshot import FaceSnapshotStore
 
 class VectorFaceTracker:
-    def __init__(self, similarity_threshold: float = 0.6):
+    def __init__(self, similarity_threshold: float = 0.6, flush_interval: float = 2.0,
+                 flush_batch_size: int = 64, snapshot_path: str = "./face_vectors_snapshot",
+                 snapshot_interval: float = 60.0, exact_search_threshold: int = 2000,
+                 index_nprobe: int = 8):
         self.similarity_threshold = similarity_threshold
         self.tracked_faces: Dict[str, FaceVector] = {}
         
+        # Bumped on every gallery change, used for ETags and change detection. Seeded
+        # with the start time (microseconds) so versions keep increasing across restarts
+        # and a version cached from a previous process never names a different gallery
+        self.version = time.time_ns() // 1000
+        self._sorted_ids: Optional[List[str]] = None
+        # Gallery version of each face's last change (per-face ETags), faces unchanged
+        # since startup share the initial version
+        self._initial_version = self.version
+        self._face_versions: Dict[str, int] = {}
+        
+        # Change feed: face_id -> 'added' | 'updated' | 'removed', coalesced until drained
+        self._changes: Dict[str, str] = {}
+        self._changes_from_version = self.version
+        self._reset_pending = False
+        
+        # Nearest-neighbour index over the gallery (exact search for small galleries)
+        self.index = FaceIndex(exact_threshold=exact_search_threshold, nprobe=index_nprobe)
+        
         # Initialize ChromaDB for vector storage
         self.chroma_client = chromadb.PersistentClient(path="./face_vectors_db")
         try:
@@ -49,6 +54,24 @@ class VectorFaceTracker:
                 name="face_encodings",
                 metadata={"hnsw:space": "cosine"}
             )
+        
+        # ChromaDB writes are coalesced per face and flushed off the frame loop
+        self.persistence = FacePersistenceQueue(
+            self.collection,
+            flush_interval=flush_interval,
+            max_pending=flush_batch_size
+        )
+        
+        # Restore the gallery from the last snapshot (ChromaDB is only the fallback)
+        self.snapshot_store = FaceSnapshotStore(snapshot_path)
+        self.snapshot_interval = snapshot_interval
+        self._last_snapshot_time = time.monotonic()
+        self._snapshot_dirty = False
+        # Periodic snapshots are written by a thread; a reset makes older writes stale
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_generation = 0
+        self._snapshot_thread: Optional[threading.Thread] = None
+        self._rehydrate()
     
     def _encode_face_embedding(self, encoding: np.ndarray) -> str:
         """Convert numpy array to base64 string for storage"""
@@ -81,57 +104,220 @@ class VectorFaceTracker:
 
     def find_matching_face(self, face_encoding: np.ndarray) -> Optional[str]:
         """Find if this face encoding matches any existing tracked face using Euclidean distance."""
-        if not self.tracked_faces:
-            return None
+        return self.find_matching_faces([face_encoding])[0]
 
-        # Define a distance threshold (e.g., 0.6 is standard in face_recognition)
-        threshold = self.similarity_threshold  # Make sure this is a *distance* threshold, e.g., 0.6
+    def find_matching_faces(self, face_encodings: List[np.ndarray]) -> List[Optional[str]]:
+        """Match a batch of encodings against the gallery index.
 
-        print("Number of tracked faces:", len(self.tracked_faces))
+        Each encoding is matched to its nearest tracked face when the Euclidean
+        distance is below the threshold (0.6 is standard in face_recognition).
+        """
+        if not self.tracked_faces or len(face_encodings) == 0:
+            return [None] * len(face_encodings)
 
-        for face_id, face_vector in self.tracked_faces.items():
-            distance = np.linalg.norm(face_encoding - face_vector.encoding)
-            print(f"Distance to {face_id}: {distance:.4f}")
+        matches = []
+        for neighbours in self.index.search_batch(np.asarray(face_encodings), k=1):
+            if neighbours and neighbours[0][1] < self.similarity_threshold:
+                matches.append(neighbours[0][0])
+            else:
+                matches.append(None)
+        return matches
 
-            if distance < threshold:
-                return face_id
+    def _rehydrate(self):
+        """Load tracked faces from the snapshot, falling back to ChromaDB"""
+        start = time.perf_counter()
+        snapshot = self.snapshot_store.load()
+        
+        if snapshot is not None:
+            self._load_columns(snapshot)
+            source = "snapshot"
+            
+            # Faces persisted after the snapshot was taken (e.g. after a crash)
+            try:
+                if self.collection.count() != len(self.tracked_faces):
+                    missing = [face_id for face_id in self.collection.get(include=[])['ids']
+                               if face_id not in self.tracked_faces]
+                    if missing:
+                        self._load_from_collection(ids=missing)
+                        source = "snapshot+chromadb"
+            except Exception as e:
+                print(f"Error reconciling snapshot with ChromaDB: {e}")
+        else:
+            try:
+                self._load_from_collection()
+            except Exception as e:
+                print(f"Error loading faces from ChromaDB: {e}")
+            source = "chromadb"
+        
+        if self.tracked_faces:
+            face_ids = list(self.tracked_faces.keys())
+            self.index.add_many(face_ids, np.stack([self.tracked_faces[f].encoding for f in face_ids]))
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            print(f"Restored {len(self.tracked_faces)} faces from {source} in {elapsed_ms:.1f} ms")
 
-        return None
-    
-    def add_or_update_face(self, face_encoding: np.ndarray, emotion: str, 
-                          confidence: float, concentration: float, 
-                          face_image: np.ndarray = None) -> str:
-        """Add new face or update existing face with new detection"""
-        current_time = datetime.now()
+    def _load_columns(self, columns: Dict):
+        # The encodings stay views into the (copy-on-write) memory map, no copy at startup
+        embeddings = np.asarray(columns['embeddings'], dtype=np.float32)
+        for i, face_id in enumerate(columns['ids']):
+            self.tracked_faces[face_id] = FaceVector(
+                face_id=face_id,
+                encoding=embeddings[i],
+                first_seen=datetime.fromtimestamp(columns['first_seen'][i]),
+                last_seen=datetime.fromtimestamp(columns['last_seen'][i]),
+                total_detections=columns['total_detections'][i],
+                concentration_total=columns['concentration_total'][i],
+                emotion_counts=columns['emotion_counts'][i]
+            )
+
+    def _load_from_collection(self, ids: Optional[List[str]] = None):
+        results = self.collection.get(ids=ids, include=['embeddings', 'metadatas'])
+        for face_id, embedding, metadata in zip(results['ids'], results['embeddings'], results['metadatas']):
+            metadata = metadata or {}
+            last_seen = datetime.fromisoformat(metadata['last_seen']) if 'last_seen' in metadata else datetime.now()
+            first_seen = datetime.fromisoformat(metadata['first_seen']) if 'first_seen' in metadata else last_seen
+            total = int(metadata.get('total_detections', 0))
+            # Only the dominant emotion is kept in ChromaDB metadata
+            self.tracked_faces[face_id] = FaceVector(
+                face_id=face_id,
+                encoding=np.asarray(embedding, dtype=np.float32),
+                first_seen=first_seen,
+                last_seen=last_seen,
+                total_detections=total,
+                concentration_total=float(metadata.get('avg_concentration', 0)) * total,
+                emotion_counts={metadata['dominant_emotion']: total} if total and 'dominant_emotion' in metadata else {}
+            )
+
+    def _snapshot_columns(self) -> Dict:
+        faces = list(self.tracked_faces.values())
+        dimension = len(faces[0].encoding) if faces else 128
+        return {
+            'ids': [face.face_id for face in faces],
+            'embeddings': (np.stack([face.encoding for face in faces]) if faces
+                           else np.zeros((0, dimension), dtype=np.float32)),
+            'first_seen': [face.first_seen.timestamp() for face in faces],
+            'last_seen': [face.last_seen.timestamp() for face in faces],
+            'total_detections': [face.total_detections for face in faces],
+            'concentration_total': [face.concentration_total for face in faces],
+            'emotion_counts': [dict(face.emotion_counts) for face in faces]
+        }
+
+    def _write_snapshot(self, columns: Dict, generation: int):
+        with self._snapshot_lock:
+            if generation == self._snapshot_generation:
+                self.snapshot_store.write(columns)
+
+    def save_snapshot(self):
+        """Write the current gallery and aggregates to the snapshot store (synchronously)"""
+        self._wait_for_snapshot_thread()
+        self._write_snapshot(self._snapshot_columns(), self._snapshot_generation)
+        self._snapshot_dirty = False
+        self._last_snapshot_time = time.monotonic()
+
+    def _wait_for_snapshot_thread(self):
+        thread = self._snapshot_thread
+        if thread is not None:
+            thread.join()
+            self._snapshot_thread = None
+
+    def _write_snapshot_in_background(self, columns: Dict, generation: int):
+        try:
+            self._write_snapshot(columns, generation)
+        except Exception as e:
+            print(f"Error writing face snapshot: {e}")
+            self._snapshot_dirty = True
+
+    def maybe_save_snapshot(self) -> bool:
+        """Start a snapshot write if the gallery changed and the snapshot interval has elapsed.
+
+        The columns are collected here, on the caller's thread; serializing and
+        writing them happens in a background thread so the frame loop never
+        waits on disk.
+        """
+        if not self._snapshot_dirty or time.monotonic() - self._last_snapshot_time < self.snapshot_interval:
+            return False
+        if self._snapshot_thread is not None and self._snapshot_thread.is_alive():
+            return False
+        try:
+            columns = self._snapshot_columns()
+        except Exception as e:
+            print(f"Error collecting face snapshot: {e}")
+            return False
+        self._snapshot_dirty = False
+        self._last_snapshot_time = time.monotonic()
+        self._snapshot_thread = threading.Thread(
+            target=self._write_snapshot_in_background, args=(columns, self._snapshot_generation),
+            name="face-snapshot", daemon=True
+        )
+        self._snapshot_thread.start()
+        return True
+
+    def _mark_changed(self, face_id: str, change: str):
+        self.version += 1
+        self._snapshot_dirty = True
+        if change == 'removed':
+            self._face_versions.pop(face_id, None)
+        else:
+            self._face_versions[face_id] = self.version
+        if change != 'updated':
+            self._sorted_ids = None
         
-        # Check if this face already exists
-        matching_face_id = self.find_matching_face(face_encoding)
+        previous = self._changes.get(face_id)
+        if previous == 'added' and change == 'updated':
+            return
+        if previous == 'added' and change == 'removed':
+            # Never published, nothing for clients to remove
+            del self._changes[face_id]
+            return
+        self._changes[face_id] = change
+
+    def drain_changes(self) -> Optional[Dict]:
+        """Compact gallery delta since the last call, or None if nothing changed.
+
+        ``from_version``/``version`` let clients detect a missed delta and resync.
+        """
+        if not self._changes and not self._reset_pending:
+            return None
+        
+        changes = []
+        for face_id, change in self._changes.items():
+            face_vector = self.tracked_faces.get(face_id)
+            if change == 'removed' or face_vector is None:
+                changes.append({'op': 'removed', 'face_id': face_id})
+            else:
+                changes.append({'op': change, 'face': face_vector.to_dict(include_history=False)})
         
-        emotion_data = {
-            'emotion': emotion,
-            'confidence': confidence,
-            'timestamp': current_time.isoformat()
+        delta = {
+            'from_version': self._changes_from_version,
+            'version': self.version,
+            'reset': self._reset_pending,
+            'changes': changes
+        }
+        self._changes = {}
+        self._changes_from_version = self.version
+        self._reset_pending = False
+        return delta
+
+    def _build_metadata(self, face_vector: FaceVector) -> Dict:
+        return {
+            'first_seen': face_vector.first_seen.isoformat(),
+            'last_seen': face_vector.last_seen.isoformat(),
+            'total_detections': face_vector.total_detections,
+            'avg_concentration': float(face_vector.avg_concentration),
+            'dominant_emotion': face_vector.dominant_emotion
         }
+
+    def _record_detection(self, matching_face_id: Optional[str], face_encoding: np.ndarray,
+                          emotion: str, confidence: float, concentration: float) -> str:
+        current_time = datetime.now()
         
         if matching_face_id:
             # Update existing face
             face_vector = self.tracked_faces[matching_face_id]
-            face_vector.last_seen = current_time
-            face_vector.emotions.append(emotion_data)
-            face_vector.concentration_scores.append(concentration)
-            face_vector.total_detections += 1
+            face_vector.add_detection(emotion, confidence, concentration, current_time)
+            self._mark_changed(matching_face_id, 'updated')
             
-            # Update in ChromaDB
-            self.collection.update(
-                ids=[matching_face_id],
-                metadatas=[{
-                    'last_seen': current_time.isoformat(),
-                    'total_detections': face_vector.total_detections,
-                    'avg_concentration': np.mean(face_vector.concentration_scores),
-                    'dominant_emotion': max(set([e['emotion'] for e in face_vector.emotions]), 
-                                          key=[e['emotion'] for e in face_vector.emotions].count)
-                }]
-            )
+            # Queue the metadata update, written behind by the persistence thread
+            self.persistence.enqueue_update(matching_face_id, self._build_metadata(face_vector))
             
             return matching_face_id
         else:
@@ -141,36 +327,126 @@ class VectorFaceTracker:
                 face_id=face_id,
                 encoding=face_encoding,
                 first_seen=current_time,
-                last_seen=current_time,
-                emotions=[emotion_data],
-                concentration_scores=[concentration]
+                last_seen=current_time
             )
+            face_vector.add_detection(emotion, confidence, concentration, current_time)
             
             self.tracked_faces[face_id] = face_vector
+            self.index.add(face_id, face_encoding)
+            self._mark_changed(face_id, 'added')
             
-            # Store in ChromaDB
-            self.collection.add(
-                ids=[face_id],
-                embeddings=[face_encoding.tolist()],
-                metadatas=[{
+            # Queue the insert, written behind by the persistence thread
+            self.persistence.enqueue_add(
+                face_id,
+                face_encoding.tolist(),
+                {
                     'first_seen': current_time.isoformat(),
                     'last_seen': current_time.isoformat(),
                     'total_detections': 1,
-                    'avg_concentration': concentration,
+                    'avg_concentration': float(concentration),
                     'dominant_emotion': emotion
-                }]
+                }
             )
             
             return face_id
     
+    def add_or_update_face(self, face_encoding: np.ndarray, emotion: str, 
+                          confidence: float, concentration: float, 
+                          face_image: np.ndarray = None) -> str:
+        """Add new face or update existing face with new detection"""
+        matching_face_id = self.find_matching_face(face_encoding)
+        return self._record_detection(matching_face_id, face_encoding, emotion, confidence, concentration)
+
+    def add_or_update_faces(self, detections: List[Dict]) -> List[str]:
+        """Add or update every face detected in a frame using a single batched gallery lookup"""
+        matches = self.find_matching_faces([d['face_encoding'] for d in detections])
+        return [
+            self._record_detection(
+                matching_face_id, d['face_encoding'], d['emotion'], d['confidence'], d['concentration']
+            )
+            for matching_face_id, d in zip(matches, detections)
+        ]
+
+    def set_face_distraction(self, face_id: str, distraction: Dict):
+        """Store a face's per-student distraction ({score, level, devices, updated_at})"""
+        face_vector = self.tracked_faces.get(face_id)
+        if face_vector is None:
+            return
+        previous = face_vector.distraction
+        face_vector.distraction = distraction
+        if previous is None or previous['score'] != distraction['score'] or previous['devices'] != distraction['devices']:
+            self._mark_changed(face_id, 'updated')
+    
+    def remove_face(self, face_id: str) -> Optional[FaceVector]:
+        """Drop a face from the gallery, the index and ChromaDB"""
+        face_vector = self.tracked_faces.pop(face_id, None)
+        if face_vector is None:
+            return None
+        self.index.remove(face_id)
+        self.persistence.enqueue_delete(face_id)
+        self._mark_changed(face_id, 'removed')
+        return face_vector
+
+    def merge_faces(self, keep_id: str, duplicate_ids: List[str]) -> Optional[FaceVector]:
+        """Fold duplicate identities (and their histories) into ``keep_id``"""
+        survivor = self.tracked_faces.get(keep_id)
+        if survivor is None:
+            return None
+        for duplicate_id in duplicate_ids:
+            if duplicate_id == keep_id:
+                continue
+            duplicate = self.remove_face(duplicate_id)
+            if duplicate is not None:
+                survivor.absorb(duplicate)
+
+        # The merged encoding replaces the stored one everywhere
+        self.index.add(keep_id, survivor.encoding)
+        self.persistence.enqueue_add(keep_id, survivor.encoding.tolist(), self._build_metadata(survivor))
+        self._mark_changed(keep_id, 'updated')
+        return survivor
+
+    def flush(self) -> int:
+        """Force pending ChromaDB writes out now"""
+        return self.persistence.flush()
+
+    def close(self):
+        """Flush pending writes, stop the persistence thread and write a final snapshot (call on shutdown)"""
+        self.persistence.close()
+        try:
+            self.save_snapshot()
+        except Exception as e:
+            print(f"Error writing face snapshot: {e}")
+    
     def get_all_faces(self) -> List[Dict]:
         """Get all tracked faces with their statistics"""
         return [face_vector.to_dict() for face_vector in self.tracked_faces.values()]
     
-    def get_face_by_id(self, face_id: str) -> Optional[Dict]:
+    def get_faces_page(self, cursor: Optional[str] = None, limit: Optional[int] = None,
+                       include_history: bool = True, since: Optional[float] = None) -> Tuple[List[Dict], Optional[str]]:
+        """Get one page of faces ordered by face_id, starting after ``cursor``.
+
+        Returns the page and the cursor for the next page (None on the last page).
+        ``since`` (epoch seconds) limits the returned history window.
+        """
+        if self._sorted_ids is None:
+            self._sorted_ids = sorted(self.tracked_faces)
+        face_ids = self._sorted_ids
+        
+        start = bisect_right(face_ids, cursor) if cursor else 0
+        end = len(face_ids) if not limit else min(start + limit, len(face_ids))
+        page = [self.tracked_faces[face_id].to_dict(include_history, since) for face_id in face_ids[start:end]]
+        next_cursor = face_ids[end - 1] if end < len(face_ids) and end > start else None
+        return page, next_cursor
+    
+    def face_version(self, face_id: str) -> int:
+        """Gallery version of the face's last change (detections, distraction, merges)"""
+        return self._face_versions.get(face_id, self._initial_version)
+    
+    def get_face_by_id(self, face_id: str, include_history: bool = True,
+                       since: Optional[float] = None) -> Optional[Dict]:
         """Get specific face by ID"""
         if face_id in self.tracked_faces:
-            return self.tracked_faces[face_id].to_dict()
+            return self.tracked_faces[face_id].to_dict(include_history, since)
         return None
     
     def get_face_statistics(self) -> Dict:
@@ -184,22 +460,20 @@ class VectorFaceTracker:
             }
         
         total_faces = len(self.tracked_faces)
-        total_detections = sum(face.total_detections for face in self.tracked_faces.values())
-        all_concentrations = []
-        all_emotions = []
+        total_detections = 0
+        concentration_total = 0.0
+        emotion_distribution = {}
         
         for face in self.tracked_faces.values():
-            all_concentrations.extend(face.concentration_scores)
-            all_emotions.extend([e['emotion'] for e in face.emotions])
-        
-        emotion_distribution = {}
-        for emotion in all_emotions:
-            emotion_distribution[emotion] = emotion_distribution.get(emotion, 0) + 1
+            total_detections += face.total_detections
+            concentration_total += face.concentration_total
+            for emotion, count in face.emotion_counts.items():
+                emotion_distribution[emotion] = emotion_distribution.get(emotion, 0) + count
         
         return {
             'total_faces': total_faces,
             'total_detections': total_detections,
-            'avg_concentration': np.mean(all_concentrations) if all_concentrations else 0,
+            'avg_concentration': concentration_total / total_detections if total_detections else 0,
             'emotion_distribution': emotion_distribution
         }
     
@@ -217,8 +491,20 @@ class VectorFaceTracker:
     def reset(self):
         """Reset all tracking data and clear the database"""
         try:
-            # Clear in-memory tracking
+            # Clear in-memory tracking and drop writes that were never flushed
             self.tracked_faces.clear()
+            self.index.clear()
+            self.persistence.discard()
+            with self._snapshot_lock:
+                # A snapshot write still in flight must not bring the old gallery back
+                self._snapshot_generation += 1
+                self.snapshot_store.clear()
+            self._snapshot_dirty = False
+            self.version += 1
+            self._sorted_ids = None
+            self._face_versions = {}
+            self._changes = {}
+            self._reset_pending = True
             
             # Clear ChromaDB collection
             try:
@@ -231,6 +517,7 @@ class VectorFaceTracker:
                 name="face_encodings",
                 metadata={"hnsw:space": "cosine"}
             )
+            self.persistence.discard(self.collection)
             
             print("Face tracker has been reset successfully")
         except Exception as e:
@@ -11,6 +11,8 @@ from chromadb.config import Settings
 import json
 from sklearn.metrics.pairwise import cosine_similarity
 
+from face_persistence import FacePersistenceQueue
+
 class FaceVector:
     def __init__(self, face_id: str, encoding: np.ndarray, first_seen: datetime, 
                  last_seen: datetime, emotions: List[Dict], concentration_scores: List[float]):
@@ -36,7 +38,8 @@ class FaceVector:
         }
 
 class VectorFaceTracker:
-    def __init__(self, similarity_threshold: float = 0.45):  # Lower threshold for better matching
+    def __init__(self, similarity_threshold: float = 0.45,  # Lower threshold for better matching
+                 flush_interval: float = 2.0, flush_batch_size: int = 64):
         self.similarity_threshold = similarity_threshold
         self.tracked_faces: Dict[str, FaceVector] = {}
         
@@ -51,6 +54,13 @@ class VectorFaceTracker:
                 metadata={"hnsw:space": "cosine"}
             )
             print("Created new face_encodings collection")
+        
+        # ChromaDB writes are coalesced per face and flushed off the frame loop
+        self.persistence = FacePersistenceQueue(
+            self.collection,
+            flush_interval=flush_interval,
+            max_pending=flush_batch_size
+        )
     
     def _encode_face_embedding(self, encoding: np.ndarray) -> str:
         """Convert numpy array to base64 string for storage"""
@@ -62,35 +72,47 @@ class VectorFaceTracker:
 
     def find_matching_face(self, face_encoding: np.ndarray) -> Optional[str]:
         """Find if this face encoding matches any existing tracked face using ChromaDB's vector search"""
-        if not self.tracked_faces:
-            return None
+        return self.find_matching_faces([face_encoding])[0]
+
+    def _best_direct_match(self, face_encoding: np.ndarray, face_ids: List[str]) -> Tuple[Optional[str], float]:
+        """Best cosine match among the given in-memory faces"""
+        if not face_ids:
+            return None, 0
+        gallery = np.stack([self.tracked_faces[face_id].encoding for face_id in face_ids])
+        similarities = cosine_similarity([face_encoding], gallery)[0]
+        best = int(np.argmax(similarities))
+        return face_ids[best], similarities[best]
+
+    def find_matching_faces(self, face_encodings: List[np.ndarray]) -> List[Optional[str]]:
+        """Match a batch of encodings with a single multi-embedding ChromaDB query"""
+        if not self.tracked_faces or len(face_encodings) == 0:
+            return [None] * len(face_encodings)
+        
+        # Faces queued for insertion are not in ChromaDB yet, compare those directly
+        pending_ids = [face_id for face_id in self.persistence.pending_add_ids()
+                       if face_id in self.tracked_faces]
         
         # Use ChromaDB for vector search when we have faces
         try:
-            # Query the collection with the new face encoding
+            # One query for every face in the frame
             results = self.collection.query(
-                query_embeddings=[face_encoding.tolist()],
+                query_embeddings=[encoding.tolist() for encoding in face_encodings],
                 n_results=5  # Get top 5 matches to handle multiple similar faces
             )
             
-            if not results or not results['ids'] or not results['ids'][0]:
-                return None
-                
-            # Check distances (ChromaDB returns cosine distances)
-            distances = results['distances'][0]
-            ids = results['ids'][0]
-            
-            # In cosine distance, lower values mean more similar
-            # Convert distance to similarity (1 - distance)
-            for i, distance in enumerate(distances):
-                similarity = 1.0 - distance
-                
-                # Debug output to help tune the threshold
-                print(f"Face match candidate: {ids[i]}, similarity: {similarity}")
+            matches = []
+            for query_index, face_encoding in enumerate(face_encodings):
+                ids = results['ids'][query_index] if results and results['ids'] else []
+                distances = results['distances'][query_index] if ids else []
+                match = None
                 
-                if similarity > self.similarity_threshold:
-                    # Additional verification - compare with stored encoding
-                    if ids[i] in self.tracked_faces:
+                # In cosine distance, lower values mean more similar
+                # Convert distance to similarity (1 - distance)
+                for i, distance in enumerate(distances):
+                    similarity = 1.0 - distance
+                    
+                    if similarity > self.similarity_threshold and ids[i] in self.tracked_faces:
+                        # Additional verification - compare with stored encoding
                         direct_similarity = cosine_similarity(
                             [face_encoding], 
                             [self.tracked_faces[ids[i]].encoding]
@@ -98,44 +120,46 @@ class VectorFaceTracker:
                         
                         if direct_similarity > self.similarity_threshold:
                             print(f"Match found: {ids[i]}, similarity: {similarity}, direct: {direct_similarity}")
-                            return ids[i]
+                            match = ids[i]
+                            break
+                
+                if match is None and pending_ids:
+                    pending_match, pending_similarity = self._best_direct_match(face_encoding, pending_ids)
+                    if pending_similarity > self.similarity_threshold:
+                        match = pending_match
+                
+                matches.append(match)
             
-            print("No match found above threshold")
-            return None
+            return matches
             
         except Exception as e:
             # Fallback to direct comparison if ChromaDB query fails
             print(f"ChromaDB query error: {e}, falling back to direct comparison")
             
-            # Use direct vector comparison
-            best_match = None
-            best_similarity = 0
-            
-            for face_id, face_vector in self.tracked_faces.items():
-                similarity = cosine_similarity(
-                    [face_encoding], 
-                    [face_vector.encoding]
-                )[0][0]
-                
-                if similarity > best_similarity:
-                    best_similarity = similarity
-                    best_match = face_id
-            
-            if best_similarity > self.similarity_threshold:
-                print(f"Direct match found: {best_match}, similarity: {best_similarity}")
-                return best_match
+            # Use direct vector comparison against the whole in-memory gallery
+            face_ids = list(self.tracked_faces.keys())
+            gallery = np.stack([self.tracked_faces[face_id].encoding for face_id in face_ids])
+            similarities = cosine_similarity(np.asarray(face_encodings), gallery)
+            best = np.argmax(similarities, axis=1)
             
-            return None
+            return [
+                face_ids[col] if similarities[row, col] > self.similarity_threshold else None
+                for row, col in enumerate(best)
+            ]
+
+    def _build_metadata(self, face_vector: FaceVector) -> Dict:
+        return {
+            'last_seen': face_vector.last_seen.isoformat(),
+            'total_detections': face_vector.total_detections,
+            'avg_concentration': float(np.mean(face_vector.concentration_scores)),
+            'dominant_emotion': max(set([e['emotion'] for e in face_vector.emotions]), 
+                                  key=[e['emotion'] for e in face_vector.emotions].count)
+        }
     
-    def add_or_update_face(self, face_encoding: np.ndarray, emotion: str, 
-                          confidence: float, concentration: float, 
-                          face_image: np.ndarray = None) -> str:
-        """Add new face or update existing face with new detection"""
+    def _record_detection(self, matching_face_id: Optional[str], face_encoding: np.ndarray,
+                          emotion: str, confidence: float, concentration: float) -> str:
         current_time = datetime.now()
         
-        # Check if this face already exists
-        matching_face_id = self.find_matching_face(face_encoding)
-        
         emotion_data = {
             'emotion': emotion,
             'confidence': confidence,
@@ -151,20 +175,8 @@ class VectorFaceTracker:
             face_vector.concentration_scores.append(concentration)
             face_vector.total_detections += 1
             
-            # Update in ChromaDB
-            try:
-                self.collection.update(
-                    ids=[matching_face_id],
-                    metadatas=[{
-                        'last_seen': current_time.isoformat(),
-                        'total_detections': face_vector.total_detections,
-                        'avg_concentration': np.mean(face_vector.concentration_scores),
-                        'dominant_emotion': max(set([e['emotion'] for e in face_vector.emotions]), 
-                                              key=[e['emotion'] for e in face_vector.emotions].count)
-                    }]
-                )
-            except Exception as e:
-                print(f"Error updating face in ChromaDB: {e}")
+            # Queue the metadata update, written behind by the persistence thread
+            self.persistence.enqueue_update(matching_face_id, self._build_metadata(face_vector))
             
             return matching_face_id
         else:
@@ -182,24 +194,46 @@ class VectorFaceTracker:
             
             self.tracked_faces[face_id] = face_vector
             
-            # Store in ChromaDB
-            try:
-                self.collection.add(
-                    ids=[face_id],
-                    embeddings=[face_encoding.tolist()],
-                    metadatas=[{
-                        'first_seen': current_time.isoformat(),
-                        'last_seen': current_time.isoformat(),
-                        'total_detections': 1,
-                        'avg_concentration': concentration,
-                        'dominant_emotion': emotion
-                    }]
-                )
-            except Exception as e:
-                print(f"Error adding face to ChromaDB: {e}")
+            # Queue the insert, written behind by the persistence thread
+            self.persistence.enqueue_add(
+                face_id,
+                face_encoding.tolist(),
+                {
+                    'first_seen': current_time.isoformat(),
+                    'last_seen': current_time.isoformat(),
+                    'total_detections': 1,
+                    'avg_concentration': float(concentration),
+                    'dominant_emotion': emotion
+                }
+            )
             
             return face_id
     
+    def add_or_update_face(self, face_encoding: np.ndarray, emotion: str, 
+                          confidence: float, concentration: float, 
+                          face_image: np.ndarray = None) -> str:
+        """Add new face or update existing face with new detection"""
+        matching_face_id = self.find_matching_face(face_encoding)
+        return self._record_detection(matching_face_id, face_encoding, emotion, confidence, concentration)
+    
+    def add_or_update_faces(self, detections: List[Dict]) -> List[str]:
+        """Add or update every face detected in a frame using a single batched gallery lookup"""
+        matches = self.find_matching_faces([d['face_encoding'] for d in detections])
+        return [
+            self._record_detection(
+                matching_face_id, d['face_encoding'], d['emotion'], d['confidence'], d['concentration']
+            )
+            for matching_face_id, d in zip(matches, detections)
+        ]
+    
+    def flush(self) -> int:
+        """Force pending ChromaDB writes out now"""
+        return self.persistence.flush()
+    
+    def close(self):
+        """Flush pending writes and stop the persistence thread (call on shutdown)"""
+        self.persistence.close()
+    
     def get_all_faces(self) -> List[Dict]:
         """Get all tracked faces with their statistics"""
         return [face_vector.to_dict() for face_vector in self.tracked_faces.values()]